@@ -10,6 +10,7 @@ Modules:
 - architect: The Planner (Strategic Decision Maker).
 - narrator: The Writer (Content Generator & RAG Consumer).
 - editor: The Critic (Quality Assurance & Continuity Checker).
+- summarizer: The Archivist (scene/chapter/act summaries for the summary tree).
 
 """
 
@@ -18,5 +19,6 @@ from . import architect
 from . import narrator
 from . import editor
 from . import interviewer
+from . import summarizer
 
-__all__ = ["client", "architect", "narrator", "editor", "interviewer"]
\ No newline at end of file
+__all__ = ["client", "architect", "narrator", "editor", "interviewer", "summarizer"]
\ No newline at end of file
@@ -5,6 +5,9 @@ from pathlib import Path
 from typing import Dict, Any, Optional
 
 from ai_services import client
+from core.prompt_template import PromptTemplate, persona_template
+from core.services import get_services
+from core.story_bible import StoryBible
 
 logger = logging.getLogger(__name__)
 
@@ -12,33 +15,18 @@ class ArchitectError(Exception):
     """Custom exception for planning failures."""
     pass
 
-def _load_json_config(path: Path) -> Dict[str, Any]:
-    """Helper to safely load configuration files."""
-    try:
-        if not path.exists():
-            logger.error(f"Config file missing: {path}")
-            return {}
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        logger.error(f"Failed to load config {path}: {e}")
-        return {}
-
-def _hydrate_prompt(template: str, project_conf: Dict[str, Any], story_brief: Dict[str, Any], override_instruction: Optional[str] = None) -> str:
-    """Injects project variables and User Overrides into the system prompt."""
-    replacements = {
-        "{{title}}": project_conf.get("meta", {}).get("title", "Untitled Project"),
-        "{{genre}}": project_conf.get("style", {}).get("genre", "General Fiction"),
-        "{{style_guide}}": json.dumps(project_conf.get("style", {}), indent=2),
-        "{{story_brief}}": json.dumps(story_brief or {}, indent=2)
-    }
-    
-    hydrated = template
-    for key, value in replacements.items():
-        hydrated = hydrated.replace(key, str(value))
+def _hydrate_prompt(template: PromptTemplate, bible: StoryBible, override_instruction: Optional[str] = None) -> str:
+    """Injects project variables and User Overrides into the compiled system prompt."""
+    story_brief = bible.fragment("story_brief")
+    hydrated = template.render({
+        "title": bible.get("project_conf", "meta", "title", default="Untitled Project"),
+        "genre": bible.get("project_conf", "style", "genre", default="General Fiction"),
+        "style_guide": bible.fragment("project_conf", "style", default={}),
+        "story_brief": story_brief
+    })
     
-    if "{{story_brief}}" not in template:
-        hydrated += f"\n\nSTORY BRIEF (Source of Truth):\n{replacements['{{story_brief}}']}"
+    if "story_brief" not in template.slots:
+        hydrated += f"\n\nSTORY BRIEF (Source of Truth):\n{story_brief}"
 
     # Inject Director Override if present (God Mode)
     if override_instruction:
@@ -111,18 +99,10 @@ async def plan_next_step(matrix_data: Dict[str, Any], project_root: Path, overri
     """
     logger.info("Architect Service: Analyzing Matrix...")
 
-    # 1. Calculate Paths Dynamically
-    bible_dir = project_root / "data" / "story_bible"
-    personas_path = bible_dir / "personas.json"
-    project_conf_path = bible_dir / "project_conf.json"
-    story_brief_path = bible_dir / "story_brief.json"
-
-    # 2. Load Configurations
-    personas = _load_json_config(personas_path)
-    project_conf = _load_json_config(project_conf_path)
-    story_brief = _load_json_config(story_brief_path) if story_brief_path.exists() else {}
+    # 1-2. Story Bible: shared per project, re-read only when a file changes
+    bible = get_services(project_root).bible
     
-    architect_config = personas.get("architect")
+    architect_config = bible.personas.get("architect")
     if not architect_config:
         # Fallback config if file is broken
         architect_config = {"model": "gpt-4-turbo", "system_prompt": "You are the Architect."}
@@ -138,8 +118,12 @@ async def plan_next_step(matrix_data: Dict[str, Any], project_root: Path, overri
         logger.info(f"Architect: Processing Override -> {override_instruction}")
 
     # 4. Build Context & Prompts
-    system_prompt_template = architect_config.get("system_prompt", "")
-    system_prompt = _hydrate_prompt(system_prompt_template, project_conf, story_brief, override_instruction)
+    # Compiled once per personas.json version (the fallback config has no persona to compile)
+    if bible.personas.get("architect"):
+        template = persona_template(bible, "architect")
+    else:
+        template = PromptTemplate(architect_config.get("system_prompt", ""))
+    system_prompt = _hydrate_prompt(template, bible, override_instruction)
 
     user_message = f"""
     Here is the current Project State (The Matrix):
@@ -3,7 +3,7 @@ import json
 import logging
 import asyncio
 import aiohttp
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Union, Tuple, Callable, Awaitable
 from tenacity import (
     retry,
     stop_after_attempt,
@@ -46,6 +46,8 @@ GPT5_MIN_MAX_TOKENS = int(os.getenv("GPT5_MIN_MAX_TOKENS", "2000"))
 DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "gpt-4-turbo")
 TIMEOUT_SECONDS = int(os.getenv("AI_TIMEOUT", "60"))
 MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
+# Ask streamed responses for token usage (stream_options); some OpenAI-compatible endpoints reject it
+STREAM_USAGE = os.getenv("AI_STREAM_USAGE", "true").lower() == "true"
 
 # Setup Logging
 logger = logging.getLogger(__name__)
@@ -138,36 +140,14 @@ def _normalize_response(raw_data: Dict[str, Any]) -> Dict[str, Any]:
 
 # --- The Brain Gateway ---
 
-@retry(
-    stop=stop_after_attempt(MAX_RETRIES),
-    wait=wait_exponential(multiplier=1, min=2, max=10),
-    retry=retry_if_exception_type((aiohttp.ClientError, asyncio.TimeoutError, AIError)),
-    before_sleep=before_sleep_log(logger, logging.WARNING)
-)
-async def generate(
+def _build_request(
     messages: List[Dict[str, str]],
-    model: str = DEFAULT_MODEL,
-    tools: Optional[List[Dict]] = None,
-    temperature: float = 0.7,
-    max_tokens: int = 2000
-) -> Dict[str, Any]:
-    """
-    The primary entry point for AI generation.
-    
-    Args:
-        messages: List of {"role": "...", "content": "..."} dicts.
-        model: Target model ID.
-        tools: List of JSON Schema tool definitions.
-        temperature: Creativity parameter (0.0 to 1.0).
-        max_tokens: Output length limit.
-
-    Returns:
-        Standardized Response Object (Dict).
-    """
-    if not API_KEY:
-        logger.critical("No API key found (LLM_API_KEY or REQUESTY_API_KEY).")
-        return {"status": "error", "message": "Missing API Key configuration."}
-
+    model: str,
+    tools: Optional[List[Dict]],
+    temperature: float,
+    max_tokens: int
+) -> Tuple[Dict[str, str], Dict[str, Any]]:
+    """(headers, payload) of a chat completion request, with the router/model adjustments applied."""
     headers = {
         "Authorization": f"Bearer {API_KEY}",
         "Content-Type": "application/json"
@@ -206,39 +186,210 @@ async def generate(
         payload["tools"] = tools
         payload["tool_choice"] = "auto"
 
-    # Use aiohttp for async, non-blocking I/O
-    async with aiohttp.ClientSession() as session:
-        try:
-            logger.info(f"Sending request to Brain: {effective_model} (Tools: {len(tools) if tools else 0}) - Effective Model: {payload['model']}")
+    return headers, payload
+
+
+@retry(
+    stop=stop_after_attempt(MAX_RETRIES),
+    wait=wait_exponential(multiplier=1, min=2, max=10),
+    retry=retry_if_exception_type((aiohttp.ClientError, asyncio.TimeoutError, AIError)),
+    before_sleep=before_sleep_log(logger, logging.WARNING)
+)
+async def generate(
+    messages: List[Dict[str, str]],
+    model: str = DEFAULT_MODEL,
+    tools: Optional[List[Dict]] = None,
+    temperature: float = 0.7,
+    max_tokens: int = 2000
+) -> Dict[str, Any]:
+    """
+    The primary entry point for AI generation.
+    
+    Args:
+        messages: List of {"role": "...", "content": "..."} dicts.
+        model: Target model ID.
+        tools: List of JSON Schema tool definitions.
+        temperature: Creativity parameter (0.0 to 1.0).
+        max_tokens: Output length limit.
+
+    Returns:
+        Standardized Response Object (Dict).
+    """
+    if not API_KEY:
+        logger.critical("No API key found (LLM_API_KEY or REQUESTY_API_KEY).")
+        return {"status": "error", "message": "Missing API Key configuration."}
+
+    headers, payload = _build_request(messages, model, tools, temperature, max_tokens)
+    effective_model = payload["model"]
+
+    # Use aiohttp for async, non-blocking I/O over the shared keep-alive pool (core/services.py).
+    # Imported here: core/__init__ loads the Orchestrator, which imports this module's dependents.
+    from core.services import http_session
+    session = http_session()
+    try:
+        logger.info(f"Sending request to Brain: {effective_model} (Tools: {len(tools) if tools else 0}) - Effective Model: {payload['model']}")
+        
+        async with session.post(
+            BASE_URL, 
+            headers=headers, 
+            json=payload, 
+            timeout=aiohttp.ClientTimeout(total=TIMEOUT_SECONDS)
+        ) as response:
             
+            # Handle HTTP Errors
+            if response.status != 200:
+                error_text = await response.text()
+                logger.error(f"AI API Error {response.status}: {error_text}")
+                
+                # Raise for retry if it's a server error or rate limit
+                if response.status in [429, 500, 502, 503, 504]:
+                    raise AIError(f"Upstream Error {response.status}")
+                
+                return {"status": "error", "message": f"Provider Error: {error_text}"}
+
+            # Success
+            raw_data = await response.json()
+            return _normalize_response(raw_data)
+
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.warning(f"Network error interacting with AI: {e}")
+        raise # Trigger Tenacity retry
+    except AIError as e:
+        logger.warning(f"AI response error: {e}")
+        raise
+    except Exception as e:
+        logger.exception(f"Unexpected error in AI Client: {e}")
+        return {"status": "error", "message": str(e)}
+
+# --- Streaming ---
+
+class StreamError(Exception):
+    """A streamed response broke off after part of it was delivered (not retried: the caller holds partial output)."""
+    pass
+
+
+def _merge_delta(message: Dict[str, Any], calls: Dict[int, Dict[str, Any]], delta: Dict[str, Any]) -> List[Tuple[int, str, str]]:
+    """Folds one streamed delta into the message being assembled; returns the (index, tool name, argument fragment) it carried."""
+    if isinstance(delta.get("content"), str):
+        message["content"] = (message.get("content") or "") + delta["content"]
+    fragments = []
+    for tc in delta.get("tool_calls") or []:
+        index = tc.get("index", len(calls))
+        call = calls.setdefault(index, {"id": None, "type": "function", "function": {"name": "", "arguments": ""}})
+        if tc.get("id"):
+            call["id"] = tc["id"]
+        function = tc.get("function") or {}
+        if function.get("name"):
+            call["function"]["name"] += function["name"]
+        if function.get("arguments"):
+            call["function"]["arguments"] += function["arguments"]
+            fragments.append((index, call["function"]["name"], function["arguments"]))
+    return fragments
+
+
+# Set once the endpoint has refused stream_options (STREAM_USAGE)
+_stream_options_rejected = False
+
+
+@retry(
+    stop=stop_after_attempt(MAX_RETRIES),
+    wait=wait_exponential(multiplier=1, min=2, max=10),
+    retry=retry_if_exception_type((aiohttp.ClientError, asyncio.TimeoutError, AIError)),
+    before_sleep=before_sleep_log(logger, logging.WARNING)
+)
+async def generate_stream(
+    messages: List[Dict[str, str]],
+    model: str = DEFAULT_MODEL,
+    tools: Optional[List[Dict]] = None,
+    temperature: float = 0.7,
+    max_tokens: int = 2000,
+    on_tool_delta: Optional[Callable[[int, str, str], Awaitable[None]]] = None
+) -> Dict[str, Any]:
+    """
+    As generate(), with the response streamed (server-sent events): every piece
+    of tool-call arguments is passed to `on_tool_delta(index, tool name,
+    fragment)` as it arrives, and the assembled response is returned in the
+    same Standardized Response Object. AI_TIMEOUT bounds the wait for each
+    chunk, not the whole response. Failures before the first fragment are
+    retried like generate(); later ones raise StreamError.
+    """
+    global _stream_options_rejected
+    if not API_KEY:
+        logger.critical("No API key found (LLM_API_KEY or REQUESTY_API_KEY).")
+        return {"status": "error", "message": "Missing API Key configuration."}
+
+    headers, payload = _build_request(messages, model, tools, temperature, max_tokens)
+    payload["stream"] = True
+    if STREAM_USAGE and not _stream_options_rejected:
+        payload["stream_options"] = {"include_usage": True}
+
+    message: Dict[str, Any] = {"role": "assistant", "content": None}
+    calls: Dict[int, Dict[str, Any]] = {}
+    finish_reason = None
+    usage: Dict[str, Any] = {}
+    delivered = False
+
+    from core.services import http_session
+    session = http_session()
+    try:
+        logger.info(f"Streaming request to Brain: {payload['model']} (Tools: {len(tools) if tools else 0})")
+
+        while True:
             async with session.post(
-                BASE_URL, 
-                headers=headers, 
-                json=payload, 
-                timeout=aiohttp.ClientTimeout(total=TIMEOUT_SECONDS)
+                BASE_URL,
+                headers=headers,
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=TIMEOUT_SECONDS, sock_read=TIMEOUT_SECONDS)
             ) as response:
-                
-                # Handle HTTP Errors
+
+                if response.status == 400 and "stream_options" in payload:
+                    # Endpoints without stream_options support answer 400: try once without it
+                    logger.warning(f"Provider rejected the streamed request, retrying without stream_options: {await response.text()}")
+                    del payload["stream_options"]
+                    continue
+                if response.status == 200 and STREAM_USAGE and "stream_options" not in payload and not _stream_options_rejected:
+                    logger.warning("Streaming without stream_options from now on (no token usage for streamed calls).")
+                    _stream_options_rejected = True
+
                 if response.status != 200:
                     error_text = await response.text()
                     logger.error(f"AI API Error {response.status}: {error_text}")
-                    
-                    # Raise for retry if it's a server error or rate limit
                     if response.status in [429, 500, 502, 503, 504]:
                         raise AIError(f"Upstream Error {response.status}")
-                    
                     return {"status": "error", "message": f"Provider Error: {error_text}"}
 
-                # Success
-                raw_data = await response.json()
-                return _normalize_response(raw_data)
-
-        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-            logger.warning(f"Network error interacting with AI: {e}")
-            raise # Trigger Tenacity retry
-        except AIError as e:
-            logger.warning(f"AI response error: {e}")
-            raise
-        except Exception as e:
-            logger.exception(f"Unexpected error in AI Client: {e}")
-            return {"status": "error", "message": str(e)}
\ No newline at end of file
+                async for raw_line in response.content:
+                    line = raw_line.decode("utf-8", errors="replace").strip()
+                    if not line.startswith("data:"):
+                        continue        # blank separators, ': keep-alive' comments, 'event:' lines
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    if chunk.get("error"):
+                        raise AIError(str(chunk["error"]))
+                    if chunk.get("usage"):
+                        usage = chunk["usage"]
+                    for choice in chunk.get("choices") or []:
+                        if choice.get("index", 0) != 0:
+                            continue
+                        finish_reason = choice.get("finish_reason") or finish_reason
+                        for index, name, fragment in _merge_delta(message, calls, choice.get("delta") or {}):
+                            if on_tool_delta is not None:
+                                delivered = True
+                                await on_tool_delta(index, name, fragment)
+            break
+
+        if calls:
+            message["tool_calls"] = [calls[index] for index in sorted(calls)]
+        return _normalize_response({"choices": [{"message": message, "finish_reason": finish_reason}], "usage": usage})
+
+    except (aiohttp.ClientError, asyncio.TimeoutError, AIError) as e:
+        if delivered:
+            logger.error(f"Stream broke off after partial output: {e}")
+            raise StreamError(str(e)) from e
+        logger.warning(f"Error streaming from AI: {e}")
+        raise # Trigger Tenacity retry
+    except Exception as e:
+        logger.exception(f"Unexpected error in AI Client stream: {e}")
+        return {"status": "error", "message": str(e)}
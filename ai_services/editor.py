@@ -5,7 +5,10 @@ from typing import Dict, Any, List, Optional
 
 from ai_services import client
 from core import agent_tools
-from core.memory_store import MemoryStore
+from core.memory_store import MemoryStore, prior_chapter
+from core.prompt_template import PromptTemplate, persona_template
+from core.services import get_services
+from core.story_bible import StoryBible
 
 logger = logging.getLogger(__name__)
 
@@ -13,40 +16,118 @@ class EditorError(Exception):
     """Custom exception for validation failures."""
     pass
 
-def _load_json_config(path: Path) -> Dict[str, Any]:
-    """Helper to safely load configuration files."""
-    try:
-        if not path.exists():
-            # Timeline/Characters might be empty in early stages
-            if path.name in ["timeline.json", "characters.json"]:
-                return {}
-            logger.warning(f"Config file missing: {path}")
-            return {}
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        logger.error(f"Failed to load config {path}: {e}")
-        return {}
+def _hydrate_prompt(template: PromptTemplate, bible: StoryBible) -> str:
+    """Injects project constraints into the compiled system prompt."""
+    story_brief = bible.fragment("story_brief")
+    hydrated = template.render({
+        "title": bible.get("project_conf", "meta", "title", default="Untitled"),
+        "genre": bible.get("project_conf", "style", "genre", default="General Fiction"),
+        "style_guide": bible.fragment("project_conf", "style", default={}),
+        "forbidden_tropes": bible.fragment("project_conf", "constraints", "forbidden_tropes", default=[]),
+        "story_brief": story_brief
+    })
 
-def _hydrate_prompt(template: str, project_conf: Dict[str, Any], story_brief: Dict[str, Any]) -> str:
-    """Injects project constraints into the system prompt."""
-    replacements = {
-        "{{title}}": project_conf.get("meta", {}).get("title", "Untitled"),
-        "{{genre}}": project_conf.get("style", {}).get("genre", "General Fiction"),
-        "{{style_guide}}": json.dumps(project_conf.get("style", {}), indent=2),
-        "{{forbidden_tropes}}": json.dumps(project_conf.get("constraints", {}).get("forbidden_tropes", []), indent=2),
-        "{{story_brief}}": json.dumps(story_brief or {}, indent=2)
-    }
-    
-    hydrated = template
-    for key, value in replacements.items():
-        hydrated = hydrated.replace(key, str(value))
-
-    if "{{story_brief}}" not in template:
-        hydrated += f"\n\nSTORY BRIEF (Source of Truth):\n{replacements['{{story_brief}}']}"
+    if "story_brief" not in template.slots:
+        hydrated += f"\n\nSTORY BRIEF (Source of Truth):\n{story_brief}"
     
     return hydrated
 
+# Tool definitions, shared by every call (read-only)
+TOOLS_SCHEMA = [
+    {
+        "type": "function",
+        "function": {
+            "name": "read_file",
+            "description": "Read other files to verify cross-chapter continuity. Read only what you need: a section, a line range or the last N tokens.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "path": {"type": "string"},
+                    "section": {"type": "string", "description": "Markdown heading to read (up to the next heading of its level)."},
+                    "lines": {"type": "string", "description": "1-based inclusive line range, e.g. '10-40'."},
+                    "tail_tokens": {"type": "integer", "description": "Read only the last N tokens."},
+                    "start": {"type": "integer", "description": "Character offset to start at (negative counts from the end)."},
+                    "end": {"type": "integer", "description": "Character offset to stop at."}
+                },
+                "required": ["path"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "check_memory",
+            "description": "Search the RAG Memory (Long-term history) to verify facts from previous chapters.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "The question or fact to check, e.g., 'What color are Kael's eyes?'"
+                    }
+                },
+                "required": ["query"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "edit_file",
+            "description": "Fix minor typos or grammatical errors in the target file.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "path": {"type": "string"},
+                    "search_text": {"type": "string"},
+                    "replace_text": {"type": "string"}
+                },
+                "required": ["path", "search_text", "replace_text"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "apply_edits",
+            "description": "Fix several minor typos or grammatical errors in the target file in one call.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "path": {"type": "string"},
+                    "edits": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "search_text": {"type": "string"},
+                                "replace_text": {"type": "string"}
+                            },
+                            "required": ["search_text", "replace_text"]
+                        }
+                    }
+                },
+                "required": ["path", "edits"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "patch_file",
+            "description": "Rewrite whole lines/paragraphs of the target file with a diff ('@@' hunks of ' ' context, '-' removed, '+' added lines; '@@ 40-42 @@' replaces lines 40-42). All hunks apply or none do.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "path": {"type": "string"},
+                    "patch": {"type": "string"}
+                },
+                "required": ["path", "patch"]
+            }
+        }
+    }
+]
+
 # --- Main Service Logic ---
 
 async def execute(task_payload: Dict[str, Any], project_root: Path, memory_store: Optional[MemoryStore] = None) -> Dict[str, Any]:
@@ -68,17 +149,10 @@ async def execute(task_payload: Dict[str, Any], project_root: Path, memory_store
 
     logger.info(f"Editor Service: Reviewing {target_file}...")
 
-    # 1. Calculate Paths
-    bible_dir = project_root / "data" / "story_bible"
+    # 1-2. Story Bible: shared per project, re-read only when a file changes
+    bible = get_services(project_root).bible
     
-    # 2. Load Data
-    personas = _load_json_config(bible_dir / "personas.json")
-    project_conf = _load_json_config(bible_dir / "project_conf.json")
-    story_brief = _load_json_config(bible_dir / "story_brief.json")
-    characters = _load_json_config(bible_dir / "characters.json")
-    timeline = _load_json_config(bible_dir / "timeline.json")
-    
-    editor_config = personas.get("editor")
+    editor_config = bible.personas.get("editor")
     if not editor_config:
         raise EditorError("Editor persona definition missing.")
 
@@ -93,14 +167,22 @@ async def execute(task_payload: Dict[str, Any], project_root: Path, memory_store
     # We provide the full character list and timeline for checking.
     truth_context = f"""
     CHARACTERS:
-    {json.dumps(characters, indent=2)}
+    {bible.fragment("characters")}
 
     TIMELINE:
-    {json.dumps(timeline, indent=2)}
+    {bible.fragment("timeline")}
+    """
+    if memory_store:
+        # Compact recap of the locked chapters instead of re-reading them
+        story_so_far = memory_store.story_so_far(max_chapter=prior_chapter(target_file))
+        if story_so_far:
+            truth_context += f"""
+    STORY SO FAR (summaries of locked chapters):
+    {story_so_far}
     """
 
     # 5. Prepare Prompts & Tool Loop
-    system_prompt = _hydrate_prompt(editor_config.get("system_prompt", ""), project_conf, story_brief)
+    system_prompt = _hydrate_prompt(persona_template(bible, "editor"), bible)
     
     initial_user_msg = f"""
     REVIEW TASK:
@@ -115,7 +197,8 @@ async def execute(task_payload: Dict[str, Any], project_root: Path, memory_store
     INSTRUCTIONS:
     1. If you doubt a fact (e.g. "Is Kael left-handed?"), use 'check_memory' to search past chapters.
     2. If you need to verify a specific file, use 'read_file'.
-    3. If you find small typos, you MAY use 'edit_file' to fix them immediately.
+    3. If you find small typos, you MAY fix them immediately: use 'apply_edits' with all fixes in one call
+       ('patch_file' when whole lines need rewriting).
     4. If you find MAJOR plot holes or continuity errors, do NOT fix them. Flag them.
     5. FINAL OUTPUT must be a JSON object: {{"verdict": "PASS" | "FAIL", "notes": ["Error 1", "Error 2"]}}
     """
@@ -125,56 +208,8 @@ async def execute(task_payload: Dict[str, Any], project_root: Path, memory_store
         {"role": "user", "content": initial_user_msg}
     ]
 
-    # Define Tools available to the Editor
-    tools_schema = [
-        {
-            "type": "function",
-            "function": {
-                "name": "read_file",
-                "description": "Read other files to verify cross-chapter continuity.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "path": {"type": "string"}
-                    },
-                    "required": ["path"]
-                }
-            }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "check_memory",
-                "description": "Search the RAG Memory (Long-term history) to verify facts from previous chapters.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "query": {
-                            "type": "string",
-                            "description": "The question or fact to check, e.g., 'What color are Kael's eyes?'"
-                        }
-                    },
-                    "required": ["query"]
-                }
-            }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "edit_file",
-                "description": "Fix minor typos or grammatical errors in the target file.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "path": {"type": "string"},
-                        "search_text": {"type": "string"},
-                        "replace_text": {"type": "string"}
-                    },
-                    "required": ["path", "search_text", "replace_text"]
-                }
-            }
-        }
-    ]
+    # Tools available to the Editor (built once, at import)
+    tools_schema = TOOLS_SCHEMA
 
     # 6. Execution Loop (The ReAct Cycle)
     max_turns = 5
@@ -223,11 +258,15 @@ async def execute(task_payload: Dict[str, Any], project_root: Path, memory_store
                 result = {"status": "error", "data": "Tool not found"}
                 
                 if func_name == "read_file":
-                    result = await agent_tools.read_file(args["path"], project_root)
+                    ranges = {k: args[k] for k in ("section", "lines", "tail_tokens", "start", "end") if args.get(k) is not None}
+                    result = await agent_tools.read_file(args["path"], project_root, **ranges)
+                    if result["status"] == "success" and result["meta"].get("range"):
+                        result = dict(result, data=f"[{result['meta']['range']}]\n{result['data']}")
                 
                 elif func_name == "check_memory":
                     if memory_store:
-                        memory_context = memory_store.query(args["query"])
+                        # Causal retrieval: facts established before this chapter
+                        memory_context = await memory_store.aquery(args["query"], max_chapter=prior_chapter(target_file))
                         result = {"status": "success", "data": memory_context if memory_context else "No relevant memory found."}
                     else:
                         result = {"status": "error", "data": "RAG Memory is offline."}
@@ -239,6 +278,18 @@ async def execute(task_payload: Dict[str, Any], project_root: Path, memory_store
                     else:
                         result = await agent_tools.edit_file(args["path"], args["search_text"], args["replace_text"], project_root)
 
+                elif func_name == "apply_edits":
+                    if target_file not in args.get("path", ""):
+                        result = {"status": "error", "data": f"Access Denied: You may only edit the target file '{target_file}'."}
+                    else:
+                        result = await agent_tools.apply_edits(args["path"], args.get("edits") or [], project_root)
+
+                elif func_name == "patch_file":
+                    if target_file not in args.get("path", ""):
+                        result = {"status": "error", "data": f"Access Denied: You may only edit the target file '{target_file}'."}
+                    else:
+                        result = await agent_tools.patch_file(args["path"], args.get("patch", ""), project_root)
+
                 # 3. Append Tool Output
                 messages.append({
                     "role": "tool",
@@ -1,73 +1,257 @@
-import json
+import os
 import logging
+import asyncio
+import functools
 from pathlib import Path
 from typing import Dict, Any, List, Optional
 
 from ai_services import client
 from core import agent_tools
-from core.memory_store import MemoryStore
+from core.entity_matcher import character_matcher, location_matcher
+from core.memory_store import MemoryStore, prior_chapter
+from core.prompt_template import PromptTemplate, persona_template
+from core.services import get_services
+from core.story_bible import StoryBible
+from core.tool_stream import ArgumentStream
 
 logger = logging.getLogger(__name__)
 
+# --- Configuration ---
+EXISTING_TAIL_TOKENS = 500       # End of the chapter shown for continuity (~2000 chars)
+REVISE_REFERENCE_CHARS = 4000    # Start of the chapter shown in revise mode
+# Stream write/append calls into the manuscript while the model is still generating them
+LIVE_STREAM = os.getenv("NARRATOR_STREAM", "true").strip().lower() not in {"0", "false", "no", "off"}
+
 class NarratorError(Exception):
     """Custom exception for generation failures."""
     pass
 
-def _load_json_config(path: Path) -> Dict[str, Any]:
-    """Helper to safely load configuration files."""
-    try:
-        if not path.exists():
-            logger.warning(f"Config file missing: {path}")
-            return {}
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        logger.error(f"Failed to load config {path}: {e}")
-        return {}
+class _LiveDraft:
+    """
+    Feeds the content of the response's first write_file/append_file call into
+    the manuscript as it streams in (agent_tools.ManuscriptStream), routed like
+    the finished call will be: write in generate mode, append otherwise.
+    """
+
+    def __init__(self, path: str, project_root: Path, append: bool):
+        self.path = path
+        self.project_root = project_root
+        self.append = append
+        self.index: Optional[int] = None
+        self.stream: Optional[agent_tools.ManuscriptStream] = None
+        self._args = ArgumentStream("content")
+        self._unnamed: Dict[int, List[str]] = {}     # fragments that arrived before their tool name
+        self._failed = False
+
+    async def on_tool_delta(self, index: int, name: str, fragment: str) -> None:
+        if self._failed:
+            return
+        if self.index is None:
+            if not name:
+                self._unnamed.setdefault(index, []).append(fragment)
+                return
+            if name not in {"write_file", "append_file"}:
+                return
+            self.index = index
+            fragment = "".join(self._unnamed.pop(index, [])) + fragment
+        if index != self.index:
+            return
+        text = self._args.feed(fragment)
+        if not text:
+            return
+        try:
+            if self.stream is None:
+                self.stream = await agent_tools.open_stream(self.path, self.project_root, append=self.append)
+            await self.stream.feed(text)
+        except Exception as e:
+            logger.warning(f"Live streaming to {self.path} failed, the chapter will be written when the response completes: {e}")
+            self._failed = True
+            await self.abort(str(e))
 
-def _get_active_characters(context_notes: str, all_characters: Dict[str, Any]) -> str:
+    async def finish(self, content: str) -> Optional[Dict[str, Any]]:
+        """Result of landing the finished call through the stream, or None if nothing was streamed."""
+        if self.stream is None or self.stream.closed:
+            return None
+        return await self.stream.finish(content)
+
+    async def abort(self, reason: str) -> None:
+        if self.stream is not None and not self.stream.closed:
+            result = await self.stream.abort(reason)
+            logger.info(f"Narrator live draft aborted ({reason}): {result['data']}")
+
+def _get_active_characters(context_notes: str, bible: StoryBible) -> str:
     """
-    Filters the full character database to include only those mentioned in the prompt.
+    Filters the full character database to include only those mentioned in the prompt
+    (whole-word name or alias matches, one pass over the instructions).
     """
-    active_context = []
-    for char_id, char_data in all_characters.items():
-        names_to_check = [char_data.get("name", "")] + char_data.get("aliases", [])
-        if any(name.lower() in context_notes.lower() for name in names_to_check if name):
-            active_context.append(json.dumps(char_data, indent=2))
+    active_context = [bible.fragment("characters", char_id) for char_id in character_matcher(bible).find(context_notes)]
     
     if not active_context:
         return "No specific characters detected in instructions. Use general archetype knowledge."
     
     return "\n\n".join(active_context)
 
-def _get_active_location(context_notes: str, all_locations: Dict[str, Any]) -> str:
-    """Similar to character filtering, but for settings."""
-    for loc_id, loc_data in all_locations.items():
-        if loc_data.get("name", "").lower() in context_notes.lower():
-            return json.dumps(loc_data, indent=2)
+def _get_active_location(context_notes: str, bible: StoryBible) -> str:
+    """Similar to character filtering, but for settings (the first one in the bible wins)."""
+    found = location_matcher(bible).find(context_notes)
+    if found:
+        return bible.fragment("locations", found[0])
     return "Location context not specified."
 
-def _hydrate_prompt(template: str, project_conf: Dict[str, Any], story_brief: Dict[str, Any], char_context: str, rag_context: str) -> str:
-    """Injects dynamic variables (including RAG memory) into the system prompt."""
-    replacements = {
-        "{{title}}": project_conf.get("meta", {}).get("title", "Untitled"),
-        "{{genre}}": project_conf.get("style", {}).get("genre", "Fiction"),
-        "{{tone}}": project_conf.get("style", {}).get("tone", "Standard"),
-        "{{style_guide}}": json.dumps(project_conf.get("style", {}), indent=2),
-        "{{story_brief}}": json.dumps(story_brief or {}, indent=2),
-        "{{character_context}}": char_context,
-        "{{rag_context}}": rag_context or "No relevant long-term memory retrieved."
-    }
-    
-    hydrated = template
-    for key, value in replacements.items():
-        hydrated = hydrated.replace(key, str(value))
+def _hydrate_prompt(template: PromptTemplate, bible: StoryBible, char_context: str, rag_context: str, story_so_far: str = "") -> str:
+    """Injects dynamic variables (including RAG memory) into the compiled system prompt."""
+    story_brief = bible.fragment("story_brief")
+    hydrated = template.render({
+        "title": bible.get("project_conf", "meta", "title", default="Untitled"),
+        "genre": bible.get("project_conf", "style", "genre", default="Fiction"),
+        "tone": bible.get("project_conf", "style", "tone", default="Standard"),
+        "style_guide": bible.fragment("project_conf", "style", default={}),
+        "story_brief": story_brief,
+        "character_context": char_context,
+        "rag_context": rag_context or "No relevant long-term memory retrieved.",
+        "story_so_far": story_so_far or "No earlier chapters have been locked yet."
+    })
 
-    if "{{story_brief}}" not in template:
-        hydrated += f"\n\nSTORY BRIEF (Source of Truth):\n{replacements['{{story_brief}}']}"
+    if "story_brief" not in template.slots:
+        hydrated += f"\n\nSTORY BRIEF (Source of Truth):\n{story_brief}"
+
+    if story_so_far and "story_so_far" not in template.slots:
+        hydrated += f"\n\nSTORY SO FAR (summaries of locked chapters):\n{story_so_far}"
     
     return hydrated
 
+@functools.lru_cache(maxsize=64)
+def _tools_schema(target_file: str) -> List[Dict[str, Any]]:
+    """The Narrator's tool definitions for one target file, built once per target (shared: read-only)."""
+    return [
+        {
+            "type": "function",
+            "function": {
+                "name": "write_file",
+                "description": "Writes the generated story content to the target manuscript file.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "path": {
+                            "type": "string",
+                            "description": f"Must be 'manuscripts/{target_file}'"
+                        },
+                        "content": {
+                            "type": "string",
+                            "description": "The full markdown content of the chapter/scene."
+                        }
+                    },
+                    "required": ["path", "content"]
+                }
+            }
+        },
+        {
+            "type": "function",
+            "function": {
+                "name": "append_file",
+                "description": "Appends the generated story content to the target manuscript file.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "path": {
+                            "type": "string",
+                            "description": f"Must be 'manuscripts/{target_file}'"
+                        },
+                        "content": {
+                            "type": "string",
+                            "description": "Markdown content to append to the chapter."
+                        }
+                    },
+                    "required": ["path", "content"]
+                }
+            }
+        },
+        {
+            "type": "function",
+            "function": {
+                "name": "edit_file",
+                "description": "Make a targeted find-and-replace edit to improve/revise specific passages. Use for revisions.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "path": {
+                            "type": "string",
+                            "description": f"Must be 'manuscripts/{target_file}'"
+                        },
+                        "search_text": {
+                            "type": "string",
+                            "description": "The EXACT text passage to find and replace. Must match existing content exactly."
+                        },
+                        "replace_text": {
+                            "type": "string",
+                            "description": "The improved/revised text to replace the search_text with."
+                        }
+                    },
+                    "required": ["path", "search_text", "replace_text"]
+                }
+            }
+        },
+        {
+            "type": "function",
+            "function": {
+                "name": "apply_edits",
+                "description": "Apply several find-and-replace revisions to the target file in one pass. Preferred for revisions.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "path": {
+                            "type": "string",
+                            "description": f"Must be 'manuscripts/{target_file}'"
+                        },
+                        "edits": {
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "search_text": {
+                                        "type": "string",
+                                        "description": "The passage to replace, copied from the existing content."
+                                    },
+                                    "replace_text": {
+                                        "type": "string",
+                                        "description": "The revised text."
+                                    }
+                                },
+                                "required": ["search_text", "replace_text"]
+                            }
+                        }
+                    },
+                    "required": ["path", "edits"]
+                }
+            }
+        },
+        {
+            "type": "function",
+            "function": {
+                "name": "patch_file",
+                "description": "Apply a diff to the target file: the cheapest way to rewrite whole paragraphs. All hunks apply or none do.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "path": {
+                            "type": "string",
+                            "description": f"Must be 'manuscripts/{target_file}'"
+                        },
+                        "patch": {
+                            "type": "string",
+                            "description": (
+                                "Hunks, each starting with an '@@' line ('@@ -40,3 +40,3 @@' or just '@@'). Lines: ' ' unchanged context, "
+                                "'-' removed, '+' added; context and removed lines may be cut to their first words plus '...'. "
+                                "'@@ 40-42 @@' followed by new lines replaces lines 40-42."
+                            )
+                        }
+                    },
+                    "required": ["path", "patch"]
+                }
+            }
+        }
+    ]
+
 # --- Main Service Logic ---
 
 async def execute(task_payload: Dict[str, Any], project_root: Path, memory_store: Optional[MemoryStore] = None) -> Dict[str, Any]:
@@ -88,44 +272,40 @@ async def execute(task_payload: Dict[str, Any], project_root: Path, memory_store
     
     logger.info(f"Narrator Service: Starting job for {target_file}")
 
-    # 1. Calculate Paths
-    bible_dir = project_root / "data" / "story_bible"
-    
-    # 2. Load Configurations
-    personas = _load_json_config(bible_dir / "personas.json")
-    project_conf = _load_json_config(bible_dir / "project_conf.json")
-    story_brief = _load_json_config(bible_dir / "story_brief.json")
-    characters = _load_json_config(bible_dir / "characters.json")
-    locations = _load_json_config(bible_dir / "locations.json")
+    # 1-2. Story Bible: shared per project, re-read only when a file changes
+    bible = get_services(project_root).bible
     
-    narrator_config = personas.get("narrator")
+    narrator_config = bible.personas.get("narrator")
     if not narrator_config:
         raise NarratorError("Narrator persona definition missing.")
 
     # 3. Build Context
-    char_context = _get_active_characters(instructions, characters)
-    loc_context = _get_active_location(instructions, locations)
+    char_context = _get_active_characters(instructions, bible)
+    loc_context = _get_active_location(instructions, bible)
     
     # 3b. RAG Retrieval
     rag_context = ""
+    story_so_far = ""
     if memory_store:
         # Query memory for relevant past events based on the instructions
         query_text = f"{instructions} {char_context}"[:500] # Truncate query
-        rag_context = memory_store.query(query_text)
-        logger.info(f"Narrator RAG: Retrieved {len(rag_context)} chars of context.")
+        # Causal retrieval: only chapters before the one being written
+        max_chapter = prior_chapter(target_file)
+        rag_context = await memory_store.aquery(query_text, max_chapter=max_chapter)
+        story_so_far = memory_store.story_so_far(max_chapter=max_chapter)
+        logger.info(f"Narrator RAG: Retrieved {len(rag_context)} chars of context, {len(story_so_far)} chars of story so far.")
 
     # 4. Hydrate System Prompt
-    system_prompt_template = narrator_config.get("system_prompt", "")
-    system_prompt = _hydrate_prompt(system_prompt_template, project_conf, story_brief, char_context, rag_context)
+    system_prompt = _hydrate_prompt(persona_template(bible, "narrator"), bible, char_context, rag_context, story_so_far)
 
-    # 5. Check for Existing Content (Continuity)
-    current_content = ""
+    # 5. Check for Existing Content (Continuity): only the parts the prompt shows are read
     read_path = f"manuscripts/{target_file}"
-    read_result = await agent_tools.read_file(read_path, project_root)
+    tail_content = ""
+    read_result = await agent_tools.read_file(read_path, project_root, tail_tokens=EXISTING_TAIL_TOKENS)
     if read_result["status"] == "success":
-        current_content = read_result["data"]
+        tail_content = read_result["data"]
 
-    has_existing_content = bool((current_content or "").strip())
+    has_existing_content = bool((tail_content or "").strip())
     
     # 5b. Detect operation type from instructions
     instructions_lower = instructions.lower()
@@ -164,16 +344,21 @@ async def execute(task_payload: Dict[str, Any], project_root: Path, memory_store
     - Ensure smooth transition from existing content.
     """
     else:  # revise
+        head_result = await agent_tools.read_file(read_path, project_root, start=0, end=REVISE_REFERENCE_CHARS)
+        reference_content = head_result["data"] if head_result["status"] == "success" else tail_content
         operation_instructions = f"""
     OPERATION: REVISE/IMPROVE EXISTING CONTENT
     - The instruction asks to improve/revise specific aspects of the existing content.
-    - Use the 'edit_file' tool to make TARGETED changes.
-    - Find the specific passage to change and provide the exact replacement.
+    - Rewriting whole paragraphs: use 'patch_file' with ONE diff holding all changes. Start each
+      change with '@@', then one unchanged line before it (' ' prefix), the old paragraphs ('-'
+      prefix, shortened to their first words followed by '...') and the new ones ('+' prefix).
+    - Small in-sentence fixes: use 'apply_edits' with ALL your edits in ONE call, quoting each
+      passage to change and its replacement.
     - Keep changes surgical - preserve surrounding context.
-    - If the change is substantial, you may need multiple edit_file calls.
+    - Changes must not overlap; each one must identify one place in the text.
     
     FULL EXISTING CONTENT FOR REFERENCE:
-    {current_content[:4000]}
+    {reference_content}
     """
 
     user_message = f"""
@@ -187,8 +372,8 @@ async def execute(task_payload: Dict[str, Any], project_root: Path, memory_store
     
     {operation_instructions}
     
-    EXISTING CONTENT (Last 2000 chars):
-    {current_content[-2000:] if current_content else "(New File)"}
+    EXISTING CONTENT (Last {EXISTING_TAIL_TOKENS} tokens):
+    {tail_content if has_existing_content else "(New File)"}
     
     REQUIREMENTS:
     1. Follow the OPERATION instructions above precisely.
@@ -202,154 +387,127 @@ async def execute(task_payload: Dict[str, Any], project_root: Path, memory_store
         {"role": "user", "content": user_message}
     ]
 
-    # 6. Prepare Tools
-    tools_schema = [
-        {
-            "type": "function",
-            "function": {
-                "name": "write_file",
-                "description": "Writes the generated story content to the target manuscript file.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "path": {
-                            "type": "string",
-                            "description": f"Must be 'manuscripts/{target_file}'"
-                        },
-                        "content": {
-                            "type": "string",
-                            "description": "The full markdown content of the chapter/scene."
-                        }
-                    },
-                    "required": ["path", "content"]
-                }
-            }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "append_file",
-                "description": "Appends the generated story content to the target manuscript file.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "path": {
-                            "type": "string",
-                            "description": f"Must be 'manuscripts/{target_file}'"
-                        },
-                        "content": {
-                            "type": "string",
-                            "description": "Markdown content to append to the chapter."
-                        }
-                    },
-                    "required": ["path", "content"]
-                }
-            }
-        },
-        {
-            "type": "function",
-            "function": {
-                "name": "edit_file",
-                "description": "Make a targeted find-and-replace edit to improve/revise specific passages. Use for revisions.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "path": {
-                            "type": "string",
-                            "description": f"Must be 'manuscripts/{target_file}'"
-                        },
-                        "search_text": {
-                            "type": "string",
-                            "description": "The EXACT text passage to find and replace. Must match existing content exactly."
-                        },
-                        "replace_text": {
-                            "type": "string",
-                            "description": "The improved/revised text to replace the search_text with."
-                        }
-                    },
-                    "required": ["path", "search_text", "replace_text"]
-                }
-            }
-        }
-    ]
+    # 6. Prepare Tools (built once per target file)
+    tools_schema = _tools_schema(target_file)
 
-    # 7. Call The Brain
+    # 7. Call The Brain (streamed: new prose lands in the manuscript as it is generated)
+    generation = dict(
+        messages=messages,
+        model=narrator_config.get("model", "gpt-4"),
+        temperature=narrator_config.get("temperature", 0.9),
+        max_tokens=narrator_config.get("max_tokens", 4000),
+        tools=tools_schema
+    )
+    live = None
+    if LIVE_STREAM and operation_mode != "revise":
+        live = _LiveDraft(f"manuscripts/{target_file}", project_root, append=operation_mode != "generate")
     try:
-        response = await client.generate(
-            messages=messages,
-            model=narrator_config.get("model", "gpt-4"),
-            temperature=narrator_config.get("temperature", 0.9),
-            max_tokens=narrator_config.get("max_tokens", 4000),
-            tools=tools_schema
-        )
+        if live is not None:
+            response = await client.generate_stream(**generation, on_tool_delta=live.on_tool_delta)
+        else:
+            response = await client.generate(**generation)
+    except asyncio.CancelledError:
+        if live is not None:
+            await live.abort("cancelled")
+        raise
     except Exception as e:
         logger.error(f"Narrator Brain Failure: {e}")
+        if live is not None:
+            await live.abort(str(e))
         return {"status": "error", "message": str(e)}
 
     # 8. Handle Tool Execution
-    if response["status"] == "success":
-        data = response["data"]
-        tool_calls = data.get("tool_calls", [])
-
-        if not tool_calls:
-            logger.warning("Narrator produced text but called no tools.")
-            return {"status": "warning", "message": "No file written.", "raw_output": data.get("content")}
-
-        results = []
-        performed_edit_call = False
-        for tool in tool_calls:
-            args = tool["arguments"]
-            safe_path = f"manuscripts/{target_file}"
+    try:
+        if response["status"] == "success":
+            data = response["data"]
+            tool_calls = data.get("tool_calls", [])
+
+            if not tool_calls:
+                if live is not None:
+                    await live.abort("no tool call")
+                logger.warning("Narrator produced text but called no tools.")
+                return {"status": "warning", "message": "No file written.", "raw_output": data.get("content")}
+
+            results = []
+            performed_edit_call = False
+            streamed_call = next((i for i, tool in enumerate(tool_calls) if tool["name"] in {"write_file", "append_file"}), None)
+            for position, tool in enumerate(tool_calls):
+                args = tool["arguments"]
+                safe_path = f"manuscripts/{target_file}"
             
-            if tool["name"] == "edit_file":
-                # Handle targeted edits for revisions
-                performed_edit_call = True
-                logger.info(f"Narrator editing {safe_path}...")
-                result = await agent_tools.edit_file(
-                    safe_path, 
-                    args.get("search_text", ""), 
-                    args.get("replace_text", ""), 
-                    project_root
-                )
-                results.append(result)
+                if tool["name"] == "edit_file":
+                    # Handle targeted edits for revisions
+                    performed_edit_call = True
+                    logger.info(f"Narrator editing {safe_path}...")
+                    result = await agent_tools.edit_file(
+                        safe_path, 
+                        args.get("search_text", ""), 
+                        args.get("replace_text", ""), 
+                        project_root
+                    )
+                    results.append(result)
+
+                elif tool["name"] == "apply_edits":
+                    performed_edit_call = True
+                    logger.info(f"Narrator applying {len(args.get('edits') or [])} edits to {safe_path}...")
+                    result = await agent_tools.apply_edits(safe_path, args.get("edits") or [], project_root)
+                    results.append(result)
+
+                elif tool["name"] == "patch_file":
+                    performed_edit_call = True
+                    logger.info(f"Narrator patching {safe_path}...")
+                    result = await agent_tools.patch_file(safe_path, args.get("patch", ""), project_root)
+                    results.append(result)
                 
-            elif tool["name"] in {"write_file", "append_file"}:
-                logger.info(f"Narrator writing to {safe_path} (mode: {operation_mode})...")
-                # Route based on operation mode, not just what model requested
-                if operation_mode == "generate":
-                    result = await agent_tools.write_file(safe_path, args["content"], project_root)
-                else:
-                    # For continue mode, always append
-                    result = await agent_tools.append_file(safe_path, args["content"], project_root)
-                results.append(result)
-
-        all_ok = all(isinstance(r, dict) and r.get("status") == "success" for r in results)
-        if operation_mode == "revise" and not performed_edit_call:
-            return {
-                "status": "error",
-                "message": "Revision mode required an edit_file call, but none were executed.",
-                "modified_files": [],
-                "tool_results": results,
-                "operation_mode": operation_mode,
-                "cost_metrics": response.get("usage", {})
-            }
+                elif tool["name"] in {"write_file", "append_file"}:
+                    logger.info(f"Narrator writing to {safe_path} (mode: {operation_mode})...")
+                    # The first write/append was streamed into the file already: finish it
+                    result = await live.finish(args.get("content", "")) if live is not None and position == streamed_call else None
+                    if result is not None:
+                        results.append(result)
+                        continue
+                    # Route based on operation mode, not just what model requested
+                    if operation_mode == "generate":
+                        result = await agent_tools.write_file(safe_path, args.get("content", ""), project_root)
+                    else:
+                        # For continue mode, always append
+                        result = await agent_tools.append_file(safe_path, args.get("content", ""), project_root)
+                    results.append(result)
+
+            # A partially applied edit batch still changed the file: the failed edits are in tool_results
+            all_ok = all(isinstance(r, dict) and r.get("status") in {"success", "partial"} for r in results)
+            if operation_mode == "revise" and not performed_edit_call:
+                return {
+                    "status": "error",
+                    "message": "Revision mode required a patch_file, apply_edits or edit_file call, but none were executed.",
+                    "modified_files": [],
+                    "tool_results": results,
+                    "operation_mode": operation_mode,
+                    "cost_metrics": response.get("usage", {})
+                }
+
+            if not all_ok:
+                return {
+                    "status": "error",
+                    "message": "One or more file operations failed.",
+                    "modified_files": [],
+                    "tool_results": results,
+                    "operation_mode": operation_mode,
+                    "cost_metrics": response.get("usage", {})
+                }
 
-        if not all_ok:
             return {
-                "status": "error",
-                "message": "One or more file operations failed.",
-                "modified_files": [],
+                "status": "success",
+                "modified_files": [target_file],
                 "tool_results": results,
                 "operation_mode": operation_mode,
                 "cost_metrics": response.get("usage", {})
             }
-
-        return {
-            "status": "success",
-            "modified_files": [target_file],
-            "tool_results": results,
-            "operation_mode": operation_mode,
-            "cost_metrics": response.get("usage", {})
-        }
-    else:
-        return {"status": "error", "message": "Brain returned failure status."}
\ No newline at end of file
+        else:
+            if live is not None:
+                await live.abort("brain returned failure status")
+            return {"status": "error", "message": "Brain returned failure status."}
+    finally:
+        # However the call ends (return, error, cancellation), a stream still open is undone
+        if live is not None:
+            await live.abort("streamed call not executed")
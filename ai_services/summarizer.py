@@ -0,0 +1,54 @@
+import os
+import logging
+
+from ai_services import client
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL") or client.DEFAULT_MODEL
+
+_LEVEL_GUIDANCE = {
+    "scene": "Summarize this scene: who is present, what happens, and any fact later chapters must respect (injuries, objects, promises, revelations).",
+    "chapter": "Merge these scene summaries into one chapter summary. Keep plot-critical facts and each character's state at the end of the chapter.",
+    "act": "Merge these chapter summaries into one act summary. Keep the main arc, unresolved threads and facts that stay true afterwards.",
+}
+
+
+class SummarizerError(Exception):
+    """Raised when the model returns no usable summary."""
+    pass
+
+
+async def summarize(text: str, level: str, max_words: int) -> str:
+    """
+    LLM summarizer for the summary tree (core/summary_tree.py).
+    Raises on failure; the tree then falls back to its extractive summarizer.
+    """
+    guidance = _LEVEL_GUIDANCE.get(level, _LEVEL_GUIDANCE["chapter"])
+    messages = [
+        {
+            "role": "system",
+            "content": (
+                "You are the continuity archivist of a novel. "
+                f"{guidance} Write plain past-tense prose, at most {max_words} words. "
+                "No headings, no commentary, no invented details."
+            ),
+        },
+        {"role": "user", "content": text},
+    ]
+
+    response = await client.generate(
+        messages=messages,
+        model=SUMMARY_MODEL,
+        temperature=0.2,
+        max_tokens=max(128, max_words * 3)
+    )
+    if response.get("status") != "success":
+        raise SummarizerError(response.get("message", "summary generation failed"))
+
+    content = (response.get("data", {}).get("content") or "").strip()
+    if not content:
+        raise SummarizerError("empty summary")
+    logger.debug(f"Summarized {level} ({len(text)} chars -> {len(content)} chars)")
+    return content
@@ -0,0 +1,117 @@
+"""
+Document Benchmark
+------------------
+Cost of many small edits to one long chapter, one tool call per edit (the
+Editor's fix-as-you-read pattern), through core/agent_tools.py.
+
+- write_through: AGENT_TOOLS_FLUSH_INTERVAL=0, every edit rewrites the file
+  (what every edit did before open Documents)
+- deferred:      edits land in the open Document's piece table and are written
+  back once per flush interval (and at the end)
+
+Also times the raw PieceTable against rebuilding a Python string per edit.
+
+Usage:
+    python benchmarks/document_bench.py
+    python benchmarks/document_bench.py --words 80000 --edits 400
+"""
+
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import importlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.retrieval_bench import generate_novel
+from core.piece_table import PieceTable
+
+
+def _edits(text: str, count: int, seed: int):
+    rng = random.Random(seed)
+    words = sorted({w for w in text.split() if len(w) > 6})
+    return [rng.choice(words) for _ in range(count)]
+
+
+async def _run_tools(text: str, targets, interval: float) -> float:
+    import os
+    os.environ["AGENT_TOOLS_FLUSH_INTERVAL"] = str(interval)
+    from core import agent_tools, buffer_cache
+    importlib.reload(agent_tools)
+    buffer_cache.manuscript_cache.invalidate()
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        path = root / "data" / "manuscripts" / "ch01.md"
+        path.parent.mkdir(parents=True)
+        path.write_text(text, encoding="utf-8")
+        started = time.perf_counter()
+        for word in targets:
+            # A 40-char slice from the current text keeps every edit unique
+            content = (await agent_tools.read_file("manuscripts/ch01.md", root))["data"]
+            at = content.find(word)
+            search = content[at:at + 40]
+            await agent_tools.apply_edits("manuscripts/ch01.md", [{"search_text": search, "replace_text": search.upper()}], root)
+        await agent_tools.flush()
+        elapsed = time.perf_counter() - started
+        buffer_cache.manuscript_cache.invalidate()
+        return elapsed
+
+
+def _raw(text: str, count: int, seed: int, batch: bool):
+    """(str rebuild seconds, piece table seconds, pieces) for `count` 10-char replacements:
+    at random offsets one after another, or as one batch applied back to front (as the tools do)."""
+    rng = random.Random(seed)
+    spans = []
+    length = len(text)
+    for _ in range(count):
+        start = rng.randrange(length - 20)
+        spans.append((start, start + 10, "EDITED"))
+        if not batch:
+            length += len("EDITED") - 10
+    if batch:
+        spans = sorted({start: (start, end, r) for start, end, r in spans if start % 10 == 0}.values(), reverse=True)
+
+    started = time.perf_counter()
+    current = text
+    for start, end, replacement in spans:
+        current = current[:start] + replacement + current[end:]
+    string_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    table = PieceTable(text)
+    for start, end, replacement in spans:
+        table.replace(start, end, replacement)
+    result = table.text()
+    table_time = time.perf_counter() - started
+    assert result == current
+    return string_time, table_time, table.piece_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open Document / piece table benchmark")
+    parser.add_argument("--words", type=int, default=50000)
+    parser.add_argument("--edits", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+
+    novel, _ = generate_novel(1, args.words, 0, seed=args.seed)
+    text = next(iter(novel.values()))
+    print(f"chapter: {len(text.split())} words, {len(text)} chars, {args.edits} edits\n")
+
+    for batch in (False, True):
+        string_time, table_time, pieces = _raw(text, args.edits * 10, args.seed, batch)
+        label = "one batch, back to front" if batch else "sequential, random offsets"
+        print(f"raw edits ({label}): str rebuild {string_time * 1000:.1f} ms, piece table {table_time * 1000:.1f} ms ({pieces} pieces)")
+
+    targets = _edits(text, args.edits, args.seed)
+    for name, interval in (("write_through", 0.0), ("deferred", 0.5)):
+        elapsed = asyncio.run(_run_tools(text, targets, interval))
+        print(f"{name:<14} {elapsed * 1000:8.1f} ms total, {elapsed / args.edits * 1000:6.2f} ms per edit")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Entity Matcher Benchmark
+------------------------
+Cost and precision of detecting which characters an instruction mentions, for a
+synthetic shared-universe bible of `--characters` characters (two aliases each,
+some of them short like "Al" or "Ren").
+
+- naive:    what narrator._get_active_characters did before: lowercase the
+            instruction per name, substring test (so "Al" matches "also")
+- matcher:  core/entity_matcher.py, one Aho-Corasick pass with whole-word
+            matching (build time reported separately: it happens once per
+            version of characters.json)
+
+Usage:
+    python benchmarks/entity_bench.py
+    python benchmarks/entity_bench.py --characters 5000 --words 3000
+"""
+
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.retrieval_bench import FILLER, CAST, PLACES, TOWNS
+from core.entity_matcher import EntityMatcher
+
+SYLLABLES = ["al", "ren", "mor", "ka", "el", "vos", "sy", "ra", "th", "an", "dor", "is", "wyn", "ul", "bri", "ce"]
+
+
+def build_bible(count: int, seed: int):
+    rng = random.Random(seed)
+    characters = {}
+    for i in range(count):
+        first = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3))).title()
+        last = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).title()
+        short = rng.choice(SYLLABLES).title()
+        characters[f"char_{i}"] = {"name": f"{first} {last}", "aliases": [short, f"The {last}"]}
+    for i, name in enumerate(CAST):
+        characters[f"cast_{i}"] = {"name": name, "aliases": []}
+    return characters
+
+
+def build_instruction(words: int, seed: int) -> str:
+    rng = random.Random(seed)
+    sentences = []
+    while sum(len(s.split()) for s in sentences) < words:
+        a, b = rng.sample(CAST, 2)
+        sentences.append(rng.choice(FILLER).format(a=a, b=b, p=rng.choice(PLACES), t=rng.choice(TOWNS)))
+    return " ".join(sentences)
+
+
+def naive(characters, text: str):
+    found = []
+    for char_id, char_data in characters.items():
+        names_to_check = [char_data.get("name", "")] + char_data.get("aliases", [])
+        if any(name.lower() in text.lower() for name in names_to_check if name):
+            found.append(char_id)
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Active character detection benchmark")
+    parser.add_argument("--characters", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=1500, help="Instruction length in words")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    characters = build_bible(args.characters, args.seed)
+    text = build_instruction(args.words, args.seed)
+    print(f"bible: {len(characters)} characters; instruction: {len(text.split())} words, {len(text)} chars\n")
+
+    started = time.perf_counter()
+    matcher = EntityMatcher({cid: [c["name"]] + c["aliases"] for cid, c in characters.items()})
+    build = time.perf_counter() - started
+    print(f"matcher build: {build * 1000:.1f} ms, {matcher.states} states (once per characters.json version)")
+
+    runs = {}
+    for name, detect in (("naive", lambda: naive(characters, text)), ("matcher", lambda: matcher.find(text))):
+        started = time.perf_counter()
+        found = detect()
+        runs[name] = (time.perf_counter() - started, found)
+    naive_time, naive_found = runs["naive"]
+    for name, (elapsed, found) in runs.items():
+        print(f"{name:<8} {elapsed * 1000:8.1f} ms  {len(found):5d} characters detected  ({naive_time / elapsed:.1f}x)")
+    spurious = len(set(naive_found) - set(runs["matcher"][1]))
+    print(f"\nnaive detections that are not whole-word mentions: {spurious} (each adds a character sheet to the prompt)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Patch Benchmark
+---------------
+Output tokens a model must emit to revise part of a chapter, per revision tool,
+and the time to apply each (every format must produce the same chapter).
+
+- apply_edits:       one {search_text, replace_text} pair per rewritten paragraph
+- unified:           patch_file with '@@' hunks, one context line, full '-' lines
+- unified_short:     as unified, with context and removed lines cut to '<first words>...'
+- anchored:          patch_file with '@@ 40-42 @@' line-anchored hunks (new lines only)
+
+The chapter comes from the retrieval benchmark's generator (one paragraph per
+line); a `--share` of its paragraphs is rewritten in runs of `--run` paragraphs.
+
+Usage:
+    python benchmarks/patch_bench.py
+    python benchmarks/patch_bench.py --words 20000 --share 0.2 --run 3
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.retrieval_bench import generate_novel, FILLER, CAST, PLACES, TOWNS
+from core.chunker import count_tokens
+from core.edit_engine import plan_edits
+from core.patch_engine import plan_patch
+
+
+def _rewrite(paragraph: str, rng: random.Random) -> str:
+    sentences = []
+    while len(sentences) < max(3, paragraph.count(". ") // 2):
+        a, b = rng.sample(CAST, 2)
+        sentences.append(rng.choice(FILLER).format(a=a, b=b, p=rng.choice(PLACES), t=rng.choice(TOWNS)))
+    return " ".join(sentences)
+
+
+def _short(line: str, words: int = 4) -> str:
+    head = line.split()[:words]
+    return " ".join(head) + "..." if len(head) == words else line
+
+
+def build_revision(text: str, share: float, run: int, seed: int):
+    """(expected text, {format: tool arguments}) for one revision of `share` of the paragraphs."""
+    rng = random.Random(seed)
+    lines = text.splitlines(keepends=True)
+    paragraphs = [i for i, line in enumerate(lines) if line.strip() and not line.startswith("#")]
+    target = max(1, int(len(paragraphs) * share))
+    chosen = set()
+    while len(chosen) < target:
+        first = rng.randrange(len(paragraphs))
+        chosen.update(paragraphs[first:first + run][:target - len(chosen)])
+    runs, current = [], []
+    for i in sorted(chosen):
+        if current and i - current[-1] > 2:
+            runs.append(current)
+            current = []
+        current.append(i)
+    runs.append(current)
+
+    new_lines = list(lines)
+    rewritten = {i: _rewrite(lines[i], rng) + "\n" for i in chosen}
+    for i, line in rewritten.items():
+        new_lines[i] = line
+
+    edits, unified, short, anchored = [], [], [], []
+    for block in runs:
+        first, last = block[0], block[-1]
+        old_span = "".join(lines[first:last + 1]).rstrip("\n")
+        new_span = "".join(new_lines[first:last + 1]).rstrip("\n")
+        edits.append({"search_text": old_span, "replace_text": new_span})
+        for out, cut in ((unified, lambda s: s), (short, _short)):
+            out.append(f"@@ -{first} +{first} @@")
+            if first > 0:
+                out.append(" " + cut(lines[first - 1].rstrip("\n")) if lines[first - 1].strip() else "")
+            for i in range(first, last + 1):
+                if i in rewritten:
+                    out.append("-" + cut(lines[i].rstrip("\n")))
+                    out.append("+" + rewritten[i].rstrip("\n"))
+                else:
+                    out.append(" " + cut(lines[i].rstrip("\n")) if lines[i].strip() else "")
+        anchored.append(f"@@ {first + 1}-{last + 1} @@")
+        anchored.extend(line.rstrip("\n") for line in new_lines[first:last + 1])
+    formats = {
+        "apply_edits": {"path": "manuscripts/ch01.md", "edits": edits},
+        "unified": {"path": "manuscripts/ch01.md", "patch": "\n".join(unified) + "\n"},
+        "unified_short": {"path": "manuscripts/ch01.md", "patch": "\n".join(short) + "\n"},
+        "anchored": {"path": "manuscripts/ch01.md", "patch": "\n".join(anchored) + "\n"},
+    }
+    return "".join(new_lines), formats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Revision tool output-token benchmark")
+    parser.add_argument("--words", type=int, default=8000, help="Chapter length in words")
+    parser.add_argument("--share", type=float, default=0.2, help="Share of paragraphs rewritten")
+    parser.add_argument("--run", type=int, default=2, help="Paragraphs per rewritten passage")
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    novel, _ = generate_novel(1, args.words, 0, seed=args.seed)
+    text = next(iter(novel.values()))
+    expected, formats = build_revision(text, args.share, args.run, args.seed)
+
+    baseline = None
+    print(f"chapter: {count_tokens(text)} tokens, {args.share:.0%} of paragraphs rewritten\n")
+    print(f"{'format':<15}{'tokens':>9}{'vs edits':>10}{'apply ms':>10}  result")
+    for name, arguments in formats.items():
+        tokens = count_tokens(json.dumps(arguments, ensure_ascii=False))
+        baseline = baseline or tokens
+        started = time.perf_counter()
+        if name == "apply_edits":
+            result, outcomes = plan_edits(text, arguments["edits"])
+        else:
+            result, outcomes = plan_patch(text, arguments["patch"])
+        elapsed = (time.perf_counter() - started) * 1000
+        ok = result == expected and all(o["status"] == "applied" for o in outcomes)
+        print(f"{name:<15}{tokens:>9}{tokens / baseline:>10.2f}{elapsed:>10.1f}  {'identical' if ok else 'MISMATCH'}")
+
+
+if __name__ == "__main__":
+    main()
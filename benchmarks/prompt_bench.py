@@ -0,0 +1,104 @@
+"""
+Prompt Build Benchmark
+----------------------
+Per-call cost of building an agent's system prompt and tool list, the work done
+before every model call.
+
+- replace_chain:  one str.replace pass over the whole prompt per placeholder
+                  (what _hydrate_prompt did before)
+- compiled:       core/prompt_template.py: the persona prompt parsed once into
+                  literal/slot segments, rendered with one join
+- tools:          the Narrator's tool list built per call vs once per target
+
+The persona prompt is the project's own, padded with `--pad-kb` of persona text
+(long house-style prompts are common); the bible fragments come from a
+StoryBible; gathering them (one stat per bible file read) is timed separately,
+as both variants pay it.
+
+Usage:
+    python benchmarks/prompt_bench.py
+    python benchmarks/prompt_bench.py --pad-kb 32 --calls 5000
+"""
+
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ai_services import narrator
+from benchmarks.retrieval_bench import generate_novel
+from core.prompt_template import PromptTemplate
+from core.story_bible import StoryBible
+
+BIBLE_DIR = Path(__file__).resolve().parent.parent / "data" / "story_bible"
+
+
+def _values(bible: StoryBible):
+    return {
+        "title": bible.get("project_conf", "meta", "title", default="Untitled"),
+        "genre": bible.get("project_conf", "style", "genre", default="Fiction"),
+        "tone": bible.get("project_conf", "style", "tone", default="Standard"),
+        "style_guide": bible.fragment("project_conf", "style", default={}),
+        "story_brief": bible.fragment("story_brief"),
+        "character_context": bible.fragment("characters"),
+        "rag_context": "No relevant long-term memory retrieved.",
+        "story_so_far": "No earlier chapters have been locked yet.",
+    }
+
+
+def replace_chain(template: str, values) -> str:
+    hydrated = template
+    for key, value in values.items():
+        hydrated = hydrated.replace("{{" + key + "}}", str(value))
+    return hydrated
+
+
+def _time(func, calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - started) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt build benchmark")
+    parser.add_argument("--pad-kb", type=int, default=8, help="Persona text added to the narrator prompt")
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bible_dir = Path(tmp)
+        for path in BIBLE_DIR.glob("*.json"):
+            shutil.copy(path, bible_dir / path.name)
+        personas = json.loads((bible_dir / "personas.json").read_text(encoding="utf-8"))
+        novel, _ = generate_novel(1, args.pad_kb * 180, 0, seed=1)
+        padding = next(iter(novel.values()))[:args.pad_kb * 1024]
+        source = personas["narrator"]["system_prompt"] + "\n\nHOUSE STYLE ({{genre}}, {{tone}}):\n" + padding
+        bible = StoryBible(bible_dir)
+
+        compiled = PromptTemplate(source)
+        values = _values(bible)
+        assert compiled.render(values) == replace_chain(source, values)
+        print(f"prompt: {len(source)} chars, {len(compiled.slots)} slots; {args.calls} calls\n")
+
+        gather = _time(lambda: _values(bible), args.calls)
+        chain = _time(lambda: replace_chain(source, values), args.calls)
+        render = _time(lambda: compiled.render(values), args.calls)
+        parse = _time(lambda: PromptTemplate(source), max(1, args.calls // 10))
+        print(f"{'bible values':<16}{gather * 1e6:9.1f} us/call  (both variants)")
+        print(f"{'replace_chain':<16}{chain * 1e6:9.1f} us/call")
+        print(f"{'compiled':<16}{render * 1e6:9.1f} us/call  ({chain / render:.1f}x; parse {parse * 1e6:.1f} us once per persona version)")
+
+        build = _time(lambda: narrator._tools_schema.__wrapped__("ch01.md"), args.calls)
+        cached = _time(lambda: narrator._tools_schema("ch01.md"), args.calls)
+        print(f"{'tools per call':<16}{build * 1e6:9.1f} us/call")
+        print(f"{'tools cached':<16}{cached * 1e6:9.1f} us/call")
+
+
+if __name__ == "__main__":
+    main()
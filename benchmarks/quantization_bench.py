@@ -0,0 +1,151 @@
+"""
+Quantization Benchmark
+----------------------
+Recall vs. memory for the NumPy index's compact search copy (float16 / int8,
+optional dimension truncation, exact float32 re-ranking of the shortlist).
+Use it to pick `vector_quantization` / `vector_truncate_dim` for a project.
+
+The corpus is synthetic but shaped like real embeddings: clustered, with variance
+concentrated in the leading dimensions. Queries are perturbed corpus vectors and
+recall@k is measured against exact float32 brute force.
+
+Each setting is built in one subprocess and queried in a fresh one, so RSS only
+reflects what a query-serving process actually pages in.
+
+Usage:
+    python benchmarks/quantization_bench.py                          # 50k x 1536
+    python benchmarks/quantization_bench.py --size 100000 --settings none:0 int8:0 int8:512 --rerank 2 4 8
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.vector_index_bench import _rss_mb, _percentile
+
+
+def prepare(workdir: Path, size: int, dim: int, queries: int, k: int, seed: int) -> None:
+    """Writes corpus.npy, queries.npy and truth.npy (exact top-k row ids) into workdir."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    spectrum = (1.0 / np.sqrt(np.arange(1, dim + 1))).astype(np.float32)
+    centers = rng.standard_normal((max(8, size // 200), dim), dtype=np.float32)
+    labels = rng.integers(0, len(centers), size)
+    corpus = (centers[labels] + 0.6 * rng.standard_normal((size, dim), dtype=np.float32)) * spectrum
+    corpus /= np.linalg.norm(corpus, axis=1, keepdims=True)
+
+    picks = rng.integers(0, size, queries)
+    probes = corpus[picks] + 0.4 * rng.standard_normal((queries, dim), dtype=np.float32) * spectrum
+    probes /= np.linalg.norm(probes, axis=1, keepdims=True)
+
+    truth = np.argsort(-(probes @ corpus.T), axis=1)[:, :k]
+    np.save(workdir / "corpus.npy", corpus)
+    np.save(workdir / "queries.npy", probes.astype(np.float32))
+    np.save(workdir / "truth.npy", truth)
+
+
+def _options(setting: str, rerank: int) -> dict:
+    mode, _, truncate = setting.partition(":")
+    return {"quantization": mode, "truncate_dim": int(truncate or 0), "rerank_factor": rerank}
+
+
+def build_case(workdir: Path, setting: str, batch: int) -> dict:
+    import numpy as np
+    from core.vector_index import NumpyVectorIndex
+
+    corpus = np.load(workdir / "corpus.npy", mmap_mode="r")
+    db = workdir / setting.replace(":", "_")
+    index = NumpyVectorIndex(db, **_options(setting, 1))
+    t0 = time.perf_counter()
+    for start in range(0, len(corpus), batch):
+        rows = np.asarray(corpus[start:start + batch])
+        ids = [str(start + i) for i in range(len(rows))]
+        index.add(ids, rows, [""] * len(rows), [{} for _ in ids])
+    return {"ingest_seconds": round(time.perf_counter() - t0, 3)}
+
+
+def query_case(workdir: Path, setting: str, rerank: int, k: int) -> dict:
+    import numpy as np
+    from core.vector_index import NumpyVectorIndex
+
+    probes = np.load(workdir / "queries.npy")
+    truth = np.load(workdir / "truth.npy")
+    rss_start = _rss_mb()
+    index = NumpyVectorIndex(workdir / setting.replace(":", "_"), **_options(setting, rerank))
+
+    latencies, hits = [], 0
+    for probe, expected in zip(probes, truth):
+        t0 = time.perf_counter()
+        results = index.query(probe, n_results=k)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        hits += len({int(r["id"]) for r in results} & set(expected.tolist()))
+    rss_end = _rss_mb()
+
+    manifest = index._manifest
+    size_mb = lambda name: (index.root / name).stat().st_size / 1024 / 1024 if name else 0.0
+    return {
+        "setting": setting,
+        "rerank_factor": rerank,
+        f"recall@{k}": round(hits / (len(probes) * k), 4),
+        "query_p50_ms": round(_percentile(latencies, 50), 3),
+        "query_p99_ms": round(_percentile(latencies, 99), 3),
+        "search_mb": round(size_mb(manifest.get("search")) + size_mb(manifest.get("scales")) or size_mb(manifest.get("vectors")), 1),
+        "float32_mb": round(size_mb(manifest.get("vectors")), 1),
+        "rss_delta_mb": round(rss_end - rss_start, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--settings", nargs="+", default=["none:0", "float16:0", "int8:0", "float16:512", "int8:512", "int8:256"],
+                        help="mode:truncate_dim pairs (truncate_dim 0 = full width)")
+    parser.add_argument("--rerank", nargs="+", type=int, default=[4])
+    parser.add_argument("--batch", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--build", help=argparse.SUPPRESS)
+    parser.add_argument("--query", nargs=2, metavar=("SETTING", "RERANK"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.build:
+        print(json.dumps(build_case(Path(args.workdir), args.build, args.batch)))
+        return
+    if args.query:
+        print(json.dumps(query_case(Path(args.workdir), args.query[0], int(args.query[1]), args.k)))
+        return
+
+    def run(*extra) -> dict:
+        cmd = [sys.executable, __file__, "--workdir", str(workdir), "--k", str(args.k), "--batch", str(args.batch), *extra]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            error = (proc.stderr.strip().splitlines() or ["unknown error"])[-1]
+            return {"error": error[:200]}
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        prepare(workdir, args.size, args.dim, args.queries, args.k, args.seed)
+        for setting in args.settings:
+            built = run("--build", setting)
+            if "error" in built:
+                print(json.dumps({"setting": setting, **built}))
+                continue
+            for rerank in args.rerank:
+                result = run("--query", setting, str(rerank))
+                print(json.dumps({"chunks": args.size, "dim": args.dim, **result, **built}))
+
+
+if __name__ == "__main__":
+    main()
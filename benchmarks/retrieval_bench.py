@@ -0,0 +1,248 @@
+"""
+Retrieval Benchmark
+-------------------
+End-to-end MemoryStore benchmark on a synthetic novel with seeded facts.
+
+A deterministic generator writes N chapters of filler prose that reuses the same
+cast and places (so names alone do not give the answer away) and plants one fact
+per query in a known chapter ("Kael is left-handed." in ch03). Each configuration
+then ingests the novel through the backfill path and answers the query set.
+
+Per configuration it reports:
+- ingest throughput (chunks/sec, tokens/sec)
+- query latency p50/p99 (result cache disabled)
+- recall@k: the planted sentence is in the top-k passages; also with causal
+  retrieval (max_chapter = the fact's chapter)
+- memory: process RSS growth and on-disk size of memory_db
+
+Each configuration runs in a fresh subprocess. Results are JSON lines; --output
+also writes them as one JSON document, and --baseline compares against such a
+file and exits non-zero when recall drops or latency grows past the tolerances.
+
+Usage:
+    python benchmarks/retrieval_bench.py
+    python benchmarks/retrieval_bench.py --configs numpy:hybrid numpy:lexical numpy:hybrid:int8 chroma:hybrid
+    python benchmarks/retrieval_bench.py --output bench.json
+    python benchmarks/retrieval_bench.py --baseline bench.json --max-recall-drop 0.02 --max-latency-growth 1.5
+
+A configuration is backend:mode[:quantization]. The embedder is the offline hashing
+provider unless --embedder openai is given (needs an API key).
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.vector_index_bench import _rss_mb, _percentile
+
+CAST = ["Kael", "Mira", "Orren", "Sable", "Tamsin", "Bryn", "Ilse", "Corvin"]
+PLACES = ["the mill", "the harbour", "the archive", "the salt market", "the watchtower", "the chapel", "the ferry", "the orchard"]
+TOWNS = ["Vell", "Harrowgate", "Lowmere", "Cask", "Tern Hollow", "Aldmoor"]
+OBJECTS = ["brass compass", "silver key", "bone whistle", "ledger", "copper ring", "map case"]
+COLORS = ["grey", "amber", "green", "violet", "hazel", "black"]
+FEARS = ["deep water", "fire", "enclosed rooms", "horses", "the dark", "heights"]
+SEASONS = ["spring", "summer", "autumn", "winter"]
+
+FILLER = [
+    "{a} crossed {p} while the light went thin over {t}.",
+    "Rain worked at the shutters and {a} listened to it without speaking.",
+    "{a} and {b} argued about the road north until neither remembered the point.",
+    "Someone had left a lamp burning in {p}, and {a} did not put it out.",
+    "The bells of {t} rang the hour twice, as they always did on market days.",
+    "{a} counted the coins again and found the same number as before.",
+    "There was bread, and cheese gone hard at the edges, and nobody complained.",
+    "{b} watched {a} from the doorway of {p}, weighing what to say.",
+    "By evening the wind had turned and the boats in {t} strained at their ropes.",
+    "{a} thought of {t} and the winters there, and of who had stayed behind.",
+    "A cart lost a wheel outside {p}; half the street came out to help.",
+    "{a} wrote a letter to {b} and burned it before the ink was dry.",
+]
+
+FACTS = [
+    ("{a} is left-handed, and always has been.", "Which hand does {a} write with?"),
+    ("{a}'s eyes are {c}, like her mother's.", "What colour are {a}'s eyes?"),
+    ("{a} was born in {t}, in the year of the flood.", "Where was {a} born?"),
+    ("{b} gave {a} the {o} on the night they left {t}.", "Who gave {a} the {o}?"),
+    ("{a} has been afraid of {f} since childhood.", "What is {a} afraid of?"),
+    ("{p_cap} burned down in the {s} of the long drought.", "When did {p} burn down?"),
+    ("{a} keeps the {o} sewn into the lining of a coat.", "Where does {a} hide the {o}?"),
+    ("{a} owes {b} forty crowns from a lost wager.", "How much money does {a} owe {b}?"),
+]
+
+
+# --- Synthetic Novel ---
+
+def generate_novel(chapters: int, words_per_chapter: int, facts: int, seed: int):
+    """Returns ({filename: text}, [{"chapter", "fact", "query"}])."""
+    rng = random.Random(seed)
+    slots = {}
+    seeded = []
+    for i in range(facts):
+        template, question = FACTS[i % len(FACTS)]
+        a, b = rng.sample(CAST, 2)
+        place = rng.choice(PLACES)
+        values = {
+            "a": a, "b": b, "p": place, "p_cap": place[0].upper() + place[1:], "t": rng.choice(TOWNS),
+            "o": rng.choice(OBJECTS), "c": rng.choice(COLORS), "f": rng.choice(FEARS), "s": rng.choice(SEASONS),
+        }
+        chapter = rng.randint(1, chapters)
+        fact = template.format(**values)
+        slots.setdefault(chapter, []).append(fact)
+        seeded.append({"chapter": chapter, "fact": fact, "query": question.format(**values)})
+
+    novel = {}
+    for chapter in range(1, chapters + 1):
+        sentences = []
+        while sum(len(s.split()) for s in sentences) < words_per_chapter:
+            a, b = rng.sample(CAST, 2)
+            sentences.append(rng.choice(FILLER).format(a=a, b=b, p=rng.choice(PLACES), t=rng.choice(TOWNS)))
+        for fact in slots.get(chapter, []):
+            sentences.insert(rng.randrange(len(sentences) + 1), fact)
+        paragraphs = [" ".join(sentences[i:i + 6]) for i in range(0, len(sentences), 6)]
+        novel[f"ch{chapter:02d}_Part.md"] = f"# Chapter {chapter}\n\n" + "\n\n".join(paragraphs) + "\n"
+    return novel, seeded
+
+
+# --- One Configuration ---
+
+def run_case(config: str, args) -> dict:
+    backend, mode, *rest = config.split(":")
+    quantization = rest[0] if rest else "none"
+    os.environ.update({
+        "USE_RAG": "true",
+        "RAG_VECTOR_BACKEND": backend,
+        "RAG_RETRIEVAL_MODE": mode,
+        "RAG_NUMPY_QUANTIZATION": quantization,
+        "RAG_EMBEDDING_PROVIDER": args.embedder,
+        "RAG_QUERY_CACHE_SIZE": "0",
+        "RAG_EMBEDDING_CACHE": "false",
+    })
+
+    import asyncio
+    import logging
+    logging.disable(logging.WARNING)
+    from core.memory_store import MemoryStore
+    from core.backfill import Backfill
+
+    novel, seeded = generate_novel(args.chapters, args.words, args.facts, args.seed)
+    rss_start = _rss_mb()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        project_root = Path(tmp)
+        manuscripts = project_root / "data" / "manuscripts"
+        manuscripts.mkdir(parents=True)
+        for name, text in novel.items():
+            (manuscripts / name).write_text(text, encoding="utf-8")
+
+        store = MemoryStore(project_root)
+        if store.retrieval_mode != mode or (mode != "lexical" and store.index is None):
+            raise RuntimeError(f"configuration unavailable (backend={backend}, mode={mode})")
+        report = asyncio.run(Backfill(store, project_root).run())
+
+        latencies, hits, causal_hits = [], 0, 0
+        for item in seeded:
+            t0 = time.perf_counter()
+            context = store.query(item["query"], n_results=args.k, budget_tokens=None)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            hits += item["fact"] in context
+            causal = store.query(item["query"], n_results=args.k, max_chapter=item["chapter"], budget_tokens=None)
+            causal_hits += item["fact"] in causal
+
+        rss_end = _rss_mb()
+        disk = sum(f.stat().st_size for f in store.db_path.rglob("*") if f.is_file())
+        backend_name = store.index.name if store.index is not None else "lexical"
+        store.close()
+
+    return {
+        "config": config,
+        "backend": backend_name,
+        "mode": mode,
+        "quantization": quantization,
+        "embedder": args.embedder,
+        "chapters": args.chapters,
+        "words": args.chapters * args.words,
+        "queries": len(seeded),
+        "ingest_chunks_per_sec": report["chunks_per_sec"],
+        "ingest_tokens_per_sec": report["tokens_per_sec"],
+        "query_p50_ms": round(_percentile(latencies, 50), 3),
+        "query_p99_ms": round(_percentile(latencies, 99), 3),
+        f"recall@{args.k}": round(hits / len(seeded), 4),
+        f"causal_recall@{args.k}": round(causal_hits / len(seeded), 4),
+        "rss_delta_mb": round(rss_end - rss_start, 1),
+        "disk_mb": round(disk / 1024 / 1024, 2),
+    }
+
+
+# --- Regression Check ---
+
+def compare(results, baseline_path: Path, k: int, max_recall_drop: float, max_latency_growth: float) -> list:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {r["config"]: r for r in json.load(f).get("results", []) if "error" not in r}
+    problems = []
+    for result in results:
+        before = baseline.get(result.get("config"))
+        if not before or "error" in result:
+            continue
+        for key in (f"recall@{k}", f"causal_recall@{k}"):
+            if key in before and result[key] < before[key] - max_recall_drop:
+                problems.append(f"{result['config']}: {key} {before[key]} -> {result[key]}")
+        if before.get("query_p50_ms") and result["query_p50_ms"] > before["query_p50_ms"] * max_latency_growth:
+            problems.append(f"{result['config']}: query_p50_ms {before['query_p50_ms']} -> {result['query_p50_ms']}")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--configs", nargs="+", default=["numpy:hybrid", "numpy:vector", "numpy:lexical", "numpy:hybrid:int8", "chroma:hybrid"])
+    parser.add_argument("--chapters", type=int, default=40)
+    parser.add_argument("--words", type=int, default=3000, help="Words per chapter")
+    parser.add_argument("--facts", type=int, default=48, help="Seeded facts (= queries)")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--embedder", default="hashing", choices=["hashing", "openai"])
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write all results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against a previous --output file")
+    parser.add_argument("--max-recall-drop", type=float, default=0.02)
+    parser.add_argument("--max-latency-growth", type=float, default=1.5)
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case, args)))
+        return
+
+    shared = ["--chapters", str(args.chapters), "--words", str(args.words), "--facts", str(args.facts),
+              "--k", str(args.k), "--embedder", args.embedder, "--seed", str(args.seed)]
+    results = []
+    for config in args.configs:
+        proc = subprocess.run([sys.executable, __file__, "--case", config, *shared], capture_output=True, text=True)
+        if proc.returncode != 0:
+            error = (proc.stderr.strip().splitlines() or ["unknown error"])[-1]
+            result = {"config": config, "error": error[:200]}
+        else:
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+        results.append(result)
+        print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"created_at": time.time(), "params": vars(args), "results": results}, f, indent=2)
+
+    if args.baseline:
+        problems = compare(results, Path(args.baseline), args.k, args.max_recall_drop, args.max_latency_growth)
+        for problem in problems:
+            print(f"REGRESSION {problem}", file=sys.stderr)
+        if problems:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Startup Benchmark
+-----------------
+Engine startup cost of the project services: time and process RSS to build the
+scanner and the Orchestrator's MemoryStore.
+
+- separate: ProjectScanner and Orchestrator each build their own MemoryStore
+  (two vector DB clients, two embedders, two worker threads: the old wiring)
+- shared:   both come from one ProjectServices container (core/services.py)
+
+Each mode runs in a fresh subprocess against the same on-disk project (a small
+manuscript is backfilled first so the indexes have something to load).
+
+Usage:
+    python benchmarks/startup_bench.py
+    python benchmarks/startup_bench.py --backend chroma --chapters 20 --repeat 5
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.retrieval_bench import generate_novel
+
+
+def _prepare(project_root: Path, chapters: int) -> None:
+    import logging
+    logging.disable(logging.WARNING)
+    from core.memory_store import MemoryStore
+    from core.backfill import Backfill
+
+    novel, _ = generate_novel(chapters, 2000, chapters, seed=3)
+    manuscripts = project_root / "data" / "manuscripts"
+    manuscripts.mkdir(parents=True, exist_ok=True)
+    for name, text in novel.items():
+        (manuscripts / name).write_text(text, encoding="utf-8")
+    store = MemoryStore(project_root)
+    asyncio.run(Backfill(store, project_root).run())
+    store.close()
+
+
+def run_case(mode: str, project_root: Path) -> dict:
+    import logging
+    logging.disable(logging.WARNING)
+    from core.services import rss_mb
+
+    rss_start = rss_mb()
+    t0 = time.perf_counter()
+    if mode == "separate":
+        from core.scanner import ProjectScanner
+        from core.memory_store import MemoryStore
+        scanner = ProjectScanner(project_root)
+        memory = MemoryStore(project_root)
+        stores = {id(scanner.memory), id(memory)}
+    else:
+        from core.services import ProjectServices
+        services = ProjectServices(project_root)
+        scanner = services.scanner
+        memory = services.memory
+        stores = {id(scanner.memory), id(memory)}
+    seconds = time.perf_counter() - t0
+    return {
+        "mode": mode,
+        "memory_stores": len(stores),
+        "startup_seconds": round(seconds, 4),
+        "rss_delta_mb": round(rss_mb() - rss_start, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default="auto", choices=["auto", "chroma", "numpy"])
+    parser.add_argument("--chapters", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per mode (the median is reported)")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    parser.add_argument("--root", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    os.environ.update({"USE_RAG": "true", "RAG_VECTOR_BACKEND": args.backend, "RAG_EMBEDDING_PROVIDER": "hashing"})
+
+    if args.case:
+        print(json.dumps(run_case(args.case, Path(args.root))))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        project_root = Path(tmp)
+        _prepare(project_root, args.chapters)
+        for mode in ("separate", "shared"):
+            runs = []
+            for _ in range(args.repeat):
+                proc = subprocess.run(
+                    [sys.executable, __file__, "--case", mode, "--root", tmp, "--backend", args.backend],
+                    capture_output=True, text=True,
+                )
+                if proc.returncode != 0:
+                    print(json.dumps({"mode": mode, "error": (proc.stderr.strip().splitlines() or ["unknown error"])[-1][:200]}))
+                    break
+                runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+            if runs:
+                runs.sort(key=lambda r: r["startup_seconds"])
+                print(json.dumps(dict(runs[len(runs) // 2], backend=args.backend, runs=len(runs))))
+
+
+if __name__ == "__main__":
+    main()
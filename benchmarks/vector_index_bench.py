@@ -0,0 +1,129 @@
+"""
+Vector Index Benchmark
+----------------------
+Compares the built-in NumPy index against ChromaDB on synthetic vectors:
+ingest throughput, query latency (p50/p99) and process RSS at several corpus sizes.
+
+Each (backend, size) case runs in a fresh subprocess so RSS numbers are not polluted
+by the previous case.
+
+Usage:
+    python benchmarks/vector_index_bench.py                      # 1k, 10k, 100k
+    python benchmarks/vector_index_bench.py --sizes 1000 10000 --dim 1536 --backends numpy
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def _rss_mb() -> float:
+    """Current resident set size in MB (Linux /proc, falling back to peak RSS)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except Exception:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def _percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def run_case(backend: str, size: int, dim: int, queries: int, batch: int, seed: int) -> dict:
+    import numpy as np
+    from core.vector_index import create_vector_index
+
+    rng = np.random.default_rng(seed)
+    rss_start = _rss_mb()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = create_vector_index(Path(tmp), backend)
+
+        t0 = time.perf_counter()
+        for start in range(0, size, batch):
+            n = min(batch, size - start)
+            vectors = rng.standard_normal((n, dim), dtype=np.float32)
+            ids = [f"chunk_{start + i}" for i in range(n)]
+            docs = [f"document {start + i}" for i in range(n)]
+            metas = [{"source": f"ch{(start + i) % 40:02d}", "chunk_index": start + i} for i in range(n)]
+            index.add(ids, vectors, docs, metas)
+        ingest_seconds = time.perf_counter() - t0
+
+        latencies = []
+        for _ in range(queries):
+            q = rng.standard_normal(dim, dtype=np.float32)
+            t1 = time.perf_counter()
+            index.query(q, n_results=5)
+            latencies.append((time.perf_counter() - t1) * 1000)
+
+        filtered = []
+        for _ in range(queries):
+            q = rng.standard_normal(dim, dtype=np.float32)
+            t1 = time.perf_counter()
+            index.query(q, n_results=5, where={"source": "ch07"})
+            filtered.append((time.perf_counter() - t1) * 1000)
+
+        rss_end = _rss_mb()
+
+    return {
+        "backend": backend,
+        "chunks": size,
+        "dim": dim,
+        "ingest_seconds": round(ingest_seconds, 3),
+        "ingest_chunks_per_sec": round(size / ingest_seconds, 1) if ingest_seconds else None,
+        "query_p50_ms": round(_percentile(latencies, 50), 3),
+        "query_p99_ms": round(_percentile(latencies, 99), 3),
+        "filtered_query_p50_ms": round(_percentile(filtered, 50), 3),
+        "rss_mb": round(rss_end, 1),
+        "rss_delta_mb": round(rss_end - rss_start, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["numpy", "chroma"])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--case", nargs=2, metavar=("BACKEND", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        backend, size = args.case[0], int(args.case[1])
+        print(json.dumps(run_case(backend, size, args.dim, args.queries, args.batch, args.seed)))
+        return
+
+    for backend in args.backends:
+        for size in args.sizes:
+            cmd = [
+                sys.executable, __file__, "--case", backend, str(size),
+                "--dim", str(args.dim), "--queries", str(args.queries),
+                "--batch", str(args.batch), "--seed", str(args.seed),
+            ]
+            proc = subprocess.run(cmd, capture_output=True, text=True)
+            if proc.returncode != 0:
+                error = (proc.stderr.strip().splitlines() or ["unknown error"])[-1]
+                print(json.dumps({"backend": backend, "chunks": size, "error": error[:200]}))
+                continue
+            print(proc.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    main()
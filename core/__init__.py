@@ -9,11 +9,15 @@ Components:
 - ProjectScanner: The sensory system that updates the Matrix.
 - ProjectManager: Handles multi-project switching and isolation.
 - MemoryStore: RAG system for long-term narrative retrieval.
+- ProjectServices: Per-project container sharing the MemoryStore, scanner, StoryBible and HTTP pool.
+- StoryBible: The story bible files, re-read on change, with memoized prompt fragments.
 """
 
 from .orchestrator import Orchestrator
 from .scanner import ProjectScanner
 from .project_manager import ProjectManager
 from .memory_store import MemoryStore
+from .services import ProjectServices, get_services
+from .story_bible import StoryBible
 
-__all__ = ["Orchestrator", "ProjectScanner", "ProjectManager", "MemoryStore"]
\ No newline at end of file
+__all__ = ["Orchestrator", "ProjectScanner", "ProjectManager", "MemoryStore", "ProjectServices", "get_services", "StoryBible"]
\ No newline at end of file
@@ -1,12 +1,34 @@
 import os
+import asyncio
 import aiofiles
 import logging
 import json
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from core.chunker import count_tokens, token_suffix_start
+from core.edit_engine import EditError, locate_edits
+from core.patch_engine import PatchError, locate_patch
+from core.section_index import section_index
+from core.buffer_cache import Document, manuscript_cache, file_stamp
 
 # Constants
 # DATA_DIR removed in v3.0 to support Multi-Project Architecture
+# Durability of agent writes: 'always' (fsync before rename), 'batch' (fsync dirty files every
+# FSYNC_INTERVAL seconds) or 'off' (leave it to the OS)
+FSYNC_MODE = os.getenv("AGENT_TOOLS_FSYNC", "batch").lower()
+FSYNC_INTERVAL = float(os.getenv("AGENT_TOOLS_FSYNC_INTERVAL", "1.0"))
+# Edits (apply_edits, patch_file, edit_file) stay in the open Document this many seconds
+# before being written back, so bursts of edits cost one write (0 writes every edit through)
+FLUSH_INTERVAL = float(os.getenv("AGENT_TOOLS_FLUSH_INTERVAL", "0.5"))
+# Streamed writes (ManuscriptStream) reach the file every STREAM_FLUSH_INTERVAL seconds or
+# STREAM_FLUSH_CHARS buffered chars; a failed stream is rolled back ('rollback') or its
+# partial text kept and followed by a marker ('mark')
+STREAM_FLUSH_INTERVAL = float(os.getenv("AGENT_TOOLS_STREAM_FLUSH_INTERVAL", "0.25"))
+STREAM_FLUSH_CHARS = int(os.getenv("AGENT_TOOLS_STREAM_FLUSH_CHARS", "4096"))
+STREAM_ON_FAILURE = os.getenv("AGENT_TOOLS_STREAM_ON_FAILURE", "rollback").lower()
+STREAM_SUFFIX = ".streaming"   # streamed rewrites build up in <file>.streaming until they complete
+
 logger = logging.getLogger(__name__)
 
 class SecurityError(Exception):
@@ -16,7 +38,8 @@ class SecurityError(Exception):
 def _resolve_path(path_str: str, project_root: Path) -> Path:
     """
     Securely resolves a path string relative to the active Project's DATA directory.
-    Raises SecurityError if the resolved path escapes the sandbox.
+    Raises SecurityError if the resolved path escapes the sandbox, or names the
+    side file of a streamed rewrite (owned by ManuscriptStream until it completes).
     """
     # Define the sandbox dynamically based on the active project
     sandbox_root = (project_root / "data").resolve()
@@ -31,11 +54,14 @@ def _resolve_path(path_str: str, project_root: Path) -> Path:
         if not str(safe_path).startswith(str(sandbox_root)):
             raise SecurityError(f"Access Denied: '{path_str}' resolves outside the project data directory.")
             
-        return safe_path
     except Exception as e:
         logger.warning(f"Path resolution error for '{path_str}': {e}")
         raise SecurityError(f"Invalid path format: {path_str}")
 
+    if safe_path.name.endswith(STREAM_SUFFIX):
+        raise SecurityError(f"Access Denied: '{path_str}' is a draft still being streamed.")
+    return safe_path
+
 def _format_result(status: str, data: Any, meta: Optional[Dict] = None) -> Dict[str, Any]:
     """Standardized response format for all tools."""
     return {
@@ -44,11 +70,270 @@ def _format_result(status: str, data: Any, meta: Optional[Dict] = None) -> Dict[
         "meta": meta or {}
     }
 
+# --- Write Safety ---
+
+# One lock per file, shared by every agent in the process: read-modify-write tools
+# (append's newline check, edit_file) never interleave on the same manuscript.
+_path_locks: Dict[str, Tuple[asyncio.AbstractEventLoop, asyncio.Lock]] = {}
+_dirty: Set[Path] = set()
+_flush_handle: Optional[asyncio.TimerHandle] = None
+_write_back_handle: Optional[asyncio.TimerHandle] = None
+_write_back_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def path_lock(target: Path) -> asyncio.Lock:
+    """The asyncio.Lock guarding one resolved path (per event loop)."""
+    loop = asyncio.get_running_loop()
+    key = str(target)
+    entry = _path_locks.get(key)
+    if entry is None or entry[0] is not loop:
+        entry = (loop, asyncio.Lock())
+        _path_locks[key] = entry
+    return entry[1]
+
+
+def _fsync_dir(directory: Path) -> None:
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # Not supported (e.g. Windows): the rename is still atomic
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsync_paths(paths: List[Path]) -> None:
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                os.fsync(f.fileno())
+        except FileNotFoundError:
+            continue
+    for directory in {path.parent for path in paths}:
+        _fsync_dir(directory)
+
+
+async def flush() -> None:
+    """Writes back pending edits, then fsyncs every file written since the last flush (batch mode). Call before shutdown."""
+    global _flush_handle
+    await flush_documents()
+    if _flush_handle is not None:
+        _flush_handle.cancel()
+        _flush_handle = None
+    if not _dirty:
+        return
+    paths = list(_dirty)
+    _dirty.clear()
+    try:
+        await asyncio.to_thread(_fsync_paths, paths)
+    except Exception as e:
+        logger.error(f"fsync batch failed: {e}")
+
+
+def _mark_dirty(target: Path) -> None:
+    """Queues the file for the next batched fsync (one fsync per file per FSYNC_INTERVAL)."""
+    global _flush_handle
+    if FSYNC_MODE != "batch":
+        return
+    _dirty.add(target)
+    if _flush_handle is None:
+        loop = asyncio.get_running_loop()
+        _flush_handle = loop.call_later(FSYNC_INTERVAL, lambda: loop.create_task(flush()))
+
+
+def _write_atomic(target: Path, content: str) -> None:
+    """Writes a sibling temp file and renames it over the target: readers see the old or the new file, never half of one."""
+    tmp = target.with_name(f".{target.name}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(content)
+        if FSYNC_MODE == "always":
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, target)
+    if FSYNC_MODE == "always":
+        _fsync_dir(target.parent)
+
+
+def stream_path(target: Path) -> Path:
+    """Side file a streamed rewrite of `target` is written to (tailed by the dashboard while it exists)."""
+    return target.with_name(target.name + STREAM_SUFFIX)
+
+
+def _promote(staged: Path, target: Path) -> None:
+    """Renames a completed side file over the target, with the same durability as _write_atomic."""
+    if FSYNC_MODE == "always":
+        with open(staged, "rb+") as f:
+            os.fsync(f.fileno())
+    os.replace(staged, target)
+    if FSYNC_MODE == "always":
+        _fsync_dir(target.parent)
+
+
+async def _replace_content(target: Path, content: str) -> None:
+    await asyncio.to_thread(_write_atomic, target, content)
+    manuscript_cache.put(target, content)
+    _mark_dirty(target)
+
+
+# --- Open Documents ---
+
+async def _open_document(target: Path) -> Document:
+    """The target's Document: the shared one while current, else loaded from disk (uncached if too large)."""
+    stamp = file_stamp(target)
+    doc = manuscript_cache.document(target, stamp)
+    if doc is None:
+        async with aiofiles.open(target, mode='r', encoding='utf-8') as f:
+            text = await f.read()
+        doc = manuscript_cache.put(target, text, stamp) or Document(target, text, stamp)
+    return doc
+
+
+async def _read_text(target: Path) -> Tuple[str, Any]:
+    """(text, version key) of the target, pending edits included."""
+    doc = await _open_document(target)
+    return doc.text(), (doc.stamp, doc.table.version)
+
+
+def _write_payload(target: Path, mode: str, payload: str) -> None:
+    if mode == "replace":
+        _write_atomic(target, payload)
+        return
+    with open(target, "a", encoding="utf-8") as f:
+        f.write(payload)
+        if FSYNC_MODE == "always":
+            f.flush()
+            os.fsync(f.fileno())
+
+
+async def _write_document(doc: Document) -> None:
+    """Writes a Document's pending edits to disk: an append if only its end changed, else an atomic rewrite. Caller holds path_lock."""
+    pending = doc.pending_write()
+    if pending is None:
+        doc.mark_synced(doc.stamp)      # e.g. undone back to the disk version
+        return
+    mode, payload = pending
+    if mode == "append" and file_stamp(doc.path) != doc.stamp:
+        mode, payload = "replace", doc.text()
+    await asyncio.to_thread(_write_payload, doc.path, mode, payload)
+    doc.mark_synced(file_stamp(doc.path))
+    _mark_dirty(doc.path)
+
+
+async def flush_documents() -> None:
+    """Writes back every open Document with pending edits. The Orchestrator calls it after each agent."""
+    global _write_back_handle
+    if _write_back_handle is not None:
+        _write_back_handle.cancel()
+        _write_back_handle = None
+    for doc in manuscript_cache.dirty_documents():
+        try:
+            async with path_lock(doc.path):
+                if doc.dirty:
+                    await _write_document(doc)
+        except Exception as e:
+            logger.error(f"Writing back {doc.path} failed: {e}")
+
+
+async def _commit(doc: Document) -> None:
+    """After an edit (path_lock held): written now, or by the write-back due in FLUSH_INTERVAL."""
+    global _write_back_handle, _write_back_loop
+    if FLUSH_INTERVAL <= 0 or manuscript_cache.peek(doc.path) is not doc:
+        await _write_document(doc)
+        return
+    loop = asyncio.get_running_loop()
+    if _write_back_handle is None or _write_back_loop is not loop:
+        _write_back_handle = loop.call_later(FLUSH_INTERVAL, lambda: loop.create_task(flush_documents()))
+        _write_back_loop = loop
+
+
+async def _write_back(target: Path) -> None:
+    """Puts pending edits on disk before reading the file directly."""
+    doc = manuscript_cache.peek(target)
+    if doc is not None and doc.dirty:
+        async with path_lock(target):
+            if doc.dirty:
+                await _write_document(doc)
+
+
+async def _needs_newline(target: Path, size: int) -> bool:
+    """True if a non-empty file does not end with a newline: reads the last byte only."""
+    if size <= 0:
+        return False
+    async with aiofiles.open(target, mode='rb') as f:
+        await f.seek(size - 1)
+        return await f.read(1) != b"\n"
+
 # --- File System Tools ---
 
-async def read_file(path: str, project_root: Path) -> Dict[str, Any]:
+def _parse_lines(lines: Any) -> Tuple[int, Optional[int]]:
+    """'10-40', '10-', '12', 12, [10, 40] -> (first, last or None), 1-based inclusive."""
+    if isinstance(lines, int):
+        return lines, lines
+    if isinstance(lines, (list, tuple)) and lines:
+        first = int(lines[0])
+        return first, int(lines[1]) if len(lines) > 1 and lines[1] is not None else None
+    text = str(lines).strip()
+    if "-" in text:
+        first, _, last = text.partition("-")
+        return int(first or 1), int(last) if last.strip() else None
+    return int(text), int(text)
+
+
+async def _read_tail_bytes(target: Path, size: int, count: int) -> Tuple[int, bytes]:
+    """The last `count` bytes of a file, starting on a UTF-8 character boundary: (byte offset, data)."""
+    start = max(0, size - count)
+    async with aiofiles.open(target, mode='rb') as f:
+        await f.seek(start)
+        data = await f.read()
+    skip = 0
+    while skip < len(data) and skip < 4 and (data[skip] & 0xC0) == 0x80:
+        skip += 1
+    return start + skip, data[skip:]
+
+
+async def _read_byte_range(target: Path, start: int, end: Optional[int]) -> Tuple[int, int, str]:
+    """Bytes [start, end) widened to whole UTF-8 characters: (byte start, byte end, text)."""
+    async with aiofiles.open(target, mode='rb') as f:
+        await f.seek(max(0, start - 3))
+        lead = max(0, start - 3)
+        data = await f.read(None if end is None else max(0, end - lead + 3))
+    begin = min(start - lead, len(data))
+    # Step back over continuation bytes (10xxxxxx) to the start of the character
+    while 0 < begin < len(data) and (data[begin] & 0xC0) == 0x80:
+        begin -= 1
+    stop = len(data) if end is None else min(len(data), end - lead)
+    while stop < len(data) and (data[stop] & 0xC0) == 0x80:
+        stop += 1
+    return lead + begin, lead + stop, data[begin:stop].decode("utf-8", errors="replace")
+
+
+def _describe(meta: Dict[str, Any]) -> str:
+    """'chars 0-4000 of 52000, lines 1-80 of 900' for tool messages."""
+    parts = []
+    if "start" in meta:
+        parts.append(f"chars {meta['start']}-{meta['end']} of {meta['total_chars']}")
+    if "byte_start" in meta:
+        parts.append(f"bytes {meta['byte_start']}-{meta['byte_end']} of {meta['total_bytes']}")
+    if "line_start" in meta:
+        parts.append(f"lines {meta['line_start']}-{meta['line_end']} of {meta['total_lines']}")
+    if meta.get("section"):
+        parts.append(f"section '{meta['section']}'")
+    return ", ".join(parts)
+
+
+async def read_file(path: str, project_root: Path, start: Optional[int] = None, end: Optional[int] = None,
+                    unit: str = "chars", lines: Any = None, section: Optional[str] = None,
+                    tail_tokens: Optional[int] = None) -> Dict[str, Any]:
     """
-    Reads a file from the project sandbox and returns its content.
+    Reads a file from the project sandbox: whole, or only the part an agent needs.
+    - start/end: char range (negative values count from the end); unit='bytes' reads
+      a byte range straight from disk, same rules (widened to whole UTF-8 characters)
+    - lines: 1-based inclusive line range ('10-40', '10-', 12, [10, 40])
+    - section: a markdown heading; returns it up to the next heading of its level
+    - tail_tokens: the last N tokens (reads only the end of the file)
+    Partial reads report their offsets in meta (start/end, byte_start/byte_end,
+    line_start/line_end, section) and a readable meta["range"].
     Used by: All Agents.
     """
     try:
@@ -60,13 +345,70 @@ async def read_file(path: str, project_root: Path) -> Dict[str, Any]:
         if not target.is_file():
             return _format_result("error", f"Path is not a file: {path}")
 
-        async with aiofiles.open(target, mode='r', encoding='utf-8') as f:
-            content = await f.read()
-            
-        return _format_result("success", content, {"size": len(content)})
+        partial = any(v is not None for v in (start, end, lines, section, tail_tokens))
+        if not partial:
+            content, _ = await _read_text(target)
+            return _format_result("success", content, {"size": len(content)})
+
+        doc = manuscript_cache.peek(target)
+        if tail_tokens is not None and doc is not None and doc.dirty:
+            # Pending edits: slice the end of the open Document instead of the stale file
+            length = len(doc.table)
+            window = doc.table.slice(max(0, length - max(1, int(tail_tokens)) * 8))
+            cut = token_suffix_start(window, int(tail_tokens))
+            content = window[cut:]
+            meta = {"start": length - len(content), "end": length, "total_chars": length,
+                    "tokens": count_tokens(content), "size": len(content)}
+            meta["range"] = _describe(meta)
+            return _format_result("success", content, meta)
+        if unit == "bytes":
+            await _write_back(target)
+        stat = target.stat()
+        meta: Dict[str, Any] = {"total_bytes": stat.st_size}
+        if tail_tokens is not None:
+            # ~8 bytes per token is generous for prose: trimmed to the budget below
+            byte_start, data = await _read_tail_bytes(target, stat.st_size, max(1, int(tail_tokens)) * 8)
+            text = data.decode("utf-8", errors="replace")
+            cut = token_suffix_start(text, int(tail_tokens))
+            content = text[cut:]
+            meta.update({"byte_start": byte_start + len(text[:cut].encode("utf-8")), "byte_end": stat.st_size,
+                         "tokens": count_tokens(content)})
+        elif unit == "bytes":
+            # Same slice semantics as chars: negative offsets count back from the end of the file
+            first, last, _ = slice(None if start is None else int(start), None if end is None else int(end)).indices(stat.st_size)
+            byte_start, byte_end, content = await _read_byte_range(target, first, max(first, last))
+            meta.update({"byte_start": byte_start, "byte_end": byte_end})
+        else:
+            text, stamp = await _read_text(target)
+            index = section_index(target, text, stamp)
+            if section is not None:
+                found = index.find_section(section)
+                if found is None:
+                    titles = ", ".join(f"'{s['title']}'" for s in index.sections) or "none"
+                    return _format_result("error", f"Section not found: '{section}'. Sections: {titles}", {"sections": index.outline()})
+                span = (found["start"], found["end"])
+                meta["section"] = found["title"]
+            elif lines is not None:
+                first, last = _parse_lines(lines)
+                span = index.lines(first, last)
+            else:
+                first, last, _ = slice(start, end).indices(len(text))
+                span = (first, max(first, last))
+            content = text[span[0]:span[1]]
+            meta.update({
+                "start": span[0], "end": span[1], "total_chars": len(text),
+                "line_start": index.line_of(span[0]), "line_end": index.line_of(max(span[0], span[1] - 1)),
+                "total_lines": index.total_lines,
+                "byte_start": index.byte_offset(span[0], text), "byte_end": index.byte_offset(span[1], text),
+            })
+        meta["size"] = len(content)
+        meta["range"] = _describe(meta)
+        return _format_result("success", content, meta)
 
     except SecurityError as e:
         return _format_result("error", str(e))
+    except ValueError as e:
+        return _format_result("error", f"Invalid range: {e}")
     except Exception as e:
         logger.error(f"read_file failed for {path}: {e}")
         return _format_result("error", f"System error reading file: {str(e)}")
@@ -81,10 +423,10 @@ async def write_file(path: str, content: str, project_root: Path) -> Dict[str, A
         
         # Ensure parent directories exist
         target.parent.mkdir(parents=True, exist_ok=True)
-        
-        async with aiofiles.open(target, mode='w', encoding='utf-8') as f:
-            await f.write(content)
-            
+
+        async with path_lock(target):
+            await _replace_content(target, content)
+
         return _format_result("success", f"Successfully wrote {len(content)} characters to {path}.", {"bytes_written": len(content)})
 
     except SecurityError as e:
@@ -104,23 +446,25 @@ async def append_file(path: str, content: str, project_root: Path) -> Dict[str,
         # Ensure parent directories exist
         target.parent.mkdir(parents=True, exist_ok=True)
 
-        existing_size = 0
-        if target.exists() and target.is_file():
-            existing_size = target.stat().st_size
+        async with path_lock(target):
+            doc = manuscript_cache.peek(target)
+            if doc is not None and doc.dirty:
+                await _write_document(doc)
+            before = file_stamp(target)
+            existing_size = before[1] if before is not None else 0
 
-        prefix = ""
-        if existing_size > 0:
+            prefix = ""
             try:
-                async with aiofiles.open(target, mode='r', encoding='utf-8') as f:
-                    existing_tail = await f.read()
-                if existing_tail and not existing_tail.endswith("\n"):
+                if await _needs_newline(target, existing_size):
                     prefix = "\n"
             except Exception:
                 # If we fail to read, we still append safely without a newline check.
                 prefix = ""
 
-        async with aiofiles.open(target, mode='a', encoding='utf-8') as f:
-            await f.write(prefix + content)
+            async with aiofiles.open(target, mode='a', encoding='utf-8') as f:
+                await f.write(prefix + content)
+            manuscript_cache.extend(target, before, prefix + content)
+            _mark_dirty(target)
 
         bytes_appended = len((prefix + content).encode("utf-8"))
         return _format_result(
@@ -135,44 +479,291 @@ async def append_file(path: str, content: str, project_root: Path) -> Dict[str,
         logger.error(f"append_file failed for {path}: {e}")
         return _format_result("error", f"System error appending file: {str(e)}")
 
+# --- Live Streams ---
+
+class ManuscriptStream:
+    """
+    The Wire.
+    A write_file/append_file whose content is still being generated: text fed
+    in is buffered and flushed every STREAM_FLUSH_INTERVAL seconds (or
+    STREAM_FLUSH_CHARS chars), so whoever tails it (the dashboard's prose
+    window) sees prose while the model writes it. Appends go to the file
+    itself; a rewrite goes to stream_path(file) and is renamed over the file
+    by finish(), so the chapter on disk is never half-written. finish() lands
+    the tool call's final content exactly as write_file/append_file would
+    have; abort() undoes the stream (truncates the append, drops the side
+    file), or with STREAM_ON_FAILURE=mark keeps the partial text followed by a
+    marker. Create with open_stream().
+    """
+
+    def __init__(self, path: str, target: Path, project_root: Path, append: bool):
+        self.path = path
+        self.target = target
+        self.project_root = project_root
+        self.append = append
+        self.sink = target if append else stream_path(target)   # where flushed text goes
+        self.flushes = 0
+        self.closed = False
+        self._parts: List[str] = []         # everything fed, flushed or not
+        self._buffer: List[str] = []
+        self._buffered = 0
+        self._last_flush = 0.0
+        self._prefix = ""                   # newline separating appended text from the old end
+        self._size_before: Optional[int] = None
+
+    async def _start(self) -> None:
+        self.target.parent.mkdir(parents=True, exist_ok=True)
+        async with path_lock(self.target):
+            doc = manuscript_cache.peek(self.target)
+            if doc is not None and doc.dirty:
+                await _write_document(doc)
+            stamp = file_stamp(self.target)
+            if self.append:
+                self._size_before = stamp[1] if stamp is not None else None
+                try:
+                    self._prefix = "\n" if await _needs_newline(self.target, self._size_before or 0) else ""
+                except Exception:
+                    self._prefix = ""
+            else:
+                # A side file left by a crashed stream is started over
+                await asyncio.to_thread(self.sink.write_text, "", encoding="utf-8")
+        self._last_flush = asyncio.get_running_loop().time()
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    async def feed(self, text: str) -> None:
+        if not text or self.closed:
+            return
+        self._parts.append(text)
+        self._buffer.append(text)
+        self._buffered += len(text)
+        now = asyncio.get_running_loop().time()
+        if self._buffered >= STREAM_FLUSH_CHARS or now - self._last_flush >= STREAM_FLUSH_INTERVAL:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        self._last_flush = asyncio.get_running_loop().time()
+        if not self._buffer:
+            return
+        chunk = "".join(self._buffer)
+        if self.flushes == 0:
+            chunk = self._prefix + chunk
+        self._buffer, self._buffered = [], 0
+        async with path_lock(self.target):
+            before = file_stamp(self.sink)
+            async with aiofiles.open(self.sink, mode='a', encoding='utf-8') as f:
+                await f.write(chunk)
+            if self.append:
+                manuscript_cache.extend(self.target, before, chunk)
+                _mark_dirty(self.target)
+        self.flushes += 1
+
+    async def finish(self, content: str) -> Dict[str, Any]:
+        """Completes the stream with the call's final content (rewritten by the plain tool if the stream diverged)."""
+        if self.closed:
+            return _format_result("error", f"Stream to {self.path} is already closed.")
+        if self.text != content:
+            logger.warning(f"Streamed text for {self.path} differs from the final tool call: rewriting it")
+            await self._rollback()
+            self.closed = True
+            if self.append:
+                return await append_file(self.path, content, self.project_root)
+            return await write_file(self.path, content, self.project_root)
+        await self._flush()
+        self.closed = True
+        if not self.append:
+            await self._promote(content)
+        meta = {"streamed": True, "flushes": self.flushes}
+        if self.append:
+            meta.update({"bytes_appended": len((self._prefix + content).encode("utf-8")), "bytes_before": self._size_before or 0})
+            return _format_result("success", f"Successfully appended {len(content)} characters to {self.path}.", meta)
+        meta["bytes_written"] = len(content)
+        return _format_result("success", f"Successfully wrote {len(content)} characters to {self.path}.", meta)
+
+    async def abort(self, reason: str) -> Dict[str, Any]:
+        """The generation failed or was cancelled: undoes the streamed text (or marks where it stops)."""
+        if self.closed:
+            return _format_result("error", f"Stream to {self.path} is already closed.")
+        self.closed = True
+        if STREAM_ON_FAILURE == "mark" and self.text:
+            marker = f"\n\n<!-- generation interrupted: {reason} -->\n"
+            self._buffer.append(marker)
+            await self._flush()
+            if not self.append:
+                await self._promote(self.text + marker)
+            return _format_result("success", f"Kept {len(self.text)} streamed characters in {self.path}, marked as interrupted.", {"rolled_back": False})
+        await self._rollback()
+        return _format_result("success", f"Rolled back {len(self.text)} streamed characters from {self.path}.", {"rolled_back": True})
+
+    async def _promote(self, content: str) -> None:
+        """Write mode: the side file replaces the chapter."""
+        async with path_lock(self.target):
+            await asyncio.to_thread(_promote, self.sink, self.target)
+            manuscript_cache.put(self.target, content)
+            _mark_dirty(self.target)
+
+    async def _rollback(self) -> None:
+        self._buffer, self._buffered = [], 0
+        async with path_lock(self.target):
+            if not self.append:
+                # The chapter itself was never touched
+                await asyncio.to_thread(self.sink.unlink, missing_ok=True)
+            elif self._size_before is not None:
+                await asyncio.to_thread(os.truncate, self.target, self._size_before)
+                manuscript_cache.invalidate(self.target)
+                _mark_dirty(self.target)
+            else:
+                # The stream created the file
+                await asyncio.to_thread(self.target.unlink, missing_ok=True)
+                manuscript_cache.invalidate(self.target)
+
+
+async def open_stream(path: str, project_root: Path, append: bool = False) -> ManuscriptStream:
+    """
+    Starts a streamed write (append=False: text builds up in stream_path(file),
+    which replaces the file on finish()) or append. Raises SecurityError for paths outside the sandbox.
+    Used by: Narrator (live drafting).
+    """
+    target = _resolve_path(path, project_root)
+    stream = ManuscriptStream(path, target, project_root, append)
+    await stream._start()
+    return stream
+
 async def edit_file(path: str, search_text: str, replace_text: str, project_root: Path) -> Dict[str, Any]:
     """
-    Performs a strict find-and-replace operation.
+    Performs a find-and-replace of one unique passage (exact, else quote/whitespace-
+    normalized, else a close fuzzy match; see core/edit_engine.py).
     Used by: Editor.
     """
+    result = await apply_edits(path, [{"search_text": search_text, "replace_text": replace_text}], project_root)
+    outcomes = result["meta"].get("edits") or []
+    if result["status"] == "success" or not outcomes:
+        return _format_result(result["status"], "File updated successfully." if result["status"] == "success" else result["data"], result["meta"])
+    outcome = outcomes[0]
+    if outcome["status"] == "ambiguous":
+        return _format_result("error", f"Ambiguous edit: Search text found {outcome.get('count', 'multiple')} times. Please provide context (more unique text) to isolate the edit.")
+    return _format_result("error", "Search text not found in file. No changes made.")
+
+async def apply_edits(path: str, edits: List[Dict[str, Any]], project_root: Path) -> Dict[str, Any]:
+    """
+    Applies a batch of find-and-replace edits in one read-modify-write pass.
+    Every edit is located against the original text (exact, normalized or fuzzy);
+    not-found, ambiguous and overlapping edits are skipped and reported, the rest
+    are written atomically. Status: 'success' (all applied), 'partial' or 'error'.
+    meta["edits"] holds one outcome per edit, in request order.
+    Used by: Narrator (Revise), Editor.
+    """
     try:
         target = _resolve_path(path, project_root)
-        
+
         if not target.exists():
             return _format_result("error", f"File not found: {path}")
+        if not isinstance(edits, list) or not edits:
+            return _format_result("error", "No edits given.")
 
-        # Read
-        async with aiofiles.open(target, mode='r', encoding='utf-8') as f:
-            original_content = await f.read()
+        async with path_lock(target):
+            doc = await _open_document(target)
+            spans, outcomes = locate_edits(doc.text(), edits)
+            applied = sum(outcome["status"] == "applied" for outcome in outcomes)
+            if applied:
+                doc.checkpoint()
+                for start, end, replacement in reversed(spans):
+                    doc.table.replace(start, end, replacement)
+                await _commit(doc)
 
-        # Check existence
-        if search_text not in original_content:
-            return _format_result("error", "Search text not found in file. No changes made.")
-        
-        # Safety: We usually want to replace one specific instance to avoid accidents.
-        count = original_content.count(search_text)
-        if count > 1:
-             return _format_result("error", f"Ambiguous edit: Search text found {count} times. Please provide context (more unique text) to isolate the edit.")
+        summary = ", ".join(
+            f"#{o['index']} {o['status']}" + (f" ({o['match']})" if o.get("match") not in (None, "exact") else "")
+            for o in outcomes
+        )
+        meta = {"edits": outcomes, "applied": applied, "failed": len(outcomes) - applied}
+        if applied == len(outcomes):
+            return _format_result("success", f"Applied {applied} edit(s) to {path}: {summary}.", meta)
+        if applied:
+            return _format_result("partial", f"Applied {applied} of {len(outcomes)} edit(s) to {path}: {summary}. Re-issue the failed ones with more exact text.", meta)
+        return _format_result("error", f"No edits applied to {path}: {summary}. No changes made.", meta)
+
+    except EditError as e:
+        return _format_result("error", str(e))
+    except SecurityError as e:
+        return _format_result("error", str(e))
+    except Exception as e:
+        logger.error(f"apply_edits failed for {path}: {e}")
+        return _format_result("error", f"System error editing file: {str(e)}")
 
-        # Modify
-        new_content = original_content.replace(search_text, replace_text, 1)
+async def patch_file(path: str, patch: str, project_root: Path) -> Dict[str, Any]:
+    """
+    Applies a unified or line-anchored diff (see core/patch_engine.py) in one
+    locked read-modify-write pass. Hunks are located by content (line numbers
+    are hints), exact then quote/whitespace-normalized, with up to PATCH_MAX_FUZZ
+    context lines dropped. All or nothing: if any hunk fails to apply, the file
+    is left untouched. meta["hunks"] holds one outcome per hunk, in patch order.
+    Used by: Narrator (Revise), Editor.
+    """
+    try:
+        target = _resolve_path(path, project_root)
 
-        # Write
-        async with aiofiles.open(target, mode='w', encoding='utf-8') as f:
-            await f.write(new_content)
+        if not target.exists():
+            return _format_result("error", f"File not found: {path}")
+        if not isinstance(patch, str) or not patch.strip():
+            return _format_result("error", "Empty patch.")
 
-        return _format_result("success", "File updated successfully.")
+        async with path_lock(target):
+            doc = await _open_document(target)
+            length_before = len(doc.table)
+            spans, outcomes = locate_patch(doc.text(), patch)
+            applied = sum(outcome["status"] == "applied" for outcome in outcomes)
+            if spans:
+                doc.checkpoint()
+                for start, end, replacement in reversed(spans):
+                    doc.table.replace(start, end, replacement)
+                await _commit(doc)
 
+        notes = []
+        for o in outcomes:
+            note = f"#{o['index']} {o['status']}" + (f" at line {o['line']}" if o.get("line") else "")
+            details = [o["match"]] if o.get("match") not in (None, "exact") else []
+            details += [f"fuzz {o['fuzz']}"] if o.get("fuzz") else []
+            details += [f"offset {o['offset']:+d}"] if o.get("offset") else []
+            notes.append(note + (f" ({', '.join(details)})" if details else ""))
+        summary = ", ".join(notes)
+        meta = {"hunks": outcomes, "applied": applied, "failed": len(outcomes) - applied}
+        if applied == len(outcomes):
+            meta["chars_delta"] = len(doc.table) - length_before
+            return _format_result("success", f"Applied {applied} hunk(s) to {path}: {summary}.", meta)
+        return _format_result("error", f"Patch not applied to {path}: {summary}. No changes made; fix the failed hunks (more context, or exact line numbers) and resend the whole patch.", meta)
+
+    except PatchError as e:
+        return _format_result("error", f"Invalid patch: {e}")
     except SecurityError as e:
         return _format_result("error", str(e))
     except Exception as e:
-        logger.error(f"edit_file failed for {path}: {e}")
-        return _format_result("error", f"System error editing file: {str(e)}")
+        logger.error(f"patch_file failed for {path}: {e}")
+        return _format_result("error", f"System error patching file: {str(e)}")
+
+async def undo_edit(path: str, project_root: Path) -> Dict[str, Any]:
+    """
+    Reverts the last write, append or edit made to a file through these tools
+    (up to MANUSCRIPT_UNDO_DEPTH steps, while the file is open in the manuscript
+    cache and unchanged by other programs).
+    """
+    try:
+        target = _resolve_path(path, project_root)
+
+        async with path_lock(target):
+            doc = manuscript_cache.document(target)
+            if doc is None or not doc.undo():
+                return _format_result("error", f"Nothing to undo for {path}.")
+            await _commit(doc)
+
+        return _format_result("success", f"Reverted the last change to {path}.", {"size": len(doc.table), "undo_left": len(doc.history)})
+
+    except SecurityError as e:
+        return _format_result("error", str(e))
+    except Exception as e:
+        logger.error(f"undo_edit failed for {path}: {e}")
+        return _format_result("error", f"System error reverting file: {str(e)}")
 
 async def list_files(project_root: Path, directory: str = "manuscripts") -> Dict[str, Any]:
     """
@@ -188,7 +779,8 @@ async def list_files(project_root: Path, directory: str = "manuscripts") -> Dict
 
         files = []
         for item in target.glob("*"):
-            if item.is_file() and not item.name.startswith('.'):
+            # Dot-files and the side files of streamed rewrites are not manuscripts
+            if item.is_file() and not item.name.startswith('.') and not item.name.endswith(STREAM_SUFFIX):
                 stat = item.stat()
                 files.append({
                     "name": item.name,
@@ -0,0 +1,115 @@
+import os
+import time
+import asyncio
+import logging
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable
+
+from core.chunker import chapter_number, count_tokens
+from core.memory_store import MemoryStore
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+BACKFILL_CONCURRENCY = int(os.getenv("RAG_BACKFILL_CONCURRENCY", "4"))   # Manuscripts ingested at once
+
+# progress(event) with event = {"file", "chunks", "tokens", "status", "done", "total"}
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+
+class Backfill:
+    """
+    The Archivist.
+    Bulk-ingests every manuscript of a project into the MemoryStore: used when an
+    existing draft is imported or USE_RAG is switched on for a project that
+    already has chapters. Files are ingested a few at a time (each one batching
+    its own embedding requests), earliest chapters first.
+
+    Checkpointing rides on the MemoryStore ingest ledger: every fully ingested
+    file is recorded with its content hash, so an interrupted run resumes with
+    the files still pending and finished files cost nothing.
+    """
+
+    def __init__(self, memory_store: MemoryStore, project_root: Path, concurrency: int = BACKFILL_CONCURRENCY):
+        self.memory = memory_store
+        self.manuscripts_dir = Path(project_root) / "data" / "manuscripts"
+        self.concurrency = max(1, int(concurrency))
+
+    def manuscripts(self) -> List[Path]:
+        """Every manuscript, in reading order (numbered chapters first)."""
+        paths = self.manuscripts_dir.rglob("*.md") if self.manuscripts_dir.exists() else []
+        return sorted(paths, key=lambda p: (chapter_number(p.stem) is None, chapter_number(p.stem) or 0, p.name))
+
+    def pending(self) -> List[Path]:
+        """Manuscripts whose current content is not fully in memory yet."""
+        return self.memory.pending_manuscripts(self.manuscripts())
+
+    def is_complete(self) -> bool:
+        return not self.pending()
+
+    async def run(self, progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+        """
+        Ingests the pending manuscripts. Returns a report with counts and
+        throughput (chunks/sec, tokens/sec over the ingested files).
+        """
+        everything = self.manuscripts()
+        pending = self.memory.pending_manuscripts(everything)
+        report: Dict[str, Any] = {
+            "files_total": len(everything),
+            "files_skipped": len(everything) - len(pending),
+            "files_ingested": 0,
+            "files_failed": [],
+            "chunks": 0,
+            "tokens": 0,
+            "seconds": 0.0,
+        }
+        if not pending:
+            return self._finish(report)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        done = 0
+        started = time.perf_counter()
+
+        async def _ingest(path: Path) -> None:
+            nonlocal done
+            async with semaphore:
+                status = "ingested"
+                chunks = tokens = 0
+                try:
+                    content = await asyncio.to_thread(path.read_text, encoding="utf-8")
+                    chunks = await self.memory.aingest(path, content, force=True)
+                    tokens = count_tokens(content)
+                    # aingest logs and swallows failures; the ledger is the source of truth
+                    if not self.memory.is_ingested(path.stem, content):
+                        status = "failed"
+                except Exception as e:
+                    logger.error(f"Backfill failed for {path.name}: {e}")
+                    status = "failed"
+
+                if status == "failed":
+                    report["files_failed"].append(path.name)
+                else:
+                    report["files_ingested"] += 1
+                    report["chunks"] += chunks
+                    report["tokens"] += tokens
+                done += 1
+                if progress:
+                    progress({"file": path.name, "chunks": chunks, "tokens": tokens, "status": status,
+                              "done": done, "total": len(pending)})
+
+        await asyncio.gather(*(_ingest(path) for path in pending))
+        report["seconds"] = time.perf_counter() - started
+        return self._finish(report)
+
+    @staticmethod
+    def _finish(report: Dict[str, Any]) -> Dict[str, Any]:
+        seconds = report["seconds"]
+        report["seconds"] = round(seconds, 3)
+        report["chunks_per_sec"] = round(report["chunks"] / seconds, 1) if seconds else None
+        report["tokens_per_sec"] = round(report["tokens"] / seconds, 1) if seconds else None
+        report["complete"] = not report["files_failed"]
+        logger.info(
+            f"Backfill: {report['files_ingested']} ingested, {report['files_skipped']} up to date, "
+            f"{len(report['files_failed'])} failed ({report['chunks']} chunks in {report['seconds']}s)"
+        )
+        return report
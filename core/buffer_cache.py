@@ -0,0 +1,226 @@
+import os
+import sys
+import logging
+import threading
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from core.piece_table import PieceTable
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+CACHE_MAX_MB = float(os.getenv("MANUSCRIPT_CACHE_MB", "64"))    # Memory cap for cached manuscript text (0 disables)
+UNDO_DEPTH = int(os.getenv("MANUSCRIPT_UNDO_DEPTH", "8"))        # Snapshots kept per open manuscript
+
+Stamp = Tuple[int, int, int]
+
+
+def file_stamp(path: Path) -> Optional[Stamp]:
+    """(st_mtime_ns, st_size, st_ino), or None if the file is missing."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+class Document:
+    """
+    One open manuscript: its text as a PieceTable, the stamp of the disk version
+    it was last loaded from or written to, a snapshot of that disk version
+    (`synced`) and a short undo history. Edits change the table only; the file
+    tools write it back (dirty documents are never evicted).
+    """
+
+    def __init__(self, path: Path, text: str, stamp: Optional[Stamp]):
+        self.path = Path(path)
+        self.table = PieceTable(text)
+        self.stamp = stamp
+        self.synced = self.table.snapshot()
+        self.history: deque = deque(maxlen=max(0, UNDO_DEPTH))
+        self._char_bytes = sys.getsizeof(text) / len(text) if text else 1.0
+
+    @property
+    def dirty(self) -> bool:
+        return self.table.version != self.synced.version
+
+    @property
+    def nbytes(self) -> int:
+        return int(len(self.table) * self._char_bytes) + 64
+
+    def text(self) -> str:
+        return self.table.text()
+
+    def checkpoint(self) -> None:
+        """Records the current version for undo() (shares every buffer: no text is copied)."""
+        if self.history.maxlen:
+            self.history.append(self.table.snapshot())
+
+    def undo(self) -> bool:
+        if not self.history:
+            return False
+        self.table.restore(self.history.pop())
+        return True
+
+    def mark_synced(self, stamp: Optional[Stamp]) -> None:
+        """The table now matches the file on disk, as of `stamp`."""
+        self.stamp = stamp
+        self.synced = self.table.snapshot()
+
+    def pending_write(self) -> Optional[Tuple[str, str]]:
+        """
+        What writing this document back takes: ("append", tail) when the only
+        change since the disk version is text added at the end, ("replace",
+        full text) otherwise, or None when the disk is current.
+        """
+        span = self.table.changed_span(self.synced)
+        if span is None:
+            return None
+        start, old_end, new_end = span
+        if start == old_end == len(self.synced) and self.stamp is not None:
+            return "append", self.table.slice(start, new_end)
+        return "replace", self.table.text()
+
+
+class BufferCache:
+    """
+    The Reading Room.
+    Process-wide store of open manuscripts shared by the scanner, the file tools
+    and every agent. A clean Document is served only while the file's stamp
+    (mtime_ns, size, inode) still matches, so edits made outside the process are
+    picked up on the next read; a dirty one (edits not yet written back) is
+    always served, it is newer than the disk. The file tools write through
+    Documents, so a hot chapter is read from disk once per outside change.
+    Clean entries are evicted least-recently-used past `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int = int(CACHE_MAX_MB * 1024 * 1024)):
+        self.max_bytes = max(0, int(max_bytes))
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[str, Document]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _evict(self) -> None:
+        total = sum(doc.nbytes for doc in self._entries.values())
+        for key in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            doc = self._entries[key]
+            if doc.dirty:
+                continue
+            total -= doc.nbytes
+            del self._entries[key]
+            self.evictions += 1
+
+    def document(self, path: Path, stamp: Optional[Stamp] = None) -> Optional[Document]:
+        """The open Document of `path` if it is current (dirty, or stamp unchanged), else None."""
+        stamp = stamp if stamp is not None else file_stamp(path)
+        key = str(path)
+        with self._lock:
+            doc = self._entries.get(key)
+            if doc is not None and (doc.dirty or (stamp is not None and doc.stamp == stamp)):
+                if doc.dirty and doc.stamp != stamp:
+                    logger.warning(f"{path} changed on disk while edits are pending: the pending edits win")
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return doc
+            if doc is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def peek(self, path: Path) -> Optional[Document]:
+        """The open Document of `path`, current or not, without touching the statistics."""
+        with self._lock:
+            return self._entries.get(str(path))
+
+    def dirty_documents(self) -> List[Document]:
+        with self._lock:
+            return [doc for doc in self._entries.values() if doc.dirty]
+
+    def get(self, path: Path, stamp: Optional[Stamp] = None) -> Optional[str]:
+        """Text of `path` if it is cached and current, else None."""
+        doc = self.document(path, stamp)
+        return doc.text() if doc is not None else None
+
+    def put(self, path: Path, text: str, stamp: Optional[Stamp] = None) -> Optional[Document]:
+        """
+        `text` is what `path` holds on disk as of `stamp` (default: now). An open
+        Document keeps its undo history; the text becomes its new version.
+        """
+        stamp = stamp if stamp is not None else file_stamp(path)
+        key = str(path)
+        with self._lock:
+            doc = self._entries.get(key)
+            if stamp is None or sys.getsizeof(text) > self.max_bytes:
+                self._entries.pop(key, None)
+                return None
+            if doc is None:
+                doc = Document(path, text, stamp)
+                self._entries[key] = doc
+            else:
+                if doc.text() != text:
+                    doc.checkpoint()
+                    doc.table.replace(0, len(doc.table), text)
+                doc.mark_synced(stamp)
+                self._entries.move_to_end(key)
+            self._evict()
+            return doc
+
+    def extend(self, path: Path, before: Optional[Stamp], appended: str) -> None:
+        """Write-through for appends: the Document grows only if it matched the disk before the append."""
+        with self._lock:
+            doc = self._entries.get(str(path))
+            if doc is None or before is None or doc.dirty or doc.stamp != before:
+                self._entries.pop(str(path), None)
+                return
+            doc.checkpoint()
+            doc.table.append(appended)
+            doc.mark_synced(file_stamp(path))
+            self._evict()
+
+    def read(self, path: Path) -> str:
+        """Text of `path`: from the open Document when current, else from disk (and cached)."""
+        stamp = file_stamp(path)
+        if stamp is None:
+            raise FileNotFoundError(path)
+        text = self.get(path, stamp)
+        if text is None:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            # Stamp taken before the read: a concurrent write leaves a stale stamp, caught next time
+            self.put(path, text, stamp)
+        return text
+
+    def invalidate(self, path: Optional[Path] = None) -> None:
+        """Forgets clean Documents (all, or one path); dirty ones must be written back first."""
+        with self._lock:
+            keys = [str(path)] if path is not None else list(self._entries)
+            for key in keys:
+                doc = self._entries.get(key)
+                if doc is not None and not doc.dirty:
+                    del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            size = sum(doc.nbytes for doc in self._entries.values())
+            return {
+                "entries": len(self._entries),
+                "dirty": sum(doc.dirty for doc in self._entries.values()),
+                "pieces": sum(doc.table.piece_count for doc in self._entries.values()),
+                "mb": round(size / 1024 / 1024, 2),
+                "max_mb": round(self.max_bytes / 1024 / 1024, 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+# The process-wide instance
+manuscript_cache = BufferCache()
@@ -0,0 +1,232 @@
+import os
+import re
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# --- Optional Tokenizer ---
+try:
+    import tiktoken
+except Exception:
+    tiktoken = None
+
+# --- Configuration ---
+CHUNK_TOKENS = int(os.getenv("RAG_CHUNK_TOKENS", "350"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("RAG_CHUNK_OVERLAP", "50"))
+CHARS_PER_TOKEN = 4  # Heuristic used when tiktoken is not installed
+
+# Scene breaks ("***", "* * *", "---", "###", "§") and Markdown headings start a new scene
+_SCENE_BREAK_RE = re.compile(r"^\s*(?:[*#~=\-_§•]\s*){3,}\s*$|^\s*§\s*$")
+_HEADING_RE = re.compile(r"^\s{0,3}#{1,6}\s+\S")
+_BLOCK_SPLIT_RE = re.compile(r"\n[ \t]*\n")
+_SENTENCE_RE = re.compile(r"[^.!?…]+(?:[.!?…]+[\"'”’)\]]*|$)\s*", re.UNICODE)
+_CHAPTER_RE = re.compile(r"(?:^|[^a-z])(?:ch|chapter)[\s_\-]*(\d+)", re.IGNORECASE)
+
+_encoder = None
+
+
+def _get_encoder():
+    global _encoder
+    if _encoder is None and tiktoken is not None:
+        try:
+            _encoder = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            logger.warning(f"tiktoken unavailable, using a character heuristic for chunk sizes: {e}")
+            _encoder = False
+    return _encoder or None
+
+
+def count_tokens(text: str) -> int:
+    """Token count via tiktoken (cl100k_base) when installed, else ~4 characters per token."""
+    encoder = _get_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN) if text else 0
+
+
+def token_suffix_start(text: str, max_tokens: int) -> int:
+    """
+    Start offset of the longest suffix of `text` within `max_tokens` tokens,
+    snapped forward to a word boundary (binary search over whitespace positions).
+    """
+    if max_tokens <= 0 or not text:
+        return len(text)
+    # Generous window: a token is rarely longer than 8 characters
+    window_start = max(0, len(text) - max_tokens * 8)
+    if window_start == 0 and count_tokens(text) <= max_tokens:
+        return 0
+    cuts = [i + 1 for i in range(window_start, len(text)) if text[i].isspace()]
+    if not cuts:
+        return len(text)
+    lo, hi = 0, len(cuts) - 1
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if count_tokens(text[cuts[mid]:]) <= max_tokens:
+            hi = mid
+        else:
+            lo = mid + 1
+    return cuts[lo] if count_tokens(text[cuts[lo]:]) <= max_tokens else len(text)
+
+
+def chapter_number(file_id: str) -> Optional[int]:
+    """'ch01_Start' -> 1, 'Chapter 12' -> 12; None when the name carries no chapter number."""
+    match = _CHAPTER_RE.search(file_id or "")
+    return int(match.group(1)) if match else None
+
+
+class Chunker:
+    """
+    The Typesetter.
+    Packs a manuscript into retrieval chunks of ~`chunk_tokens` tokens.
+    Blocks (paragraphs, dialogue lines) are packed whole; consecutive chunks share
+    `overlap_tokens` of trailing blocks; chunks never straddle a scene break or heading.
+    Every chunk records its exact [char_start, char_end) span in the source text.
+    """
+
+    def __init__(self, chunk_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS):
+        self.chunk_tokens = max(16, int(chunk_tokens))
+        # Overlap beyond half a chunk would make every chunk mostly repeat the previous one
+        self.overlap_tokens = max(0, min(int(overlap_tokens), self.chunk_tokens // 2))
+
+    # --- Segmentation ---
+
+    def _blocks(self, content: str) -> List[Dict[str, Any]]:
+        """Splits on blank lines. Returns [{"start", "end", "tokens", "scene_index"}] with text-trimmed spans."""
+        blocks = []
+        scene_index = 0
+        scene_has_text = False
+        position = 0
+        separators = [(m.start(), m.end()) for m in _BLOCK_SPLIT_RE.finditer(content)] + [(len(content), len(content))]
+
+        for sep_start, sep_end in separators:
+            raw = content[position:sep_start]
+            lead = len(raw) - len(raw.lstrip())
+            start = position + lead
+            end = position + len(raw.rstrip())
+            position = sep_end
+            if end <= start:
+                continue
+
+            text = content[start:end]
+            first_line = text.split("\n", 1)[0]
+            if _SCENE_BREAK_RE.match(first_line) and "\n" not in text:
+                # A bare separator line: closes the scene, carries no content
+                if scene_has_text:
+                    scene_index += 1
+                    scene_has_text = False
+                continue
+            if _HEADING_RE.match(first_line) and scene_has_text:
+                scene_index += 1
+                scene_has_text = False
+
+            for piece_start, piece_end in self._fit(content, start, end):
+                blocks.append({
+                    "start": piece_start,
+                    "end": piece_end,
+                    "tokens": count_tokens(content[piece_start:piece_end]),
+                    "scene_index": scene_index,
+                })
+            scene_has_text = True
+
+        return blocks
+
+    def _fit(self, content: str, start: int, end: int) -> List[Tuple[int, int]]:
+        """Breaks a block larger than one chunk at sentence ends (then hard character windows)."""
+        if count_tokens(content[start:end]) <= self.chunk_tokens:
+            return [(start, end)]
+
+        pieces: List[Tuple[int, int]] = []
+        piece_start = None
+        piece_tokens = 0
+        for match in _SENTENCE_RE.finditer(content, start, end):
+            if match.end() == match.start():
+                continue
+            sentence_tokens = count_tokens(match.group(0))
+            if piece_start is not None and piece_tokens + sentence_tokens > self.chunk_tokens:
+                pieces.append((piece_start, match.start()))
+                piece_start, piece_tokens = None, 0
+            if piece_start is None:
+                piece_start = match.start()
+            piece_tokens += sentence_tokens
+        if piece_start is not None:
+            pieces.append((piece_start, end))
+
+        window = self.chunk_tokens * CHARS_PER_TOKEN
+        fitted: List[Tuple[int, int]] = []
+        for piece_start, piece_end in pieces:
+            # A single run-on "sentence" longer than a chunk: cut at whitespace near the window
+            while count_tokens(content[piece_start:piece_end]) > self.chunk_tokens and piece_end - piece_start > window:
+                cut = content.rfind(" ", piece_start + window // 2, piece_start + window)
+                cut = cut if cut > piece_start else piece_start + window
+                fitted.append((piece_start, cut))
+                piece_start = cut
+                while piece_start < piece_end and content[piece_start].isspace():
+                    piece_start += 1
+            trimmed_end = piece_end
+            while trimmed_end > piece_start and content[trimmed_end - 1].isspace():
+                trimmed_end -= 1
+            if trimmed_end > piece_start:
+                fitted.append((piece_start, trimmed_end))
+        return fitted
+
+    def scenes(self, content: str) -> List[Dict[str, Any]]:
+        """Scene spans of a manuscript: [{"scene_index", "char_start", "char_end", "text"}]."""
+        spans: Dict[int, List[int]] = {}
+        for block in self._blocks(content or ""):
+            span = spans.setdefault(block["scene_index"], [block["start"], block["end"]])
+            span[1] = block["end"]
+        return [
+            {"scene_index": index, "char_start": start, "char_end": end, "text": content[start:end]}
+            for index, (start, end) in sorted(spans.items())
+        ]
+
+    # --- Packing ---
+
+    def chunk(self, content: str) -> List[Dict[str, Any]]:
+        """
+        Returns [{"text", "char_start", "char_end", "scene_index", "tokens"}] in reading order.
+        `text` is exactly content[char_start:char_end].
+        """
+        if not content or not content.strip():
+            return []
+
+        chunks: List[Dict[str, Any]] = []
+        current: List[Dict[str, Any]] = []
+        current_tokens = 0
+
+        def _emit() -> None:
+            start, end = current[0]["start"], current[-1]["end"]
+            text = content[start:end]
+            chunks.append({
+                "text": text,
+                "char_start": start,
+                "char_end": end,
+                "scene_index": current[0]["scene_index"],
+                "tokens": count_tokens(text),
+            })
+
+        for block in self._blocks(content):
+            new_scene = bool(current) and block["scene_index"] != current[-1]["scene_index"]
+            if current and (new_scene or current_tokens + block["tokens"] > self.chunk_tokens):
+                _emit()
+                if new_scene:
+                    current, current_tokens = [], 0
+                else:
+                    # Carry trailing blocks forward as overlap, newest first, within the budget
+                    carried: List[Dict[str, Any]] = []
+                    carried_tokens = 0
+                    for prev in reversed(current):
+                        if carried_tokens + prev["tokens"] > self.overlap_tokens:
+                            break
+                        carried.insert(0, prev)
+                        carried_tokens += prev["tokens"]
+                    if carried_tokens + block["tokens"] > self.chunk_tokens:
+                        carried, carried_tokens = [], 0
+                    current, current_tokens = carried, carried_tokens
+            current.append(block)
+            current_tokens += block["tokens"]
+
+        if current:
+            _emit()
+        return chunks
@@ -0,0 +1,111 @@
+import os
+import math
+import logging
+from collections import Counter
+from typing import List, Dict, Any, Optional, Sequence
+
+from core.chunker import count_tokens
+from core.lexical_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+OVERFETCH = int(os.getenv("RAG_OVERFETCH", "4"))                                 # Candidates fetched per requested passage
+CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "1200"))                    # Default token budget for retrieved context
+MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.7"))                           # 1.0 = pure relevance, 0.0 = pure diversity
+DUPLICATE_THRESHOLD = float(os.getenv("RAG_DUPLICATE_THRESHOLD", "0.6"))         # Shingle overlap that counts as the same passage
+PROXIMITY_WEIGHT = float(os.getenv("RAG_PROXIMITY_WEIGHT", "0.15"))              # Share of relevance given to chapter proximity
+PROXIMITY_HALF_LIFE = float(os.getenv("RAG_PROXIMITY_HALF_LIFE", "5"))           # Chapters until the proximity prior halves
+SHINGLE_SIZE = 3
+
+
+def _profile(hit: Dict[str, Any]) -> Dict[str, Any]:
+    """Per-candidate features: term vector (for MMR), word shingles (for duplicates) and token cost."""
+    document = hit.get("document") or ""
+    terms = tokenize(document)
+    vector = Counter(terms)
+    shingles = {tuple(terms[i:i + SHINGLE_SIZE]) for i in range(max(1, len(terms) - SHINGLE_SIZE + 1))} if terms else set()
+    return {
+        "vector": vector,
+        "norm": math.sqrt(sum(v * v for v in vector.values())) or 1.0,
+        "shingles": shingles,
+        "tokens": count_tokens(document),
+    }
+
+
+def _cosine(a: Dict[str, Any], b: Dict[str, Any]) -> float:
+    small, large = (a["vector"], b["vector"]) if len(a["vector"]) <= len(b["vector"]) else (b["vector"], a["vector"])
+    dot = sum(count * large.get(term, 0) for term, count in small.items())
+    return dot / (a["norm"] * b["norm"])
+
+
+def _overlap(a: Dict[str, Any], b: Dict[str, Any]) -> float:
+    """Overlap coefficient of the shingle sets: a recap that quotes a whole paragraph scores ~1."""
+    if not a["shingles"] or not b["shingles"]:
+        return 0.0
+    return len(a["shingles"] & b["shingles"]) / min(len(a["shingles"]), len(b["shingles"]))
+
+
+def _relevance(hits: List[Dict[str, Any]], anchor_chapter: Optional[int]) -> List[float]:
+    """Min-max scaled retrieval score (rank-based when scores are flat), blended with the chapter prior."""
+    scores = [float(hit.get("score") or 0.0) for hit in hits]
+    low, high = min(scores), max(scores)
+    if high > low:
+        relevance = [(s - low) / (high - low) for s in scores]
+    else:
+        relevance = [1.0 - i / len(hits) for i in range(len(hits))]
+
+    if anchor_chapter is None or PROXIMITY_WEIGHT <= 0:
+        return relevance
+    blended = []
+    for hit, value in zip(hits, relevance):
+        chapter = (hit.get("metadata") or {}).get("chapter")
+        proximity = 0.0
+        if isinstance(chapter, (int, float)):
+            proximity = 0.5 ** (abs(anchor_chapter - chapter) / PROXIMITY_HALF_LIFE)
+        blended.append((1 - PROXIMITY_WEIGHT) * value + PROXIMITY_WEIGHT * proximity)
+    return blended
+
+
+def select_context(hits: Sequence[Dict[str, Any]], n_results: int, budget_tokens: Optional[int] = CONTEXT_TOKENS,
+                   anchor_chapter: Optional[int] = None, mmr_lambda: float = MMR_LAMBDA) -> List[Dict[str, Any]]:
+    """
+    Post-retrieval stage over an over-fetched, best-first candidate list:
+    1. near-duplicates collapse onto their best-ranked copy (shingle overlap >= DUPLICATE_THRESHOLD);
+    2. Maximal Marginal Relevance picks passages that are relevant *and* add something new,
+       with relevance nudged toward chapters close to `anchor_chapter`;
+    3. passages are packed into `budget_tokens` (None = no budget), at most `n_results` of them.
+    The most relevant passage is always kept, even if it alone exceeds the budget.
+    """
+    hits = list(hits)
+    if not hits or n_results <= 0:
+        return []
+
+    profiles = [_profile(hit) for hit in hits]
+    relevance = _relevance(hits, anchor_chapter)
+
+    # 1. Near-duplicate collapse, best first
+    kept: List[int] = []
+    for i in sorted(range(len(hits)), key=lambda i: -relevance[i]):
+        if any(_overlap(profiles[i], profiles[j]) >= DUPLICATE_THRESHOLD for j in kept):
+            continue
+        kept.append(i)
+
+    # 2-3. MMR under the token budget
+    selected: List[int] = []
+    used = 0
+    redundancy = {i: 0.0 for i in kept}
+    remaining = list(kept)
+    while remaining and len(selected) < n_results:
+        best = max(remaining, key=lambda i: mmr_lambda * relevance[i] - (1 - mmr_lambda) * redundancy[i])
+        remaining.remove(best)
+        cost = profiles[best]["tokens"]
+        if selected and budget_tokens is not None and used + cost > budget_tokens:
+            continue  # a shorter passage further down may still fit
+        selected.append(best)
+        used += cost
+        for i in remaining:
+            redundancy[i] = max(redundancy[i], _cosine(profiles[i], profiles[best]))
+
+    logger.debug(f"Context selection: {len(hits)} candidates, {len(kept)} distinct, {len(selected)} packed ({used} tokens).")
+    return [hits[i] for i in selected]
@@ -0,0 +1,238 @@
+import os
+import logging
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+FUZZY_MAX_CHARS = int(os.getenv("EDIT_FUZZY_MAX_CHARS", "1500"))               # Longer search texts skip the fuzzy pass
+FUZZY_MAX_ERROR_RATIO = float(os.getenv("EDIT_FUZZY_MAX_ERROR_RATIO", "0.1"))   # Edit distance allowed, as a share of the search text
+FUZZY_MAX_CANDIDATES = 8
+ANCHOR_CHARS = 12
+
+# Typographic variants models rarely reproduce exactly
+_CHAR_MAP = {
+    "‘": "'", "’": "'", "‚": "'", "‛": "'", "′": "'",
+    "“": '"', "”": '"', "„": '"', "‟": '"', "″": '"',
+    "–": "-", "—": "-", "−": "-",
+    "…": "...",
+}
+
+
+class EditError(Exception):
+    """Raised when an edit batch cannot be planned (malformed edits)."""
+    pass
+
+
+# --- Normalization ---
+
+def normalize(text: str) -> Tuple[str, List[int], List[int]]:
+    """
+    Quote/dash-folded, whitespace-collapsed text plus, for every normalized
+    character, the [start, end) span of the original characters it came from.
+    """
+    out: List[str] = []
+    starts: List[int] = []
+    ends: List[int] = []
+    i, n = 0, len(text)
+    while i < n:
+        ch = text[i]
+        if ch.isspace():
+            j = i + 1
+            while j < n and text[j].isspace():
+                j += 1
+            out.append(" ")
+            starts.append(i)
+            ends.append(j)
+            i = j
+            continue
+        mapped = _CHAR_MAP.get(ch, ch)
+        for c in mapped:
+            out.append(c)
+            starts.append(i)
+            ends.append(i + 1)
+        i += 1
+    return "".join(out), starts, ends
+
+
+def _occurrences(haystack: str, needle: str, limit: int = 0) -> List[int]:
+    found, start = [], haystack.find(needle)
+    while start != -1:
+        found.append(start)
+        if limit and len(found) >= limit:
+            break
+        start = haystack.find(needle, start + 1)
+    return found
+
+
+# --- Fuzzy Matching ---
+
+def bounded_distance(pattern: str, text: str, max_distance: int) -> Optional[Tuple[int, int]]:
+    """
+    Levenshtein distance between `pattern` and the best prefix of `text`
+    (the match may end anywhere), limited to a diagonal band of +-max_distance.
+    Returns (distance, match length in text) or None if it exceeds max_distance.
+    """
+    m = len(pattern)
+    width = min(len(text), m + max_distance)
+    big = max_distance + 1
+    previous = list(range(width + 1))
+    for i in range(1, m + 1):
+        lo = max(1, i - max_distance)
+        hi = min(width, i + max_distance)
+        current = [big] * (width + 1)
+        if i <= max_distance:
+            current[0] = i
+        pc = pattern[i - 1]
+        best = current[0]
+        for j in range(lo, hi + 1):
+            cost = previous[j - 1] + (pc != text[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current[j] = cost
+            if cost < best:
+                best = cost
+        if best > max_distance:
+            return None
+        previous = current
+    lo = max(0, m - max_distance)
+    distance, length = min((previous[j], j) for j in range(lo, width + 1))
+    return (distance, length) if distance <= max_distance else None
+
+
+def _fuzzy_candidates(norm_text: str, norm_search: str) -> List[Tuple[int, int]]:
+    """(offset in search, position in text) of exact anchors: head, middle and tail of the search text."""
+    m = len(norm_search)
+    size = min(ANCHOR_CHARS, m)
+    offsets = sorted({0, max(0, m // 2 - size // 2), max(0, m - size)})
+    found = []
+    for offset in offsets:
+        anchor = norm_search[offset:offset + size]
+        found.extend((offset, position) for position in _occurrences(norm_text, anchor, limit=FUZZY_MAX_CANDIDATES))
+    return found
+
+
+def _fuzzy_locate(norm_text: str, norm_search: str) -> Tuple[str, Optional[Tuple[int, int]], Optional[int]]:
+    """
+    Grows each anchor hit outwards: the search text before the anchor is matched
+    backwards from it, the rest forwards, each within the distance budget.
+    """
+    m = len(norm_search)
+    if m > FUZZY_MAX_CHARS:
+        return "not_found", None, None
+    max_distance = max(1, int(m * FUZZY_MAX_ERROR_RATIO))
+    scored = {}
+    for offset, position in _fuzzy_candidates(norm_text, norm_search):
+        head = norm_search[:offset]
+        before = norm_text[max(0, position - offset - max_distance):position]
+        back = bounded_distance(head[::-1], before[::-1], max_distance) if head else (0, 0)
+        if back is None:
+            continue
+        tail = norm_search[offset:]
+        forward = bounded_distance(tail, norm_text[position:position + len(tail) + max_distance], max_distance - back[0])
+        if forward is None:
+            continue
+        span = (position - back[1], position + forward[1])
+        scored[span] = min(scored.get(span, max_distance + 1), back[0] + forward[0])
+    if not scored:
+        return "not_found", None, None
+    ranked = sorted((distance, span) for span, distance in scored.items())
+    best_distance, best = ranked[0]
+    # Another equally good window that does not overlap the best one: refuse to guess
+    for distance, (start, end) in ranked[1:]:
+        if distance == best_distance and (end <= best[0] or start >= best[1]):
+            return "ambiguous", None, None
+    return "fuzzy", best, best_distance
+
+
+# --- Planning ---
+
+def locate(text: str, search: str, normalized: Optional[Tuple[str, List[int], List[int]]] = None) -> Dict[str, Any]:
+    """
+    Finds `search` in `text`: exact first, then quote/whitespace-normalized,
+    then a bounded fuzzy pass. Returns {"status": "exact" | "normalized" | "fuzzy"
+    | "not_found" | "ambiguous", "start", "end", "distance", "count"}.
+    """
+    if not search:
+        return {"status": "not_found"}
+    positions = _occurrences(text, search, limit=2)
+    if len(positions) == 1:
+        return {"status": "exact", "start": positions[0], "end": positions[0] + len(search)}
+    if len(positions) > 1:
+        return {"status": "ambiguous", "count": text.count(search)}
+
+    norm_text, starts, ends = normalized or normalize(text)
+    norm_search = normalize(search)[0].strip()
+    if not norm_search:
+        return {"status": "not_found"}
+    positions = _occurrences(norm_text, norm_search, limit=2)
+    if len(positions) > 1:
+        return {"status": "ambiguous", "count": norm_text.count(norm_search)}
+    if positions:
+        span, status, distance = (positions[0], positions[0] + len(norm_search)), "normalized", 0
+    else:
+        status, span, distance = _fuzzy_locate(norm_text, norm_search)
+        if span is None:
+            return {"status": status}
+    start, end = span
+    return {"status": status, "start": starts[start], "end": ends[end - 1], "distance": distance}
+
+
+def apply_spans(text: str, spans: Sequence[Tuple[int, int, str]]) -> str:
+    """`text` with every non-overlapping (start, end, replacement) span applied, in one join."""
+    pieces, cursor = [], 0
+    for start, end, replacement in sorted(spans, key=lambda span: (span[0], span[1])):
+        pieces.append(text[cursor:start])
+        pieces.append(replacement)
+        cursor = end
+    pieces.append(text[cursor:])
+    return "".join(pieces)
+
+
+def locate_edits(text: str, edits: Sequence[Dict[str, Any]]) -> Tuple[List[Tuple[int, int, str]], List[Dict[str, Any]]]:
+    """
+    Locates every edit against the original text and rejects overlapping ones
+    (the earlier edit in the batch wins). Returns ((start, end, replacement)
+    spans of the edits to apply, sorted by position; per-edit outcomes in
+    request order).
+    """
+    normalized = None
+    outcomes: List[Dict[str, Any]] = []
+    spans: List[Tuple[int, int, int]] = []   # (start, end, edit index)
+    for index, edit in enumerate(edits):
+        if not isinstance(edit, dict) or not isinstance(edit.get("search_text"), str):
+            raise EditError(f"Edit {index} must be an object with 'search_text' and 'replace_text'.")
+        search = edit["search_text"]
+        if not (search in text) and normalized is None:
+            normalized = normalize(text)
+        found = locate(text, search, normalized)
+        if found["status"] in ("not_found", "ambiguous"):
+            outcome: Dict[str, Any] = {"index": index, "status": found["status"]}
+            if found.get("count"):
+                outcome["count"] = found["count"]
+            outcomes.append(outcome)
+            continue
+        outcome = {"index": index, "status": "applied", "match": found["status"]}
+        start, end = found["start"], found["end"]
+        clash = next((other for s, e, other in spans if start < e and s < end), None)
+        if clash is not None:
+            outcome.update({"status": "conflict", "conflicts_with": clash})
+            outcomes.append(outcome)
+            continue
+        outcome.update({"start": start, "end": end})
+        if found.get("distance"):
+            outcome["distance"] = found["distance"]
+        spans.append((start, end, index))
+        outcomes.append(outcome)
+    return [(start, end, str(edits[index].get("replace_text", ""))) for start, end, index in sorted(spans)], outcomes
+
+
+def plan_edits(text: str, edits: Sequence[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    locate_edits() plus the new text with the applicable edits done in one pass.
+    Returns (new text, per-edit outcomes in request order).
+    """
+    spans, outcomes = locate_edits(text, edits)
+    return apply_spans(text, spans), outcomes
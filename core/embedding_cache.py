@@ -0,0 +1,266 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "textcraft" / "embeddings.sqlite3"
+DEFAULT_MAX_MB = 512
+EVICTION_TARGET_RATIO = 0.9  # Evict down to 90% of the cap to avoid evicting on every write
+
+
+def normalize_text(text: str) -> str:
+    """Collapses whitespace so trivially different copies of a passage share one cache entry."""
+    return " ".join((text or "").split())
+
+
+def text_hash(text: str) -> bytes:
+    """SHA-256 digest of the already-normalized text."""
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    The Muscle Memory.
+    A durable, machine-wide cache of embedding vectors keyed by (model, normalized-text hash).
+    Vectors are stored as packed float32 BLOBs in SQLite and evicted LRU once the size cap is hit.
+    """
+
+    def __init__(self, path: Path = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        # Session statistics (this process only)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # check_same_thread=False: the store is shared across the MemoryStore worker threads, guarded by _lock.
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                id INTEGER PRIMARY KEY,
+                model TEXT NOT NULL,
+                text_hash BLOB NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                last_access INTEGER NOT NULL,
+                UNIQUE (model, text_hash)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_lru ON embeddings (last_access)")
+        self._conn.commit()
+        self._approx_bytes = self._measure_bytes()
+
+    def _measure_bytes(self) -> int:
+        row = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()
+        return int(row[0] or 0)
+
+    @staticmethod
+    def _pack(vector: Sequence[float]) -> bytes:
+        return array("f", vector).tobytes()
+
+    @staticmethod
+    def _unpack(blob: bytes) -> List[float]:
+        values = array("f")
+        values.frombytes(blob)
+        return values.tolist()
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """
+        Looks up the vectors for already-normalized texts.
+        Returns a list aligned with `texts`; misses are None. Hits are touched for LRU.
+        """
+        if not texts:
+            return []
+
+        keys = [text_hash(t) for t in texts]
+        found: Dict[bytes, List[float]] = {}
+        hit_ids: List[int] = []
+
+        with self._lock:
+            try:
+                # SQLite limits bound parameters; query in slices.
+                unique_keys = list(dict.fromkeys(keys))
+                for start in range(0, len(unique_keys), 500):
+                    batch = unique_keys[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self._conn.execute(
+                        f"SELECT id, text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                        [model, *batch],
+                    ).fetchall()
+                    for row_id, key, blob in rows:
+                        found[bytes(key)] = self._unpack(blob)
+                        hit_ids.append(row_id)
+
+                if hit_ids:
+                    now = time.time_ns()
+                    for start in range(0, len(hit_ids), 500):
+                        batch = hit_ids[start:start + 500]
+                        placeholders = ",".join("?" * len(batch))
+                        self._conn.execute(
+                            f"UPDATE embeddings SET last_access = ? WHERE id IN ({placeholders})",
+                            [now, *batch],
+                        )
+                    self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache lookup failed: {e}")
+                found = {}
+
+            results = [found.get(k) for k in keys]
+            hit_count = sum(1 for r in results if r is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+
+        return results
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        """Single-text convenience wrapper around get_many()."""
+        return self.get_many(model, [text])[0]
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        """Stores vectors for already-normalized texts, then enforces the size cap."""
+        if not texts:
+            return
+
+        now = time.time_ns()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            if not vector:
+                continue
+            rows.append((model, text_hash(text), len(vector), self._pack(vector), now))
+
+        if not rows:
+            return
+
+        with self._lock:
+            try:
+                # Only rows actually inserted grow the size counter; existing ones just get their access time bumped
+                added = 0
+                touched = []
+                for row in rows:
+                    cursor = self._conn.execute(
+                        """
+                        INSERT INTO embeddings (model, text_hash, dim, vector, last_access)
+                        VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT (model, text_hash) DO NOTHING
+                        """,
+                        row,
+                    )
+                    if cursor.rowcount > 0:
+                        added += len(row[3])
+                    else:
+                        touched.append((row[4], row[0], row[1]))
+                if touched:
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                        touched,
+                    )
+                self._conn.commit()
+                self._approx_bytes += added
+                if self._approx_bytes > self.max_bytes:
+                    self._evict()
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache write failed: {e}")
+
+    def put(self, model: str, text: str, vector: Sequence[float]) -> None:
+        """Single-text convenience wrapper around put_many()."""
+        self.put_many(model, [text], [vector])
+
+    def _evict(self) -> None:
+        """Deletes least-recently-used rows until the cache is back under the target size. Caller holds _lock."""
+        # The running counter drifts when other processes share the file; re-measure before deciding.
+        self._approx_bytes = self._measure_bytes()
+        target = int(self.max_bytes * EVICTION_TARGET_RATIO)
+        if self._approx_bytes <= self.max_bytes:
+            return
+
+        evicted = 0
+        freed = 0
+        cursor = self._conn.execute("SELECT id, LENGTH(vector) FROM embeddings ORDER BY last_access ASC")
+        doomed: List[int] = []
+        for row_id, size in cursor:
+            doomed.append(row_id)
+            freed += size
+            if self._approx_bytes - freed <= target:
+                break
+
+        for start in range(0, len(doomed), 500):
+            batch = doomed[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            self._conn.execute(f"DELETE FROM embeddings WHERE id IN ({placeholders})", batch)
+            evicted += len(batch)
+        self._conn.commit()
+
+        self._approx_bytes -= freed
+        self.evictions += evicted
+        logger.info(f"Embedding cache evicted {evicted} entries ({freed / 1024 / 1024:.1f} MB).")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit-rate and size statistics for this process's session."""
+        lookups = self.hits + self.misses
+        with self._lock:
+            try:
+                entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            except sqlite3.Error:
+                entries = -1
+        return {
+            "path": str(self.path),
+            "entries": entries,
+            "bytes": self._approx_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+
+
+# --- Shared Instance ---
+# One cache per process, shared by every MemoryStore (and therefore every project).
+
+_shared_cache: Optional[EmbeddingCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_cache() -> Optional[EmbeddingCache]:
+    """
+    Returns the process-wide EmbeddingCache, creating it on first use.
+    Returns None when disabled via RAG_EMBEDDING_CACHE=false or if the cache cannot be opened.
+    """
+    global _shared_cache
+
+    if os.getenv("RAG_EMBEDDING_CACHE", "true").lower() != "true":
+        return None
+
+    with _shared_lock:
+        if _shared_cache is None:
+            path = Path(os.getenv("RAG_EMBEDDING_CACHE_PATH") or DEFAULT_CACHE_PATH).expanduser()
+            max_mb = float(os.getenv("RAG_EMBEDDING_CACHE_MAX_MB", str(DEFAULT_MAX_MB)))
+            try:
+                _shared_cache = EmbeddingCache(path, max_bytes=int(max_mb * 1024 * 1024))
+                logger.info(f"Embedding cache opened at {path}")
+            except Exception as e:
+                logger.error(f"Failed to open embedding cache at {path}: {e}")
+                return None
+        return _shared_cache
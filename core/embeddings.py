@@ -0,0 +1,249 @@
+import os
+import re
+import json
+import zlib
+import logging
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Sequence
+
+import aiohttp
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+try:
+    from openai import OpenAI
+except Exception:
+    OpenAI = None
+
+from core.lexical_index import STOPWORDS
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+EMBEDDING_TIMEOUT_SECONDS = int(os.getenv("AI_TIMEOUT", "60"))
+DEFAULT_OPENAI_MODEL = "text-embedding-3-small"
+DEFAULT_HASH_DIM = 512
+PROVIDERS = ("auto", "openai", "hashing")
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class EmbeddingProviderError(Exception):
+    """Raised when an embedding provider cannot be configured."""
+    pass
+
+
+class EmbeddingProvider:
+    """
+    Interface for whatever turns text into vectors for MemoryStore.
+
+    `model` names the vector space: the persistent cache and the vector index are
+    only valid for one model, so it must change whenever the output would.
+    Remote providers are called through aembed() on the event loop; local ones
+    are CPU-bound and MemoryStore runs embed() on its worker thread.
+    """
+
+    name = "base"
+    model = ""
+    remote = False
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+    async def aembed(self, session: aiohttp.ClientSession, texts: Sequence[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+
+# --- OpenAI-compatible Provider ---
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """The /embeddings endpoint of the configured LLM provider (OpenAI, Requesty, ...)."""
+
+    name = "openai"
+    remote = True
+
+    def __init__(self, model: Optional[str] = None):
+        if OpenAI is None:
+            raise EmbeddingProviderError("The openai package is not installed.")
+
+        self.model = model or os.getenv("RAG_EMBEDDING_MODEL", DEFAULT_OPENAI_MODEL)
+        llm_api_key = os.getenv("LLM_API_KEY")
+        requesty_api_key = os.getenv("REQUESTY_API_KEY")
+        self.api_key = llm_api_key or requesty_api_key
+        if not self.api_key:
+            raise EmbeddingProviderError("no API key configured for embeddings")
+
+        _raw_base_url = os.getenv("LLM_API_BASE_URL")
+        if requesty_api_key and not llm_api_key and _raw_base_url == "https://api.openai.com/v1/chat/completions":
+            _raw_base_url = None
+
+        base_url_prefix = os.getenv("REQUESTY_BASE_URL") or _raw_base_url
+        if not base_url_prefix:
+            if requesty_api_key and not llm_api_key:
+                base_url_prefix = "https://router.requesty.ai/v1"
+
+        if base_url_prefix and base_url_prefix.rstrip("/").endswith("/chat/completions"):
+            base_url_prefix = base_url_prefix[: -len("/chat/completions")].rstrip("/")
+
+        default_headers = {}
+        requesty_http_referer = os.getenv("REQUESTY_HTTP_REFERER")
+        requesty_x_title = os.getenv("REQUESTY_X_TITLE")
+        if requesty_http_referer:
+            default_headers["HTTP-Referer"] = requesty_http_referer
+        if requesty_x_title:
+            default_headers["X-Title"] = requesty_x_title
+
+        if base_url_prefix:
+            self.client = OpenAI(api_key=self.api_key, base_url=base_url_prefix, default_headers=default_headers or None)
+        else:
+            self.client = OpenAI(api_key=self.api_key, default_headers=default_headers or None)
+
+        # Async endpoint (same provider as the blocking client)
+        self.url = f"{(base_url_prefix or 'https://api.openai.com/v1').rstrip('/')}/embeddings"
+        self.headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            **default_headers,
+        }
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        response = self.client.embeddings.create(input=list(texts), model=self.model)
+        return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+    async def aembed(self, session: aiohttp.ClientSession, texts: Sequence[str]) -> List[List[float]]:
+        async with session.post(
+            self.url,
+            headers=self.headers,
+            json={"input": list(texts), "model": self.model},
+            timeout=aiohttp.ClientTimeout(total=EMBEDDING_TIMEOUT_SECONDS)
+        ) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise RuntimeError(f"Embeddings API Error {response.status}: {error_text[:300]}")
+            payload = await response.json()
+        return [item["embedding"] for item in sorted(payload["data"], key=lambda d: d["index"])]
+
+
+# --- Local Hashing Provider ---
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    The Pocket Lexicon.
+    A deterministic, offline embedder: character 3-5-grams plus word unigrams and
+    bigrams, hashed into `dim` signed buckets (the "hashing trick"), log-scaled
+    and L2-normalized. No vocabulary, no model file, no network. It captures
+    spelling and phrasing overlap, not meaning, which makes it a reproducible
+    stand-in for CI, air-gapped machines and tests.
+    """
+
+    name = "hashing"
+    remote = False
+
+    CHAR_NGRAMS = (3, 4, 5)
+    WORD_WEIGHT = 2.0
+    BIGRAM_WEIGHT = 1.0
+
+    def __init__(self, dim: int = DEFAULT_HASH_DIM):
+        if np is None:
+            raise EmbeddingProviderError("NumPy is required for the hashing embedder.")
+        self.dim = int(dim)
+        if self.dim < 16:
+            raise EmbeddingProviderError(f"Hashing embedder dimension too small: {self.dim}")
+        self.model = f"hashing-ngram-v1-{self.dim}"
+
+    def _char_features(self, text: str):
+        """Vectorized polynomial hash of every byte n-gram. Returns (buckets, signs)."""
+        data = np.frombuffer(f" {text} ".encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+        buckets, signs = [], []
+        for n in self.CHAR_NGRAMS:
+            if len(data) < n:
+                continue
+            width = len(data) - n + 1
+            h = np.full(width, n, dtype=np.uint64)
+            for j in range(n):
+                h = h * np.uint64(1099511628211) + data[j:j + width]  # FNV prime; wraps mod 2^64
+            # Final avalanche (splitmix64) so low bits are well mixed before the modulo
+            h ^= h >> np.uint64(30)
+            h *= np.uint64(0xBF58476D1CE4E5B9)
+            h ^= h >> np.uint64(27)
+            h *= np.uint64(0x94D049BB133111EB)
+            h ^= h >> np.uint64(31)
+            buckets.append((h % np.uint64(self.dim)).astype(np.int64))
+            signs.append(np.where((h >> np.uint64(63)) == 1, -1.0, 1.0))
+        if not buckets:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        return np.concatenate(buckets), np.concatenate(signs)
+
+    def _word_features(self, text: str):
+        # Function words would otherwise dominate every long chunk's vector
+        words = [w for w in _WORD_RE.findall(text) if w not in STOPWORDS]
+        keys = [f"w:{w}" for w in words] + [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+        weights = [self.WORD_WEIGHT] * len(words) + [self.BIGRAM_WEIGHT] * max(0, len(words) - 1)
+        buckets = np.empty(len(keys), dtype=np.int64)
+        signs = np.empty(len(keys))
+        for i, (key, weight) in enumerate(zip(keys, weights)):
+            h = zlib.crc32(key.encode("utf-8"))
+            buckets[i] = h % self.dim
+            signs[i] = -weight if h & 0x80000000 else weight
+        return buckets, signs
+
+    def embed_one(self, text: str):
+        text = " ".join((text or "").lower().split())
+        char_buckets, char_signs = self._char_features(text)
+        word_buckets, word_signs = self._word_features(text)
+        vector = np.bincount(char_buckets, weights=char_signs, minlength=self.dim)
+        vector += np.bincount(word_buckets, weights=word_signs, minlength=self.dim)
+        # Sublinear term frequency: long chunks should not drown out short ones
+        vector = np.sign(vector) * np.log1p(np.abs(vector))
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return vector.astype(np.float32)
+        return (vector / norm).astype(np.float32)
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        return [self.embed_one(text).tolist() for text in texts]
+
+
+# --- Factory ---
+
+def load_memory_conf(project_root: Optional[Path]) -> Dict[str, Any]:
+    """The optional "memory" block of the project's story_bible/project_conf.json."""
+    if project_root is None:
+        return {}
+    path = Path(project_root) / "data" / "story_bible" / "project_conf.json"
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            memory_conf = json.load(f).get("memory", {})
+        return memory_conf if isinstance(memory_conf, dict) else {}
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable memory settings in {path}: {e}")
+        return {}
+
+
+def create_embedding_provider(project_root: Optional[Path] = None, provider: Optional[str] = None) -> EmbeddingProvider:
+    """
+    Builds the embedding provider. Precedence: explicit argument, the project's
+    project_conf.json {"memory": {"embedding_provider": ...}}, then RAG_EMBEDDING_PROVIDER.
+    'auto' uses the OpenAI-compatible endpoint when an API key is configured and
+    the local hashing embedder otherwise.
+    """
+    conf = load_memory_conf(project_root)
+    choice = (provider or conf.get("embedding_provider") or os.getenv("RAG_EMBEDDING_PROVIDER") or "auto").strip().lower()
+    if choice not in PROVIDERS:
+        raise EmbeddingProviderError(f"Unknown embedding provider: {choice}")
+
+    if choice in {"openai", "auto"}:
+        try:
+            return OpenAIEmbeddingProvider(model=conf.get("embedding_model"))
+        except EmbeddingProviderError as e:
+            if choice == "openai":
+                raise
+            logger.info(f"OpenAI embeddings unavailable ({e}); using the local hashing embedder.")
+
+    dim = conf.get("embedding_dim") or os.getenv("RAG_HASH_EMBEDDING_DIM") or DEFAULT_HASH_DIM
+    return HashingEmbeddingProvider(dim=int(dim))
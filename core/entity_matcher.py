@@ -0,0 +1,132 @@
+from collections import deque
+from typing import Dict, Any, Iterable, List, Tuple
+
+# (entity id, matched name, start, end) in the scanned text
+Match = Tuple[str, str, int, int]
+
+
+def _is_word(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+class EntityMatcher:
+    """
+    The Lookout.
+    Finds every occurrence of a set of names (character names and aliases,
+    location names) in one pass over a text, with an Aho-Corasick automaton
+    built once from the names: the cost of a scan grows with the text, not with
+    names x text. Matching is case-insensitive and whole-word: "Al" matches
+    "Al," but not "also", and "Sector 4 (The Rust Belt)" matches as written.
+    Build it through `character_matcher` / `location_matcher` so it is rebuilt
+    only when the bible file changes.
+    """
+
+    def __init__(self, entities: Dict[str, Iterable[str]]):
+        self.order: Dict[str, int] = {}                     # entity id -> position in the bible
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, str, int, bool]]] = [[]]   # state -> (entity id, name, length, starts with a word char)
+        self._word_end: List[bool] = [False]                # the state's last char is a word char
+        for entity_id, names in entities.items():
+            self.order.setdefault(entity_id, len(self.order))
+            for name in names:
+                key = name.strip().lower() if isinstance(name, str) else ""
+                if key:
+                    self._add(key, entity_id, name.strip())
+        self._link()
+
+    def _add(self, key: str, entity_id: str, name: str) -> None:
+        state = 0
+        for char in key:
+            following = self._goto[state].get(char)
+            if following is None:
+                following = len(self._goto)
+                self._goto[state][char] = following
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._word_end.append(_is_word(char))
+            state = following
+        self._out[state].append((entity_id, name, len(key), _is_word(key[0])))
+
+    def _link(self) -> None:
+        """Failure links, breadth first; each state inherits the outputs of its failure state."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self._goto[state].items():
+                queue.append(following)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[following] = target if target != following else 0
+                self._out[following] = self._out[following] + self._out[self._fail[following]]
+
+    @property
+    def states(self) -> int:
+        return len(self._goto)
+
+    # --- Scanning ---
+
+    def scan(self, text: str) -> List[Match]:
+        """Every whole-word occurrence, in text order (overlapping names all reported)."""
+        haystack = text.lower()
+        size = len(haystack)
+        goto, fail, out, word_end = self._goto, self._fail, self._out, self._word_end
+        matches: List[Match] = []
+        state = 0
+        for end, char in enumerate(haystack, 1):
+            following = goto[state].get(char)
+            while following is None and state:
+                state = fail[state]
+                following = goto[state].get(char)
+            state = following or 0
+            # A boundary is only required where the name itself starts/ends with a word char;
+            # every name ending at a state ends with the same char, so the end is checked once
+            if not out[state] or (word_end[state] and end < size and _is_word(haystack[end])):
+                continue
+            for entity_id, name, length, word_start in out[state]:
+                start = end - length
+                if word_start and start > 0 and _is_word(haystack[start - 1]):
+                    continue
+                matches.append((entity_id, name, start, end))
+        return matches
+
+    def find(self, text: str) -> List[str]:
+        """Ids of the entities mentioned in `text`, in bible order."""
+        found = {entity_id for entity_id, _, _, _ in self.scan(text)}
+        return sorted(found, key=self.order.__getitem__)
+
+
+# --- Bible-backed matchers ---
+
+def _names(data: Any, first_names: bool = False) -> Dict[str, List[str]]:
+    entities: Dict[str, List[str]] = {}
+    if not isinstance(data, dict):
+        return entities
+    for entity_id, entry in data.items():
+        if not isinstance(entry, dict):
+            continue
+        name = entry.get("name", "") if isinstance(entry.get("name"), str) else ""
+        names = [name]
+        if first_names and len(name.split()) > 1:
+            names.append(name.split()[0])
+        names += [alias for alias in entry.get("aliases", []) or [] if isinstance(alias, str)]
+        entities[entity_id] = names
+    return entities
+
+
+def character_matcher(bible) -> EntityMatcher:
+    """Matcher over every character's name and aliases (rebuilt when characters.json changes)."""
+    return bible.memo("characters", "entity_matcher", lambda data: EntityMatcher(_names(data)))
+
+
+def cast_matcher(bible) -> EntityMatcher:
+    """As character_matcher, plus each multi-word name's first word ("Kael" for "Kael Voss"): looser, for display."""
+    return bible.memo("characters", "cast_matcher", lambda data: EntityMatcher(_names(data, first_names=True)))
+
+
+def location_matcher(bible) -> EntityMatcher:
+    """Matcher over every location's name and aliases (rebuilt when locations.json changes)."""
+    return bible.memo("locations", "entity_matcher", lambda data: EntityMatcher(_names(data)))
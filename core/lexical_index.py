@@ -0,0 +1,278 @@
+import re
+import json
+import math
+import sqlite3
+import heapq
+import logging
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Sequence
+
+from core.vector_index import match_where
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+BM25_K1 = 1.2
+BM25_B = 0.75
+INDEX_FILENAME = "lexical_index.sqlite3"
+LEGACY_FILENAME = "lexical_index.json"   # single-file index, migrated on open
+
+_TOKEN_RE = re.compile(r"\w+(?:'\w+)?", re.UNICODE)
+
+# Function words that carry no continuity signal ("What color are Kael's eyes?" -> color, kael, eyes)
+STOPWORDS = frozenset(
+    "a an and are as at be been but by did do does for from had has have he her hers him his how i if in into is it its "
+    "me my no not of on or our she so than that the their them then there these they this to was we were what when where "
+    "which who whom why will with would you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens with possessives folded ("Kael's" -> "kael") and stopwords removed."""
+    tokens = []
+    for match in _TOKEN_RE.finditer((text or "").lower()):
+        token = match.group(0)
+        if token.endswith("'s"):
+            token = token[:-2]
+        if token and token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+class LexicalIndex:
+    """
+    The Index Cards.
+    An incrementally maintained BM25 inverted index over manuscript chunks.
+    Answers exact-mention questions (names, objects, places) locally, without an
+    embedding call. Chunks are persisted per source (file) in SQLite: an ingest
+    rewrites only that source's rows, and each source carries the version it was
+    last written at, so an instance that sees another one's commit re-reads only
+    the sources changed since. Postings live in memory and are rebuilt on load.
+    """
+
+    def __init__(self, db_path: Path):
+        self.path = Path(db_path) / INDEX_FILENAME
+        self._lock = threading.RLock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # check_same_thread=False: shared by the MemoryStore thread and the caller's, guarded by _lock.
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, source TEXT NOT NULL, document TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks (source)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS sources (source TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+        self._version = 0           # highest source version applied in memory
+        self._data_version = None   # PRAGMA data_version when we last caught up
+        self._reset()
+        self._migrate_json(Path(db_path) / LEGACY_FILENAME)
+        self._reload()
+
+    def _reset(self) -> None:
+        self._docs: Dict[str, Dict[str, Any]] = {}          # id -> {"document", "metadata", "length"}
+        self._postings: Dict[str, Dict[str, int]] = {}      # term -> {id: term frequency}
+        self._by_source: Dict[str, List[str]] = {}          # source -> [ids]
+        self._total_length = 0
+
+    # --- Persistence ---
+
+    def _reload(self) -> None:
+        """Catches up with commits made by other instances: only the sources written since are re-read."""
+        try:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return
+            changed = self._conn.execute(
+                "SELECT source, version FROM sources WHERE version > ?", (self._version,)
+            ).fetchall()
+            for source, version in changed:
+                self._load_source(source)
+                self._version = max(self._version, version)
+            self._data_version = data_version
+        except sqlite3.Error as e:
+            logger.error(f"Failed to load lexical index {self.path}: {e}")
+
+    def _load_source(self, source: str) -> None:
+        for doc_id in self._by_source.pop(source, []):
+            self._unindex_doc(doc_id)
+        rows = self._conn.execute("SELECT id, document, metadata FROM chunks WHERE source = ?", (source,)).fetchall()
+        for doc_id, document, metadata in rows:
+            self._index_doc(doc_id, document, json.loads(metadata))
+
+    def _write_sources(self, rows_by_source: Dict[str, List[tuple]]) -> None:
+        """Replaces the stored chunks of the given sources in one transaction and stamps them with a new version."""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Apply what others committed first, so their sources are not skipped past by our new version
+            self._reload()
+            version = self._conn.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM sources").fetchone()[0]
+            for source, rows in rows_by_source.items():
+                self._conn.execute("DELETE FROM chunks WHERE source = ?", (source,))
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO chunks (id, source, document, metadata) VALUES (?, ?, ?, ?)",
+                    [(doc_id, source, document, json.dumps(metadata, ensure_ascii=False)) for doc_id, document, metadata in rows],
+                )
+                self._conn.execute("INSERT OR REPLACE INTO sources (source, version) VALUES (?, ?)", (source, version))
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        # Our own commit does not change data_version; everything up to `version` is now in memory
+        self._version = version
+
+    def _migrate_json(self, legacy: Path) -> None:
+        """Imports the single-file JSON index used before per-source storage, then removes it."""
+        if not legacy.exists():
+            return
+        try:
+            with open(legacy, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            rows_by_source: Dict[str, List[tuple]] = {}
+            for doc_id, entry in stored.get("docs", {}).items():
+                metadata = entry.get("metadata") or {}
+                rows_by_source.setdefault(metadata.get("source", ""), []).append((doc_id, entry.get("document", ""), metadata))
+            with self._lock:
+                self._write_sources(rows_by_source)
+                self._version, self._data_version = 0, None   # let _reload() index what was just imported
+            legacy.unlink()
+            logger.info(f"Migrated {len(stored.get('docs', {}))} chunks from {legacy.name} to {self.path.name}")
+        except Exception as e:
+            logger.error(f"Failed to migrate lexical index {legacy}: {e}")
+
+    # --- Mutation ---
+
+    def _index_doc(self, doc_id: str, document: str, metadata: Dict[str, Any]) -> None:
+        if doc_id in self._docs:
+            self._unindex_doc(doc_id)
+
+        terms = Counter(tokenize(document))
+        length = sum(terms.values())
+        self._docs[doc_id] = {"document": document, "metadata": metadata, "length": length}
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+        self._by_source.setdefault(metadata.get("source", ""), []).append(doc_id)
+        self._total_length += length
+
+    def _unindex_doc(self, doc_id: str) -> None:
+        doc = self._docs.pop(doc_id, None)
+        if not doc:
+            return
+        for term in set(tokenize(doc["document"])):
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self._postings[term]
+        self._total_length -= doc["length"]
+
+    def replace_source(self, source: str, ids: Sequence[str], documents: Sequence[str], metadatas: Sequence[Dict[str, Any]]) -> None:
+        """Swaps every chunk of one source (file) for a new set; cost is proportional to that source only."""
+        with self._lock:
+            self._write_sources({source: list(zip(ids, documents, metadatas))})
+            for doc_id in self._by_source.pop(source, []):
+                self._unindex_doc(doc_id)
+            for doc_id, document, metadata in zip(ids, documents, metadatas):
+                self._index_doc(doc_id, document, metadata)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reload()
+            self._write_sources({source: [] for source in self._by_source})
+            self._reset()
+
+    def count(self) -> int:
+        with self._lock:
+            self._reload()
+            return len(self._docs)
+
+    def sources(self) -> List[str]:
+        """Every source (file) with at least one chunk: the catalog of memory partitions."""
+        with self._lock:
+            self._reload()
+            return sorted(source for source, ids in self._by_source.items() if ids)
+
+    # --- Retrieval ---
+
+    def get(self, ids: Sequence[str], where: Optional[Dict[str, Any]] = None,
+            sources: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """Stored chunks by id, in the given order, as hits without a score (missing or filtered ids are skipped)."""
+        with self._lock:
+            self._reload()
+            allowed = set(sources) if sources is not None else None
+            hits = []
+            for doc_id in ids:
+                doc = self._docs.get(doc_id)
+                if doc is None:
+                    continue
+                if allowed is not None and doc["metadata"].get("source") not in allowed:
+                    continue
+                if where and not match_where(doc["metadata"], where):
+                    continue
+                hits.append({"id": doc_id, "document": doc["document"], "metadata": doc["metadata"], "score": None})
+            return hits
+
+    def query(self, query_text: str, n_results: int = 5, where: Optional[Dict[str, Any]] = None,
+              sources: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """
+        BM25 top-k. Hits use the VectorIndex shape: {"id", "document", "metadata", "score"}.
+        sources restricts scoring to those files' chunks (IDF stays book-wide).
+        """
+        with self._lock:
+            self._reload()
+            terms = set(tokenize(query_text))
+            n_docs = len(self._docs)
+            if not terms or not n_docs or n_results <= 0:
+                return []
+
+            allowed = None
+            if sources is not None:
+                allowed = {doc_id for source in sources for doc_id in self._by_source.get(source, ())}
+                if not allowed:
+                    return []
+
+            avg_length = self._total_length / n_docs if n_docs else 0.0
+            scores: Dict[str, float] = {}
+            for term in terms:
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1.0 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, tf in posting.items():
+                    if allowed is not None and doc_id not in allowed:
+                        continue
+                    length = self._docs[doc_id]["length"]
+                    norm = BM25_K1 * (1.0 - BM25_B + BM25_B * (length / avg_length if avg_length else 0.0))
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+
+            if where:
+                scores = {doc_id: s for doc_id, s in scores.items() if match_where(self._docs[doc_id]["metadata"], where)}
+
+            best = heapq.nlargest(n_results, scores.items(), key=lambda item: item[1])
+            return [
+                {
+                    "id": doc_id,
+                    "document": self._docs[doc_id]["document"],
+                    "metadata": self._docs[doc_id]["metadata"],
+                    "score": score,
+                }
+                for doc_id, score in best
+            ]
+
+
+def reciprocal_rank_fusion(result_lists: Sequence[List[Dict[str, Any]]], n_results: int, k: int = 60) -> List[Dict[str, Any]]:
+    """
+    Merges ranked hit lists by Reciprocal Rank Fusion: score = sum(1 / (k + rank)).
+    Rank-based, so BM25 and cosine scores never need to be on the same scale.
+    """
+    fused: Dict[str, float] = {}
+    first_seen: Dict[str, Dict[str, Any]] = {}
+    for hits in result_lists:
+        for rank, hit in enumerate(hits, start=1):
+            fused[hit["id"]] = fused.get(hit["id"], 0.0) + 1.0 / (k + rank)
+            first_seen.setdefault(hit["id"], hit)
+
+    best = heapq.nlargest(n_results, fused.items(), key=lambda item: item[1])
+    return [dict(first_seen[doc_id], score=score) for doc_id, score in best]
@@ -1,193 +1,811 @@
 import os
+import json
+import time
+import asyncio
 import logging
-try:
-    import chromadb
-except Exception:
-    chromadb = None
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence, Set, Callable
 
 # --- Configuration ---
-from openai import OpenAI
+import aiohttp
 from dotenv import load_dotenv
 
+from core.embedding_cache import get_shared_cache, normalize_text, text_hash
+from core.vector_index import VectorIndex, create_vector_index
+from core.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from core.query_cache import LRUCache, GenerationStore
+from core.chunker import Chunker, chapter_number
+from core.embeddings import EmbeddingProvider, create_embedding_provider, load_memory_conf
+from core.summary_tree import SummaryTree, Summarizer, STORY_SO_FAR_TOKENS
+from core.context_packer import select_context, OVERFETCH, CONTEXT_TOKENS
+from core.near_duplicates import NearDuplicateIndex
+
 load_dotenv()
 
+# Concurrent embedding requests per aingest() call
+EMBEDDING_CONCURRENCY = int(os.getenv("RAG_EMBEDDING_CONCURRENCY", "4"))
+# Each ranker contributes this many times n_results candidates to the fusion
+FUSION_DEPTH = 3
+# After an embedding failure, stay lexical-only for this long instead of paying a timeout per query
+EMBEDDING_BACKOFF_SECONDS = 60
+RETRIEVAL_MODES = ("hybrid", "vector", "lexical")
+# Entries in each in-process query cache (query embeddings, retrieval results); 0 disables
+QUERY_CACHE_SIZE = int(os.getenv("RAG_QUERY_CACHE_SIZE", "512"))
+COLLECTION_NAME = "narrative_memory"
+# Which manuscript versions are fully ingested (checkpoint for the backfill, dedup for the scanner)
+LEDGER_FILENAME = "ingest_ledger.json"
+# Link near-duplicate chunks (MinHash/LSH) to an already embedded chunk instead of embedding them again
+DEDUP_ENABLED = os.getenv("RAG_DEDUP", "true").lower() == "true"
+
 # We use a separate logger for memory operations
 logger = logging.getLogger(__name__)
 
+
+def prior_chapter(target_file: Optional[str]) -> Optional[int]:
+    """Causal retrieval bound for a manuscript file: 'ch05_Siege.md' -> 4. None when unnumbered."""
+    chapter = chapter_number(Path(target_file).stem) if target_file else None
+    return chapter - 1 if chapter is not None else None
+
+
 class MemoryStore:
     """
     The Hippocampus (Long-Term Memory).
     Manages the Vector Database for RAG (Retrieval Augmented Generation).
+    The storage backend is pluggable (see core/vector_index.py): ChromaDB when
+    installed, otherwise the built-in NumPy index. Select with RAG_VECTOR_BACKEND.
+    So is the embedder (see core/embeddings.py): the OpenAI-compatible endpoint,
+    or a local hashing embedder that needs no key and no network.
+
+    Retrieval is hybrid: a BM25 inverted index (core/lexical_index.py) is kept in
+    sync with the vector index and both rankings are merged with reciprocal rank
+    fusion. Without embeddings (no backend, no key, network down) memory degrades
+    to lexical-only instead of going offline.
+
+    Async callers should use aquery()/aingest(): embeddings go through aiohttp and
+    all vector-DB / cache work runs on a dedicated single-thread executor, so the
+    event loop never waits on disk or the network.
+
+    Repeated questions (the Editor's check_memory across review cycles) are served
+    from two LRU caches: query embeddings and fused results. Results are keyed on
+    the generations of the chapters they searched, which every ingest bumps, so
+    they are never stale.
+
+    Memory is partitioned by chapter file. Re-ingesting a chapter only touches its
+    own partition, and causal queries (max_chapter=N) only search chapters 1..N.
+
+    Long-range context comes from the summary tree (core/summary_tree.py), which
+    works with or without RAG: story_so_far() is bounded by a token budget.
     """
 
-    def __init__(self, project_root: Path):
+    def __init__(self, project_root: Path, http_session: Optional[Callable[[], aiohttp.ClientSession]] = None):
+        """http_session: returns a shared aiohttp session (core/services.py); by default each async embed opens its own."""
         self.project_root = project_root
         self.db_path = project_root / "data" / "memory_db"
+        self._http_session = http_session
         
         # RAG Configuration
         self.use_rag = os.getenv("USE_RAG", "false").lower() == "true"
+        self.embedder: Optional[EmbeddingProvider] = None
         self.embedding_model = os.getenv("RAG_EMBEDDING_MODEL", "text-embedding-3-small")
-        llm_api_key = os.getenv("LLM_API_KEY")
-        requesty_api_key = os.getenv("REQUESTY_API_KEY")
-        self.api_key = llm_api_key or requesty_api_key
-
-        _raw_base_url = os.getenv("LLM_API_BASE_URL")
-        if requesty_api_key and not llm_api_key and _raw_base_url == "https://api.openai.com/v1/chat/completions":
-            _raw_base_url = None
-
-        base_url_prefix = os.getenv("REQUESTY_BASE_URL") or _raw_base_url
-        if not base_url_prefix:
-            if requesty_api_key and not llm_api_key:
-                base_url_prefix = "https://router.requesty.ai/v1"
-
-        if base_url_prefix and base_url_prefix.rstrip("/").endswith("/chat/completions"):
-            base_url_prefix = base_url_prefix[: -len("/chat/completions")].rstrip("/")
-
-        default_headers = {}
-        requesty_http_referer = os.getenv("REQUESTY_HTTP_REFERER")
-        requesty_x_title = os.getenv("REQUESTY_X_TITLE")
-        if requesty_http_referer:
-            default_headers["HTTP-Referer"] = requesty_http_referer
-        if requesty_x_title:
-            default_headers["X-Title"] = requesty_x_title
-
-        # Initialize ChromaDB Client
+        self.embedding_batch_size = int(os.getenv("RAG_EMBEDDING_BATCH_SIZE", "64"))
+        self.embedding_cache = None
+        self.vector_backend = os.getenv("RAG_VECTOR_BACKEND", "auto")
+        self.index: Optional[VectorIndex] = None
+        self.lexical: Optional[LexicalIndex] = None
+        self.duplicates: Optional[NearDuplicateIndex] = None
+        self._embeddings_down_until = 0.0
+        self.retrieval_mode = os.getenv("RAG_RETRIEVAL_MODE", "hybrid").lower()
+        if self.retrieval_mode not in RETRIEVAL_MODES:
+            self.retrieval_mode = "hybrid"
+        self._executor: Optional[ThreadPoolExecutor] = None   # started on first use, again after close()
+        self._executor_lock = threading.Lock()
+        self._query_embeddings = LRUCache(QUERY_CACHE_SIZE)
+        self._results = LRUCache(QUERY_CACHE_SIZE)
+        self.generations = GenerationStore(self.db_path / "generations.json")
+        self.chunker = Chunker()
+        self.summaries = SummaryTree(project_root)
+        self.ledger_path = self.db_path / LEDGER_FILENAME
+        self._ledger_lock = threading.Lock()
+
+        # Initialize the Indexes
         if self.use_rag:
-            if chromadb is None:
-                logger.error("ChromaDB is not installed; disabling RAG MemoryStore.")
-                self.use_rag = False
-                return
             try:
-                self.client = chromadb.PersistentClient(path=str(self.db_path))
-                # Create or get the collection for this project's narrative
-                self.collection = self.client.get_or_create_collection(
-                    name="narrative_memory",
-                    metadata={"hnsw:space": "cosine"} # Cosine similarity for text search
-                )
-                if base_url_prefix:
-                    self.openai_client = OpenAI(api_key=self.api_key, base_url=base_url_prefix, default_headers=default_headers or None)
-                else:
-                    self.openai_client = OpenAI(api_key=self.api_key, default_headers=default_headers or None)
-                logger.info(f"MemoryStore initialized at {self.db_path}")
+                # The lexical side is pure Python: it is the floor the memory degrades to.
+                self.lexical = LexicalIndex(self.db_path)
+                if DEDUP_ENABLED:
+                    try:
+                        self.duplicates = NearDuplicateIndex(self.db_path)
+                    except Exception as e:
+                        logger.warning(f"Near-duplicate detection unavailable: {e}")
             except Exception as e:
                 logger.error(f"Failed to initialize MemoryStore: {e}")
                 self.use_rag = False
+                return
+
+            try:
+                self.embedder = create_embedding_provider(project_root)
+                self.embedding_model = self.embedder.model
+                self.index = create_vector_index(self.db_path, self.vector_backend, **self._vector_options(project_root))
+                self._check_embedding_space()
+                if self.embedder.remote:
+                    # Shared across projects: re-ingesting a cloned project or a rebuilt DB costs no API calls.
+                    self.embedding_cache = get_shared_cache()
+                logger.info(f"MemoryStore initialized at {self.db_path} (backend: {self.index.name}, embedder: {self.embedding_model})")
+            except Exception as e:
+                logger.error(f"Vector memory unavailable, using lexical-only retrieval: {e}")
+                self.index = None
+                self.embedder = None
+
+    @staticmethod
+    def _vector_options(project_root: Path) -> Dict[str, Any]:
+        """Per-project NumPy index storage from project_conf.json {"memory": {"vector_quantization": ...}}."""
+        conf = load_memory_conf(project_root)
+        options = {}
+        for key, option in (("vector_quantization", "quantization"), ("vector_truncate_dim", "truncate_dim"),
+                            ("vector_rerank_factor", "rerank_factor")):
+            if conf.get(key) is not None:
+                options[option] = conf[key]
+        return options
+
+    def _check_embedding_space(self) -> None:
+        """
+        Vectors from different models are not comparable. If the configured model
+        changed since the vectors were written, drop them (the lexical index stays)
+        so re-ingestion starts from a clean space instead of mixing the two.
+        """
+        marker = self.db_path / "embedding_model.json"
+        try:
+            with open(marker, "r", encoding="utf-8") as f:
+                stored = json.load(f).get("model")
+        except (FileNotFoundError, ValueError):
+            stored = None
+
+        if stored == self.embedding_model:
+            return
+        if stored is not None and self.index.count():
+            logger.warning(f"Embedding model changed ({stored} -> {self.embedding_model}); clearing vectors. Re-ingest the manuscripts.")
+            self.index.clear()
+            self.generations.bump(COLLECTION_NAME)
+        self.db_path.mkdir(parents=True, exist_ok=True)
+        with open(marker, "w", encoding="utf-8") as f:
+            json.dump({"model": self.embedding_model}, f)
+
+    @property
+    def embeddings_available(self) -> bool:
+        if not (self.use_rag and self.index is not None and self.embedder is not None):
+            return False
+        return time.monotonic() >= self._embeddings_down_until
+
+    def _mark_embeddings_down(self, error: Exception) -> None:
+        logger.error(f"Embedding generation failed (lexical-only for {EMBEDDING_BACKOFF_SECONDS}s): {error}")
+        self._embeddings_down_until = time.monotonic() + EMBEDDING_BACKOFF_SECONDS
 
     def _get_embedding(self, text: str) -> List[float]:
-        """Generates a vector embedding for the given text using OpenAI."""
-        if not self.use_rag:
+        """Generates a vector embedding for the given text with the configured provider (cache first)."""
+        if not self.embeddings_available:
             return []
-            
-        try:
-            # Clean text
-            text = text.replace("\n", " ")
-            response = self.openai_client.embeddings.create(
-                input=[text],
-                model=self.embedding_model
+        return self._get_embeddings([text])[0]
+
+    def _cached_lookup(self, texts: List[str]):
+        """
+        Normalizes texts and resolves what it can from the persistent cache.
+        Returns (normalized, vectors, missing_indexes); vectors has [] for misses.
+        """
+        # Clean text (the normalized form is also the cache key)
+        normalized = [normalize_text(t) for t in texts]
+        vectors: List[List[float]] = [[] for _ in texts]
+
+        if self.embedding_cache:
+            cached = self.embedding_cache.get_many(self.embedding_model, normalized)
+            for i, vector in enumerate(cached):
+                if vector is not None:
+                    vectors[i] = vector
+
+        missing = [i for i, v in enumerate(vectors) if not v and normalized[i]]
+        return normalized, vectors, missing
+
+    def _query_embedding_key(self, query_text: str):
+        return (self.embedding_model, text_hash(normalize_text(query_text)))
+
+    def _query_embedding(self, query_text: str) -> List[float]:
+        """Query-side _get_embedding() with an in-process LRU in front of the persistent cache."""
+        key = self._query_embedding_key(query_text)
+        vector = self._query_embeddings.get(key)
+        if vector is None:
+            vector = self._get_embedding(query_text)
+            if vector:
+                self._query_embeddings.put(key, vector)
+        return vector or []
+
+    def _batches(self, missing: List[int]) -> List[List[int]]:
+        return [missing[start:start + self.embedding_batch_size] for start in range(0, len(missing), self.embedding_batch_size)]
+
+    def _get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Batched embedding path. Consults the persistent cache first and only sends
+        the misses to the API, in batches of RAG_EMBEDDING_BATCH_SIZE.
+        Returns a list aligned with `texts`; failed items are empty lists.
+        """
+        if not self.embeddings_available or not texts:
+            return [[] for _ in texts]
+
+        normalized, vectors, missing = self._cached_lookup(texts)
+        for batch_idx in self._batches(missing):
+            batch_texts = [normalized[i] for i in batch_idx]
+            try:
+                batch_vectors = self.embedder.embed(batch_texts)
+            except Exception as e:
+                self._mark_embeddings_down(e)
+                break
+
+            for i, vector in zip(batch_idx, batch_vectors):
+                vectors[i] = vector
+            if self.embedding_cache:
+                self.embedding_cache.put_many(self.embedding_model, batch_texts, batch_vectors)
+
+        return vectors
+
+    # --- Async Plumbing ---
+
+    async def _run_blocking(self, func, *args, **kwargs):
+        """Runs vector-DB / cache work on the dedicated MemoryStore thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._worker(), functools.partial(func, *args, **kwargs))
+
+    def _worker(self) -> ThreadPoolExecutor:
+        """The MemoryStore thread, (re)started on demand: a closed store handed out again still works."""
+        with self._executor_lock:
+            if self._executor is None:
+                # One worker: serializes index writes and keeps Chroma/NumPy access off the event loop.
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-store")
+            return self._executor
+
+    async def _aget_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Async twin of _get_embeddings(): cache on the worker thread, API misses via aiohttp."""
+        if not self.embeddings_available or not texts:
+            return [[] for _ in texts]
+        if not self.embedder.remote:
+            # Local embedders are CPU-bound: keep them off the event loop
+            return await self._run_blocking(self._get_embeddings, texts)
+
+        normalized, vectors, missing = await self._run_blocking(self._cached_lookup, texts)
+        if not missing:
+            return vectors
+
+        semaphore = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
+
+        async def _embed_batch(session: aiohttp.ClientSession, batch_idx: List[int]) -> None:
+            batch_texts = [normalized[i] for i in batch_idx]
+            async with semaphore:
+                if not self.embeddings_available:
+                    return
+                try:
+                    batch_vectors = await self.embedder.aembed(session, batch_texts)
+                except Exception as e:
+                    self._mark_embeddings_down(e)
+                    return
+            for i, vector in zip(batch_idx, batch_vectors):
+                vectors[i] = vector
+            if self.embedding_cache:
+                await self._run_blocking(self.embedding_cache.put_many, self.embedding_model, batch_texts, batch_vectors)
+
+        if self._http_session is not None:
+            session = self._http_session()
+            await asyncio.gather(*(_embed_batch(session, batch) for batch in self._batches(missing)))
+        else:
+            async with aiohttp.ClientSession() as session:
+                await asyncio.gather(*(_embed_batch(session, batch) for batch in self._batches(missing)))
+
+        return vectors
+
+    async def _aquery_embedding(self, query_text: str) -> List[float]:
+        """Async twin of _query_embedding()."""
+        key = self._query_embedding_key(query_text)
+        vector = self._query_embeddings.get(key)
+        if vector is None:
+            vector = (await self._aget_embeddings([query_text]))[0]
+            if vector:
+                self._query_embeddings.put(key, vector)
+        return vector or []
+
+    def _chunk(self, content: str) -> List[Dict[str, Any]]:
+        """Chunking Strategy: token-budget packing with overlap, split at scene boundaries (core/chunker.py)."""
+        return self.chunker.chunk(content)
+
+    @staticmethod
+    def _chunk_ids(file_id: str, chunks: List[Dict[str, Any]]) -> List[str]:
+        return [f"{file_id}_{idx}" for idx in range(len(chunks))]
+
+    def _match_duplicates(self, file_id: str, chunks: List[Dict[str, Any]]):
+        """(signatures, links): links[i] names the chunk that chunk i duplicates, None = embed it."""
+        if self.duplicates is None:
+            return [[] for _ in chunks], [None] * len(chunks)
+        return self.duplicates.match(file_id, self._chunk_ids(file_id, chunks), [chunk["text"] for chunk in chunks])
+
+    @staticmethod
+    def _spread(embeddings: List[List[float]], links: List[Optional[str]]) -> List[List[float]]:
+        """Embeddings of the non-duplicate chunks -> one slot per chunk ([] for linked duplicates)."""
+        remaining = iter(embeddings)
+        return [[] if link is not None else next(remaining) for link in links]
+
+    def _write_chunks(self, file_id: str, chunks: List[Dict[str, Any]], para_embeddings: List[List[float]],
+                      content_hash: Optional[str] = None, signatures: Optional[List[List[int]]] = None,
+                      links: Optional[List[Optional[str]]] = None) -> int:
+        """
+        Replaces the stored chunks of one file in both indexes. Runs on whichever thread owns the call.
+        Linked near-duplicates go to the lexical index only. With content_hash, a complete
+        write is recorded in the ingest ledger.
+        """
+        paragraphs = [chunk["text"] for chunk in chunks]
+        ids = self._chunk_ids(file_id, chunks)
+        links = links or [None] * len(chunks)
+        chapter = chapter_number(file_id)
+        metadatas = []
+        for idx, chunk in enumerate(chunks):
+            metadata = {
+                "source": file_id,
+                "type": "narrative",
+                "chunk_index": idx,
+                "scene_index": chunk["scene_index"],
+                "char_start": chunk["char_start"],
+                "char_end": chunk["char_end"],
+            }
+            # Metadata values must be scalars (Chroma rejects None)
+            if chapter is not None:
+                metadata["chapter"] = chapter
+            if links[idx] is not None:
+                metadata["duplicate_of"] = links[idx]
+            metadatas.append(metadata)
+
+        # A chapter appearing or disappearing changes which partitions a filtered query covers
+        catalog_changed = (file_id in self.lexical.sources()) != bool(ids)
+        bumped = [self._partition_generation(file_id)] + ([COLLECTION_NAME] if catalog_changed else [])
+
+        # 1. Lexical index: every chunk, embedded or not
+        self.lexical.replace_source(file_id, ids, paragraphs, metadatas)
+
+        self._link_duplicates(file_id, ids, signatures, links)
+
+        if self.index is None:
+            self.generations.bump(*bumped)
+            self._record_ingest(file_id, content_hash, chunks)
+            logger.info(f"Ingested {len(ids)} chunks from {file_id} (lexical only)")
+            return len(ids)
+
+        # 2. Drop this file's partition (to avoid duplicates on update); other chapters are untouched
+        self.index.delete_partition(file_id)
+
+        # 3. Upsert the chunks that got an embedding
+        keep = [i for i, embedding in enumerate(para_embeddings) if embedding]
+        if keep:
+            self.index.add(
+                ids=[ids[i] for i in keep],
+                documents=[paragraphs[i] for i in keep],
+                embeddings=[para_embeddings[i] for i in keep],
+                metadatas=[metadatas[i] for i in keep],
+                partition=file_id
             )
-            return response.data[0].embedding
-        except Exception as e:
-            logger.error(f"Embedding generation failed: {e}")
-            return []
+            if self.embedding_cache:
+                cache_stats = self.embedding_cache.stats()
+                logger.debug(f"Embedding cache: hit_rate={cache_stats['hit_rate']} entries={cache_stats['entries']}")
+        # Invalidate cached results, here and in every other MemoryStore on this project
+        self.generations.bump(*bumped)
+        linked = sum(link is not None for link in links)
+        if len(keep) + linked == len(ids):
+            # Partially embedded files stay pending so the next ingest retries them
+            self._record_ingest(file_id, content_hash, chunks)
+        logger.info(f"Ingested {len(ids)} chunks from {file_id} ({len(keep)} embedded, {linked} linked as near-duplicates)")
+        return len(ids)
+
+    def _link_duplicates(self, file_id: str, ids: List[str], signatures: Optional[List[List[int]]],
+                         links: List[Optional[str]]) -> None:
+        """Updates the near-duplicate index; files whose duplicates lost their canonical chunk go back to pending."""
+        if self.duplicates is None or signatures is None:
+            return
+        orphaned = self.duplicates.replace_source(file_id, ids, signatures, links)
+        if orphaned:
+            logger.info(f"{file_id}: near-duplicates in {', '.join(orphaned)} lost their source chunk; marked for re-ingest.")
+            self._forget_ingest(orphaned)
+        row = self.duplicates.stats().get(file_id)
+        if row and row["looping"]:
+            logger.warning(f"{file_id}: {row['repeats']} of {row['chunks']} chunks repeat earlier passages of the same chapter (looping?).")
 
-    def ingest_manuscript(self, file_path: Path, content: str):
+    def _prepare_ingest(self, file_id: str, content: str, force: bool):
+        """The CPU/disk half of an ingest before embedding: None if the ledger shows it is up to date."""
+        if not force and self.is_ingested(file_id, content):
+            return None
+        chunks = self._chunk(content)
+        signatures, links = self._match_duplicates(file_id, chunks)
+        return chunks, signatures, links
+
+    def ingest_manuscript(self, file_path: Path, content: str, force: bool = False):
         """
         Chunks and vectorizes a manuscript file.
         Should be called by the Scanner when a file is modified.
+        Skipped when the ledger shows this exact content is already ingested (unless force).
         """
         if not self.use_rag:
             return
 
         try:
             file_id = file_path.stem # e.g., "ch01_Start"
-            
-            # 1. Clear existing memory for this file (to avoid duplicates on update)
-            # Note: ChromaDB's delete by 'where' clause
-            self.collection.delete(where={"source": file_id})
-
-            # 2. Chunking Strategy (Simple paragraph-based for now)
-            # In a real app, we'd use a token-aware splitter (RecursiveCharacterTextSplitter)
-            paragraphs = [p.strip() for p in content.split("\n\n") if len(p.strip()) > 50]
-            
-            if not paragraphs:
+            prepared = self._prepare_ingest(file_id, content, force)
+            if prepared is None:
                 return
+            chunks, signatures, links = prepared
+            embeddings = self._get_embeddings([c["text"] for c, link in zip(chunks, links) if link is None])
+            para_embeddings = self._spread(embeddings, links)
+            self._write_chunks(file_id, chunks, para_embeddings, self._content_hash(content), signatures, links)
 
-            # 3. Batch Process
-            ids = []
-            documents = []
-            metadatas = []
-            embeddings = []
-
-            for idx, para in enumerate(paragraphs):
-                chunk_id = f"{file_id}_{idx}"
-                embedding = self._get_embedding(para)
-                
-                if embedding:
-                    ids.append(chunk_id)
-                    documents.append(para)
-                    embeddings.append(embedding)
-                    metadatas.append({
-                        "source": file_id,
-                        "type": "narrative",
-                        "chunk_index": idx
-                    })
-
-            # 4. Upsert to DB
-            if ids:
-                self.collection.add(
-                    ids=ids,
-                    documents=documents,
-                    embeddings=embeddings,
-                    metadatas=metadatas
-                )
-                logger.info(f"Ingested {len(ids)} chunks from {file_id}")
+        except Exception as e:
+            logger.error(f"Failed to ingest manuscript {file_path}: {e}")
+
+    async def aingest(self, file_path: Path, content: str, force: bool = False) -> int:
+        """
+        Async ingest_manuscript(): the ledger check, chunking and near-duplicate
+        matching run on the MemoryStore thread, embeddings come via aiohttp, and
+        the index is written on the thread again. Returns the number of chunks
+        stored (0 if skipped as up to date).
+        """
+        if not self.use_rag:
+            return 0
+
+        try:
+            file_id = file_path.stem
+            prepared = await self._run_blocking(self._prepare_ingest, file_id, content, force)
+            if prepared is None:
+                return 0
+            chunks, signatures, links = prepared
+            embeddings = await self._aget_embeddings([c["text"] for c, link in zip(chunks, links) if link is None])
+            para_embeddings = self._spread(embeddings, links)
+            return await self._run_blocking(self._write_chunks, file_id, chunks, para_embeddings,
+                                            self._content_hash(content), signatures, links)
 
         except Exception as e:
             logger.error(f"Failed to ingest manuscript {file_path}: {e}")
+            return 0
+
+    # --- Ingest Ledger ---
+
+    def _ledger_model(self) -> str:
+        """Ledger entries are only valid for the vector space they were written in."""
+        return self.embedding_model if self.index is not None else "lexical"
+
+    def _load_ledger(self) -> Dict[str, Any]:
+        try:
+            with open(self.ledger_path, "r", encoding="utf-8") as f:
+                ledger = json.load(f)
+            return ledger if isinstance(ledger, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable ingest ledger {self.ledger_path}: {e}")
+            return {}
+
+    @staticmethod
+    def _content_hash(content: str) -> str:
+        return text_hash(content).hex()
+
+    def _record_ingest(self, file_id: str, content_hash: Optional[str], chunks: List[Dict[str, Any]]) -> None:
+        if content_hash is None:
+            return
+        with self._ledger_lock:
+            ledger = self._load_ledger()
+            ledger[file_id] = {
+                "hash": content_hash,
+                "model": self._ledger_model(),
+                "chunks": len(chunks),
+                "tokens": sum(chunk.get("tokens", 0) for chunk in chunks),
+                "ingested_at": time.time(),
+            }
+            self.db_path.mkdir(parents=True, exist_ok=True)
+            tmp = self.ledger_path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(ledger, f, indent=2)
+            tmp.replace(self.ledger_path)
+
+    def _forget_ingest(self, file_ids: Sequence[str]) -> None:
+        with self._ledger_lock:
+            ledger = self._load_ledger()
+            if not any(file_id in ledger for file_id in file_ids):
+                return
+            for file_id in file_ids:
+                ledger.pop(file_id, None)
+            tmp = self.ledger_path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(ledger, f, indent=2)
+            tmp.replace(self.ledger_path)
+
+    def is_ingested(self, file_id: str, content: str) -> bool:
+        """True if this exact content is already in memory, fully embedded, in the current vector space."""
+        entry = self._load_ledger().get(file_id)
+        if not entry or entry.get("model") != self._ledger_model():
+            return False
+        return entry.get("hash") == self._content_hash(content)
+
+    def ingested_sources(self) -> Set[str]:
+        """File ids the ledger holds as fully ingested in the current vector space (one ledger read)."""
+        if not self.use_rag:
+            return set()
+        model = self._ledger_model()
+        return {file_id for file_id, entry in self._load_ledger().items()
+                if isinstance(entry, dict) and entry.get("model") == model}
+
+    def pending_manuscripts(self, paths: Sequence[Path]) -> List[Path]:
+        """The manuscripts whose current content is not (fully) ingested yet."""
+        if not self.use_rag:
+            return []
+        pending = []
+        for path in paths:
+            try:
+                content = path.read_text(encoding="utf-8")
+            except OSError as e:
+                logger.warning(f"Cannot read {path}: {e}")
+                continue
+            if not self.is_ingested(path.stem, content):
+                pending.append(path)
+        return pending
+
+    # --- Partitions ---
 
-    def query(self, query_text: str, n_results: int = 5) -> str:
+    @staticmethod
+    def _partition_generation(file_id: str) -> str:
+        return f"{COLLECTION_NAME}/{file_id}"
+
+    def _select_partitions(self, max_chapter: Optional[int], chapters: Optional[Sequence[int]]) -> Optional[List[str]]:
+        """
+        Chapter files matching the filter; None means the whole book.
+        Files without a chapter number (notes, prologues named freely) only match unfiltered queries.
         """
-        Retrieves relevant context from the vector database.
-        Returns a formatted string of the top N matches.
+        if max_chapter is None and chapters is None:
+            return None
+        wanted = set(chapters) if chapters is not None else None
+        selected = []
+        for source in self.lexical.sources():
+            chapter = chapter_number(source)
+            if chapter is None:
+                continue
+            if max_chapter is not None and chapter > max_chapter:
+                continue
+            if wanted is not None and chapter not in wanted:
+                continue
+            selected.append(source)
+        return selected
+
+    def _retrieve(self, query_text: str, query_embedding: List[float], n_results: int, mode: str,
+                  where: Optional[Dict[str, Any]] = None, partitions: Optional[List[str]] = None,
+                  budget_tokens: Optional[int] = CONTEXT_TOKENS, anchor_chapter: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Runs the requested rankers and fuses them (falling back to whichever side produced hits),
+        then de-duplicates, diversifies and packs the over-fetched candidates (core/context_packer.py).
+        """
+        if partitions is not None and not partitions:
+            return []
+        candidates = n_results * OVERFETCH
+        depth = candidates * FUSION_DEPTH if mode == "hybrid" else candidates
+
+        lexical_hits = [] if mode == "vector" else self.lexical.query(query_text, n_results=depth, where=where, sources=partitions)
+        vector_hits = []
+        if mode != "lexical" and query_embedding and self.index is not None:
+            vector_hits = self.index.query(query_embedding, n_results=depth, where=where, partitions=partitions)
+            vector_hits = self._with_duplicates(vector_hits, where, partitions)
+
+        if not vector_hits:
+            fused = lexical_hits[:candidates]
+        elif not lexical_hits:
+            fused = vector_hits[:candidates]
+        else:
+            fused = reciprocal_rank_fusion([vector_hits, lexical_hits], candidates)
+        return select_context(fused, n_results, budget_tokens=budget_tokens, anchor_chapter=anchor_chapter)
+
+    def _with_duplicates(self, hits: List[Dict[str, Any]], where: Optional[Dict[str, Any]],
+                         partitions: Optional[List[str]]) -> List[Dict[str, Any]]:
+        """Linked near-duplicates have no vector of their own: each one ranks right behind its canonical chunk."""
+        if self.duplicates is None or not hits:
+            return hits
+        linked = self.duplicates.duplicates_of([hit["id"] for hit in hits])
+        if not linked:
+            return hits
+        expanded = []
+        for hit in hits:
+            expanded.append(hit)
+            for duplicate in self.lexical.get(linked.get(hit["id"], []), where=where, sources=partitions):
+                duplicate["score"] = hit.get("score")
+                expanded.append(duplicate)
+        return expanded
+
+    @staticmethod
+    def _format(hits: List[Dict[str, Any]]) -> str:
+        """Formats hits as '[source]: text' blocks."""
+        formatted_context = []
+        for hit in hits:
+            source = hit["metadata"].get('source', 'unknown')
+            formatted_context.append(f"[{source}]: {hit['document']}")
+
+        return "\n---\n".join(formatted_context)
+
+    def _result_key(self, query_text: str, n_results: int, mode: str, where: Optional[Dict[str, Any]],
+                    partitions: Optional[List[str]], budget_tokens: Optional[int] = None, anchor_chapter: Optional[int] = None):
+        """
+        (query hash, n_results, budget, mode, filters, generations): a new ingest changes the key, not the entry.
+        Only the searched partitions count, so writing chapter 9 keeps chapter 5's causal answers cached.
+        """
+        filters = json.dumps(where, sort_keys=True, default=str) if where else ""
+        generations = self.generations.snapshot()
+        searched = partitions if partitions is not None else self.lexical.sources()
+        generation = (
+            generations.get(COLLECTION_NAME, 0),
+            tuple(generations.get(self._partition_generation(p), 0) for p in searched),
+        )
+        scope = tuple(partitions) if partitions is not None else None
+        return (text_hash(normalize_text(query_text)), n_results, budget_tokens, anchor_chapter, mode, filters, scope, generation)
+
+    @staticmethod
+    def _anchor_chapter(max_chapter: Optional[int], chapters: Optional[Sequence[int]]) -> Optional[int]:
+        """The chapter being worked on, for the proximity prior: the one after a causal cut-off."""
+        if max_chapter is not None:
+            return max_chapter + 1
+        if chapters:
+            return max(chapters)
+        return None
+
+    def _lookup(self, query_text: str, n_results: int, mode: str, where: Optional[Dict[str, Any]],
+                max_chapter: Optional[int], chapters: Optional[Sequence[int]], budget_tokens: Optional[int]):
+        """
+        (partitions, anchor chapter, result key, cached hits or None). Reads the chapter
+        catalog and the generations file: async callers run it on the MemoryStore thread.
+        """
+        partitions = self._select_partitions(max_chapter, chapters)
+        anchor = self._anchor_chapter(max_chapter, chapters)
+        key = self._result_key(query_text, n_results, mode, where, partitions, budget_tokens, anchor)
+        return partitions, anchor, key, self._results.get(key)
+
+    def _resolve_mode(self, mode: Optional[str]) -> str:
+        mode = (mode or self.retrieval_mode).lower()
+        if mode not in RETRIEVAL_MODES:
+            mode = self.retrieval_mode
+        if mode != "lexical" and not self.embeddings_available:
+            mode = "lexical"
+        return mode
+
+    def query(self, query_text: str, n_results: int = 5, mode: Optional[str] = None,
+              where: Optional[Dict[str, Any]] = None, max_chapter: Optional[int] = None,
+              chapters: Optional[Sequence[int]] = None, budget_tokens: Optional[int] = CONTEXT_TOKENS) -> str:
+        """
+        Retrieves relevant context from memory.
+        mode: 'hybrid' (BM25 + vectors, RRF), 'vector' or 'lexical' (no network).
+        where: optional metadata filter (see core/vector_index.py).
+        max_chapter / chapters: search only chapters <= N / an explicit set (causal retrieval).
+        budget_tokens: token budget for the returned passages (None = no budget).
+        Returns a formatted string of at most N distinct passages, most relevant first.
+        Blocking: async code should await aquery() instead.
         """
         if not self.use_rag:
             return "Memory System Offline."
 
         try:
-            # 1. Vectorize Query
-            query_embedding = self._get_embedding(query_text)
-            if not query_embedding:
-                return ""
-
-            # 2. Search DB
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=n_results
-            )
+            mode = self._resolve_mode(mode)
+            partitions, anchor, key, hits = self._lookup(query_text, n_results, mode, where, max_chapter, chapters, budget_tokens)
+            if hits is not None:
+                return self._format(hits)
 
-            # 3. Format Results
-            # Chroma returns lists of lists (batch format)
-            retrieved_docs = results['documents'][0]
-            metadatas = results['metadatas'][0]
-            
-            formatted_context = []
-            for doc, meta in zip(retrieved_docs, metadatas):
-                source = meta.get('source', 'unknown')
-                formatted_context.append(f"[{source}]: {doc}")
+            # 1. Vectorize Query (skipped for lexical-only retrieval)
+            query_embedding = self._query_embedding(query_text) if mode != "lexical" else []
 
-            return "\n---\n".join(formatted_context)
+            # 2. Search & fuse
+            hits = self._retrieve(query_text, query_embedding, n_results, mode, where, partitions, budget_tokens, anchor)
+            # A failed embedding degrades this answer to lexical-only: don't pin it in the cache
+            if mode == "lexical" or query_embedding:
+                self._results.put(key, hits)
+            return self._format(hits)
 
         except Exception as e:
             logger.error(f"Memory Query failed: {e}")
             return ""
 
+    async def aquery(self, query_text: str, n_results: int = 5, mode: Optional[str] = None,
+                     where: Optional[Dict[str, Any]] = None, max_chapter: Optional[int] = None,
+                     chapters: Optional[Sequence[int]] = None, budget_tokens: Optional[int] = CONTEXT_TOKENS) -> str:
+        """Non-blocking query(): used by the agent services inside the event loop."""
+        if not self.use_rag:
+            return "Memory System Offline."
+
+        try:
+            mode = self._resolve_mode(mode)
+            # The catalog, the generations and the lexical index are all read from disk/SQLite:
+            # every step but the embedding call runs on the MemoryStore thread, cache hits included
+            partitions, anchor, key, hits = await self._run_blocking(
+                self._lookup, query_text, n_results, mode, where, max_chapter, chapters, budget_tokens)
+            if hits is not None:
+                return self._format(hits)
+
+            query_embedding = await self._aquery_embedding(query_text) if mode != "lexical" else []
+            hits = await self._run_blocking(self._retrieve, query_text, query_embedding, n_results, mode, where,
+                                            partitions, budget_tokens, anchor)
+            # A failed embedding degrades this answer to lexical-only: don't pin it in the cache
+            if mode == "lexical" or query_embedding:
+                self._results.put(key, hits)
+            return self._format(hits)
+
+        except Exception as e:
+            logger.error(f"Memory Query failed: {e}")
+            return ""
+
+    # --- Summary Tree ---
+
+    async def aupdate_summaries(self, file_id: str, content: str, summarizer: Optional[Summarizer] = None) -> bool:
+        """Refreshes the scene/chapter/act summaries of one (locked) chapter."""
+        try:
+            return await self.summaries.update_chapter(file_id, content, summarizer)
+        except Exception as e:
+            logger.error(f"Failed to update summaries for {file_id}: {e}")
+            return False
+
+    def story_so_far(self, max_chapter: Optional[int] = None, budget_tokens: int = STORY_SO_FAR_TOKENS) -> str:
+        """Bounded 'previously on' digest of the locked chapters up to `max_chapter` (causal, like aquery)."""
+        try:
+            return self.summaries.story_so_far(max_chapter, budget_tokens)
+        except Exception as e:
+            logger.error(f"Failed to build story so far: {e}")
+            return ""
+
     def clear_memory(self):
         """Wipes the database. Use with caution."""
         if self.use_rag:
             try:
-                self.client.delete_collection("narrative_memory")
+                if self.index is not None:
+                    self.index.clear()
+                self.lexical.clear()
+                self.generations.bump(COLLECTION_NAME)
+                self._results.clear()
+                with self._ledger_lock:
+                    self.ledger_path.unlink(missing_ok=True)
+                if self.duplicates is not None:
+                    self.duplicates.clear()
                 logger.warning("MemoryStore wiped.")
             except Exception as e:
-                logger.error(f"Failed to clear memory: {e}")
\ No newline at end of file
+                logger.error(f"Failed to clear memory: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache and index statistics for the telemetry surface (matrix metrics, CLI)."""
+        return {
+            "enabled": self.use_rag,
+            "backend": self.index.name if self.index is not None else ("lexical" if self.use_rag else None),
+            "embedder": self.embedding_model if self.embedder is not None else None,
+            "retrieval_mode": self.retrieval_mode,
+            "generation": self.generations.get(COLLECTION_NAME),
+            "partitions": len(self.lexical.sources()) if self.lexical is not None else 0,
+            "query_embedding_cache": self._query_embeddings.stats(),
+            "result_cache": self._results.stats(),
+            "embedding_cache": self.embedding_cache.stats() if self.embedding_cache else None,
+            "duplicates": self._duplicate_summary(),
+        }
+
+    def duplication_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per chapter file: chunks, near-duplicates linked instead of embedded, self-repeats, looping flag."""
+        if self.duplicates is None:
+            return {}
+        return self.duplicates.stats()
+
+    def _duplicate_summary(self) -> Optional[Dict[str, Any]]:
+        per_chapter = self.duplication_stats()
+        if self.duplicates is None:
+            return None
+        chunks = sum(row["chunks"] for row in per_chapter.values())
+        linked = sum(row["duplicates"] for row in per_chapter.values())
+        return {
+            "chunks": chunks,
+            "linked": linked,
+            "ratio": round(linked / chunks, 3) if chunks else 0.0,
+            "looping_chapters": sorted(source for source, row in per_chapter.items() if row["looping"]),
+        }
+
+    def close(self):
+        """Stops the MemoryStore worker thread; the next async call starts a new one."""
+        with self._executor_lock:
+            if self._executor:
+                self._executor.shutdown(wait=False)
+                self._executor = None
@@ -0,0 +1,285 @@
+import os
+import re
+import json
+import zlib
+import logging
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Sequence, Set
+
+from core.chunker import chapter_number
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+INDEX_FILENAME = "minhash_index.json"
+JACCARD_THRESHOLD = float(os.getenv("RAG_NEAR_DUPLICATE_JACCARD", "0.9"))   # Estimated shingle Jaccard that links two chunks
+LOOP_RATIO = float(os.getenv("RAG_LOOP_RATIO", "0.2"))                      # Share of a chapter repeating itself that flags it
+NUM_PERM = 64
+BANDS = 16                                                                  # BANDS * rows = NUM_PERM
+SHINGLE_WORDS = 5
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _shingle_hashes(text: str) -> List[int]:
+    words = _WORD_RE.findall((text or "").lower())
+    if len(words) < SHINGLE_WORDS:
+        return [zlib.crc32(" ".join(words).encode("utf-8"))] if words else []
+    return list({zlib.crc32(" ".join(words[i:i + SHINGLE_WORDS]).encode("utf-8")) for i in range(len(words) - SHINGLE_WORDS + 1)})
+
+
+def _pack(sig: Sequence[int]) -> str:
+    """Signatures are persisted as hex of big-endian uint32s: a fraction of the JSON list's size and cost."""
+    return np.asarray(sig, dtype=">u4").tobytes().hex()
+
+
+def _unpack(packed: str) -> List[int]:
+    return np.frombuffer(bytes.fromhex(packed), dtype=">u4").astype(np.int64).tolist()
+
+
+class MinHasher:
+    """Fixed random multiply-shift permutations ((a*x + b) mod 2^64 >> 32) over crc32 word-shingle hashes."""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        if np is None:
+            raise RuntimeError("NumPy is required for near-duplicate detection.")
+        rng = np.random.default_rng(seed)
+        # Odd multipliers; uint64 arithmetic wraps, which is the mod 2^64 the scheme wants
+        self.a = rng.integers(0, np.iinfo(np.uint64).max, num_perm, dtype=np.uint64, endpoint=True) | np.uint64(1)
+        self.b = rng.integers(0, np.iinfo(np.uint64).max, num_perm, dtype=np.uint64, endpoint=True)
+        self.num_perm = num_perm
+
+    def signature(self, text: str) -> List[int]:
+        hashes = _shingle_hashes(text)
+        if not hashes:
+            return []
+        x = np.asarray(hashes, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            permuted = (self.a[:, None] * x + self.b[:, None]) >> np.uint64(32)
+        return permuted.min(axis=1).astype(np.int64).tolist()
+
+
+def estimated_jaccard(a: Sequence[int], b: Sequence[int]) -> float:
+    if not a or not b or len(a) != len(b):
+        return 0.0
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+class NearDuplicateIndex:
+    """
+    The Echo Chamber.
+    MinHash signatures of every embedded chunk, bucketed by LSH bands, so a new
+    chunk can be checked against the whole book in O(bands). Chunks whose
+    estimated Jaccard with an embedded chunk reaches JACCARD_THRESHOLD are linked
+    to it instead of being embedded again (continue-mode restatements, templated
+    scene openings).
+
+    Persisted as memory_db/minhash_index.json: {"chunks": {id: {"source", "sig" (hex)}},
+    "links": {duplicate id: {"source", "canonical"}}}. LSH buckets are rebuilt on load.
+    """
+
+    def __init__(self, db_path: Path, threshold: float = JACCARD_THRESHOLD):
+        self.path = Path(db_path) / INDEX_FILENAME
+        self.threshold = threshold
+        self.hasher = MinHasher()
+        self.rows = NUM_PERM // BANDS
+        self._lock = threading.RLock()
+        self._stamp = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self._chunks: Dict[str, Dict[str, Any]] = {}
+        self._links: Dict[str, Dict[str, str]] = {}
+        self._buckets: Dict[str, Set[str]] = {}
+
+    # --- Persistence ---
+
+    def _file_stamp(self):
+        try:
+            stat = self.path.stat()
+            return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        except FileNotFoundError:
+            return None
+
+    def _reload(self) -> None:
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return
+        self._reset()
+        if stamp is not None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self._chunks = {chunk_id: {"source": entry["source"], "sig": _unpack(entry["sig"])}
+                                for chunk_id, entry in data.get("chunks", {}).items()}
+                self._links = data.get("links", {})
+            except Exception as e:
+                logger.error(f"Failed to load near-duplicate index {self.path}: {e}")
+        for chunk_id, entry in self._chunks.items():
+            self._bucket(chunk_id, entry["sig"])
+        self._stamp = stamp
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            chunks = {chunk_id: {"source": entry["source"], "sig": _pack(entry["sig"])}
+                      for chunk_id, entry in self._chunks.items()}
+            json.dump({"chunks": chunks, "links": self._links}, f)
+        tmp.replace(self.path)
+        self._stamp = self._file_stamp()
+
+    # --- LSH ---
+
+    def _band_keys(self, sig: Sequence[int]) -> List[str]:
+        return [f"{band}:" + ",".join(map(str, sig[band * self.rows:(band + 1) * self.rows])) for band in range(BANDS)]
+
+    def _bucket(self, chunk_id: str, sig: Sequence[int]) -> None:
+        if not sig:
+            return
+        for key in self._band_keys(sig):
+            self._buckets.setdefault(key, set()).add(chunk_id)
+
+    def _unbucket(self, chunk_id: str, sig: Sequence[int]) -> None:
+        if not sig:
+            return
+        for key in self._band_keys(sig):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(chunk_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def _best_match(self, sig: Sequence[int], skip_source: str, local: Dict[str, List[int]]) -> Optional[str]:
+        candidates: Set[str] = set()
+        for key in self._band_keys(sig):
+            candidates |= self._buckets.get(key, set())
+        chapter = chapter_number(skip_source)
+        eligible = []
+        for chunk_id in candidates:
+            other_source = self._chunks[chunk_id]["source"]
+            # The file being replaced only matches itself through `local` (its new chunks)
+            if other_source == skip_source:
+                continue
+            # Never lean on a later chapter: causal queries would lose the passage's vector
+            other_chapter = chapter_number(other_source)
+            if chapter is not None and other_chapter is not None and other_chapter > chapter:
+                continue
+            eligible.append((chunk_id, self._chunks[chunk_id]["sig"]))
+        eligible.extend(local.items())
+        eligible = [(chunk_id, other) for chunk_id, other in eligible if len(other) == len(sig)]
+        if not eligible:
+            return None
+        scores = (np.asarray([other for _, other in eligible]) == np.asarray(sig)).mean(axis=1)
+        best = int(scores.argmax())
+        return eligible[best][0] if scores[best] >= self.threshold else None
+
+    # --- Public API ---
+
+    def match(self, source: str, ids: Sequence[str], texts: Sequence[str]):
+        """
+        Signatures and links for the new chunks of `source`: returns (signatures, links)
+        where links[i] is the id of an existing (or earlier, same-file) chunk that
+        chunk i duplicates, or None if it must be embedded.
+        """
+        with self._lock:
+            self._reload()
+            signatures, links = [], []
+            local: Dict[str, List[int]] = {}
+            for chunk_id, text in zip(ids, texts):
+                sig = self.hasher.signature(text)
+                link = self._best_match(sig, source, local) if sig else None
+                if link is None and sig:
+                    local[chunk_id] = sig
+                signatures.append(sig)
+                links.append(link)
+            return signatures, links
+
+    def replace_source(self, source: str, ids: Sequence[str], signatures: Sequence[Sequence[int]],
+                       links: Sequence[Optional[str]]) -> List[str]:
+        """
+        Stores the chunks of `source` (canonical chunks get signatures, duplicates get links)
+        and returns the other sources holding links to chunks that no longer exist:
+        those duplicates have lost their vector and must be re-ingested.
+        """
+        with self._lock:
+            self._reload()
+            previous = {}
+            for chunk_id, entry in list(self._chunks.items()):
+                if entry["source"] == source:
+                    self._unbucket(chunk_id, entry["sig"])
+                    del self._chunks[chunk_id]
+                    previous[chunk_id] = entry["sig"]
+            for chunk_id, link in list(self._links.items()):
+                if link["source"] == source:
+                    del self._links[chunk_id]
+
+            for chunk_id, sig, link in zip(ids, signatures, links):
+                if link is not None:
+                    self._links[chunk_id] = {"source": source, "canonical": link}
+                elif sig:
+                    self._chunks[chunk_id] = {"source": source, "sig": list(sig)}
+                    self._bucket(chunk_id, sig)
+            # Chunks that came back unchanged (same id, same signature) keep their duplicates
+            removed = {chunk_id for chunk_id, sig in previous.items()
+                       if self._chunks.get(chunk_id, {}).get("sig") != sig}
+
+            orphaned = sorted({
+                link["source"] for link in self._links.values()
+                if link["canonical"] in removed and link["source"] != source
+            })
+            for chunk_id, link in list(self._links.items()):
+                if link["canonical"] in removed:
+                    del self._links[chunk_id]
+            self._save()
+            return orphaned
+
+    def duplicates_of(self, canonical_ids: Sequence[str]) -> Dict[str, List[str]]:
+        """canonical id -> ids of the chunks linked to it (they share its embedding)."""
+        with self._lock:
+            self._reload()
+            wanted = set(canonical_ids)
+            found: Dict[str, List[str]] = {}
+            for chunk_id, link in self._links.items():
+                if link["canonical"] in wanted:
+                    found.setdefault(link["canonical"], []).append(chunk_id)
+            return found
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset()
+            self.path.unlink(missing_ok=True)
+            self._stamp = None
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Per source: chunks, duplicates linked elsewhere, duplicates of its own earlier
+        chunks ("repeats") and whether the repeats cross LOOP_RATIO (the model is looping).
+        """
+        with self._lock:
+            self._reload()
+            report: Dict[str, Dict[str, Any]] = {}
+            for entry in self._chunks.values():
+                report.setdefault(entry["source"], {"chunks": 0, "duplicates": 0, "repeats": 0})["chunks"] += 1
+            seen: Set[tuple] = set()
+            for link in self._links.values():
+                row = report.setdefault(link["source"], {"chunks": 0, "duplicates": 0, "repeats": 0})
+                row["chunks"] += 1
+                row["duplicates"] += 1
+                # A repeat echoes the chapter's own text: its canonical lives in the same file,
+                # or another chunk of the same file already links to that canonical
+                canonical = self._chunks.get(link["canonical"])
+                key = (link["source"], link["canonical"])
+                if (canonical is not None and canonical["source"] == link["source"]) or key in seen:
+                    row["repeats"] += 1
+                seen.add(key)
+            for row in report.values():
+                row["duplicate_ratio"] = round(row["duplicates"] / row["chunks"], 3) if row["chunks"] else 0.0
+                row["looping"] = bool(row["chunks"]) and row["repeats"] / row["chunks"] >= LOOP_RATIO
+            return report
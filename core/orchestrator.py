@@ -9,8 +9,10 @@ from typing import Dict, Any, Optional
 # --- Internal Imports ---
 from core.scanner import ProjectScanner
 from core.project_manager import ProjectManager
-from core.memory_store import MemoryStore
-from ai_services import architect, narrator, editor
+from core.services import ProjectServices, get_services
+from core import agent_tools
+from core.buffer_cache import manuscript_cache
+from ai_services import architect, narrator, editor, summarizer
 
 # --- Configuration ---
 MAX_CONSECUTIVE_ERRORS = 3
@@ -30,7 +32,7 @@ class Orchestrator:
     4. Task Execution (Narrator/Editor)
     """
 
-    def __init__(self, project_manager: ProjectManager):
+    def __init__(self, project_manager: ProjectManager, services: Optional[ProjectServices] = None):
         self.pm = project_manager
         self.error_count = 0
         self.is_running = False
@@ -49,9 +51,10 @@ class Orchestrator:
 
         logger.info(f"Orchestrator bound to project: {project_id} at {self.project_root}")
         
-        # Initialize Components with Project Scope
-        self.scanner = ProjectScanner(self.project_root)
-        self.memory_store = MemoryStore(self.project_root)
+        # Initialize Components with Project Scope: one MemoryStore shared by scanner, agents and metrics
+        self.services = services or get_services(self.project_root)
+        self.memory_store = self.services.memory
+        self.scanner: ProjectScanner = self.services.scanner
         
         self.matrix_path = self.project_root / "data" / "matrix.json"
         self.control_path = self.project_root / "data" / "control.json"
@@ -61,7 +64,8 @@ class Orchestrator:
         try:
             if not self.matrix_path.exists():
                 logger.warning("Matrix not found. Triggering initial scan.")
-                return self.scanner.scan()
+                # RAG ingestion is left to the next Phase 1 ascan(): files missing from the ingest ledger are picked up there
+                return self.scanner.scan(ingest=False)
             
             with open(self.matrix_path, 'r', encoding='utf-8') as f:
                 return json.load(f)
@@ -85,6 +89,22 @@ class Orchestrator:
         except Exception as e:
             logger.error(f"Failed to update active task: {e}")
 
+    def _record_memory_metrics(self):
+        """Publishes MemoryStore cache statistics to matrix['metrics']['memory'] for the dashboard."""
+        try:
+            stats = self.memory_store.stats()
+            matrix = self._load_matrix()
+            matrix.setdefault("metrics", {})["memory"] = stats
+            matrix["metrics"]["manuscript_cache"] = manuscript_cache.stats()
+            with open(self.matrix_path, 'w', encoding='utf-8') as f:
+                json.dump(matrix, f, indent=2)
+            logger.debug(
+                f"Memory caches: results hit_rate={stats['result_cache']['hit_rate']}, "
+                f"query embeddings hit_rate={stats['query_embedding_cache']['hit_rate']}"
+            )
+        except Exception as e:
+            logger.error(f"Failed to record memory metrics: {e}")
+
     async def _check_control_signals(self) -> Optional[Dict]:
         """Reads data/control.json to check for PAUSE/STOP or Overrides."""
         if not self.control_path.exists():
@@ -205,7 +225,7 @@ class Orchestrator:
 
         # --- PHASE 1: SCAN ---
         logger.info("--- [Phase 1: SCAN] ---")
-        matrix = self.scanner.scan()
+        matrix = await self.scanner.ascan()
         
         if matrix.get("meta", {}).get("project_status") == "COMPLETE":
             logger.info("Project marked COMPLETE. Orchestrator standing by.")
@@ -305,6 +325,9 @@ class Orchestrator:
         logger.info(f"Result: {result.get('status')}")
         
         self._update_active_task(None, None, None)
+        # Edits the agent left in open manuscripts go to disk before the rescan and the dashboard read them
+        await agent_tools.flush_documents()
+        self._record_memory_metrics()
         
         if result.get("status") == "success":
             # Handle Editor verdict: update matrix status based on pass/fail
@@ -312,13 +335,15 @@ class Orchestrator:
                 verdict = result.get("verdict", "FAIL")
                 editor_notes = result.get("editor_notes", [])
                 self._apply_editor_verdict(target, verdict, editor_notes)
+                if verdict == "PASS" and target:
+                    await self._summarize_locked_chapter(target)
 
             # If narrator performed an edit/fix pass, clear FAIL so the chapter can move back to review.
             if agent_role == "narrator" and action == "edit" and target:
                 self._clear_continuity_flag(target)
             
             # Rescan to pick up file changes
-            matrix = self.scanner.scan()
+            matrix = await self.scanner.ascan()
             
             # Check if we should auto-progress to next chapter
             self._maybe_create_next_chapter(matrix)
@@ -358,6 +383,17 @@ class Orchestrator:
         except Exception as e:
             logger.error(f"Failed to apply editor verdict: {e}")
 
+    async def _summarize_locked_chapter(self, target_file: str):
+        """Folds a newly LOCKED chapter into the summary tree (scenes -> chapter -> act)."""
+        try:
+            read_result = await agent_tools.read_file(f"manuscripts/{target_file}", self.project_root)
+            if read_result.get("status") != "success":
+                logger.warning(f"Could not read {target_file} for summarization: {read_result.get('data')}")
+                return
+            await self.memory_store.aupdate_summaries(Path(target_file).stem, read_result["data"], summarizer.summarize)
+        except Exception as e:
+            logger.error(f"Failed to summarize {target_file}: {e}")
+
     def _maybe_create_next_chapter(self, matrix: Dict[str, Any]):
         """Creates the next chapter if all existing chapters are LOCKED."""
         try:
@@ -0,0 +1,274 @@
+import os
+import re
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+from core.edit_engine import normalize, apply_spans
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+PATCH_MAX_FUZZ = int(os.getenv("PATCH_MAX_FUZZ", "2"))     # Context lines a hunk may drop at each end to find its place
+ABBREVIATION_MIN_CHARS = 8                                  # 'The rain fell...' must keep at least this much of the line
+_ELLIPSES = ("...", "…")
+
+_UNIFIED_RE = re.compile(r"^@@\s*-(\d+)(?:,(\d+))?\s+\+(\d+)(?:,(\d+))?\s*@@")
+_ANCHORED_RE = re.compile(r"^@@\s*(\d+)(?:\s*-\s*(\d+))?\s*(?:@@)?\s*$")
+
+
+class PatchError(Exception):
+    """Raised when a patch cannot be parsed (no hunks, malformed header)."""
+    pass
+
+
+# --- Parsing ---
+
+def parse_patch(patch: str) -> List[Dict[str, Any]]:
+    """
+    Splits a patch into hunks. Three header forms are accepted:
+    - '@@ -40,3 +40,4 @@'  unified: context (' '), removed ('-') and added ('+') lines;
+                           the line numbers are a hint, the content decides
+    - '@@'                 unified without numbers: located by its context alone
+    - '@@ 40-42 @@'        line-anchored: lines 40-42 are replaced by the hunk's
+                           lines ('+' optional); '-' lines, if given, are checked
+    File headers ('---', '+++', 'diff', 'index') before the first hunk are ignored.
+    Returns [{"index", "header", "hint", "insert_after", "anchored", "lines": [(tag, text)], "trailing_blank"}].
+    """
+    hunks: List[Dict[str, Any]] = []
+    current: Optional[Dict[str, Any]] = None
+    for raw in patch.splitlines():
+        if raw.startswith("@@"):
+            current = {"index": len(hunks), "header": raw.strip(), "hint": None, "insert_after": None,
+                       "anchored": None, "lines": [], "trailing_blank": 0}
+            unified = _UNIFIED_RE.match(raw)
+            anchored = None if unified else _ANCHORED_RE.match(raw)
+            if unified:
+                old_start = int(unified.group(1))
+                # '-40,0': nothing removed, the added lines go after line 40
+                if unified.group(2) == "0":
+                    current["insert_after"] = old_start
+                current["hint"] = max(0, old_start - 1)
+            elif anchored:
+                first = int(anchored.group(1))
+                last = int(anchored.group(2)) if anchored.group(2) else first
+                if first < 1 or last < first:
+                    raise PatchError(f"Hunk {len(hunks)}: invalid line range in '{raw.strip()}'.")
+                current["anchored"] = (first, last)
+                current["hint"] = first - 1
+            hunks.append(current)
+            continue
+        if current is None:
+            continue    # file headers, prose before the first hunk
+        if raw.startswith("\\"):
+            continue    # '\ No newline at end of file'
+        if current["anchored"] is not None:
+            # Bare blank lines count as text unless nothing but blanks follows (hunk separators)
+            current["trailing_blank"] = current["trailing_blank"] + 1 if raw == "" else 0
+            if raw.startswith("-"):
+                current["lines"].append(("-", raw[1:]))
+            else:
+                current["lines"].append(("+", raw[1:] if raw.startswith("+") else raw))
+        elif raw[:1] in ("+", "-", " "):
+            current["lines"].append((raw[0], raw[1:]))
+        else:
+            # Blank lines and lines missing their leading space are context
+            current["lines"].append((" ", raw))
+
+    if not hunks:
+        raise PatchError("No hunks found: each change starts with an '@@' header line.")
+    for hunk in hunks:
+        # Trailing blank context only narrows the match: drop it (it is usually the patch's final newline)
+        while hunk["lines"] and hunk["lines"][-1] == (" ", ""):
+            hunk["lines"].pop()
+        if hunk["trailing_blank"]:
+            del hunk["lines"][-hunk["trailing_blank"]:]
+        if not hunk["lines"] and hunk["anchored"] is None:
+            raise PatchError(f"Hunk {hunk['index']} ('{hunk['header']}') is empty.")
+    return hunks
+
+
+# --- Matching ---
+
+def _pattern(text: str, normalized: bool) -> Tuple[str, bool]:
+    """(comparison key, is_prefix) of a context/removed line; 'First words...' matches by prefix."""
+    key = normalize(text)[0].strip() if normalized else text.rstrip()
+    for ellipsis in _ELLIPSES:
+        if key.endswith(ellipsis) and len(key.strip()) - len(ellipsis) >= ABBREVIATION_MIN_CHARS:
+            return key[:-len(ellipsis)].rstrip(), True
+    return key, False
+
+
+def _find_block(keys: List[str], block: List[Tuple[str, bool]]) -> List[int]:
+    """Every line index where `block` matches `keys`."""
+    if not block:
+        return []
+    first_key, first_prefix = block[0]
+    found = []
+    for start in range(len(keys) - len(block) + 1):
+        line = keys[start]
+        if not (line.startswith(first_key) if first_prefix else line == first_key):
+            continue
+        for offset in range(1, len(block)):
+            key, prefix = block[offset]
+            line = keys[start + offset]
+            if not (line.startswith(key) if prefix else line == key):
+                break
+        else:
+            found.append(start)
+    return found
+
+
+def _trim(lines: List[Tuple[str, str]], fuzz: int) -> Tuple[int, int]:
+    """How many leading and trailing context lines to drop at this fuzz level."""
+    lead = 0
+    while lead < fuzz and lead < len(lines) and lines[lead][0] == " ":
+        lead += 1
+    trail = 0
+    while trail < fuzz and trail < len(lines) - lead and lines[len(lines) - 1 - trail][0] == " ":
+        trail += 1
+    return lead, trail
+
+
+def _locate(hunk: Dict[str, Any], lines: List[str], keys: Dict[str, List[str]], drift: int) -> Dict[str, Any]:
+    """
+    Finds where a hunk's context and removed lines sit: exact lines first, then
+    quote/whitespace-normalized ones, shedding up to PATCH_MAX_FUZZ context
+    lines at each end. Several places: the one nearest the (drift-corrected)
+    line hint wins; without a hint, or with two equally near, it is ambiguous.
+    `keys` caches the file's comparison keys per mode (normalized ones on first need).
+    """
+    hint = hunk["hint"] + drift if hunk["hint"] is not None else None
+    tried = set()
+    for fuzz in range(PATCH_MAX_FUZZ + 1):
+        lead, trail = _trim(hunk["lines"], fuzz)
+        if (lead, trail) in tried:
+            continue
+        tried.add((lead, trail))
+        body = hunk["lines"][lead:len(hunk["lines"]) - trail]
+        old = [text for tag, text in body if tag != "+"]
+        if not old:
+            break
+        for mode in ("exact", "normalized"):
+            if mode not in keys:
+                keys[mode] = [normalize(line)[0].strip() for line in lines]
+            block = [_pattern(text, mode == "normalized") for text in old]
+            positions = _find_block(keys[mode], block)
+            if not positions:
+                continue
+            if hint is None and len(positions) > 1:
+                return {"status": "ambiguous", "count": len(positions)}
+            if hint is not None and len(positions) > 1:
+                positions.sort(key=lambda p: abs(p - hint))
+                if abs(positions[0] - hint) == abs(positions[1] - hint):
+                    return {"status": "ambiguous", "count": len(positions)}
+            return {"status": "applied", "match": mode, "fuzz": fuzz, "start": positions[0],
+                    "end": positions[0] + len(old), "lead": lead, "body": body}
+    return {"status": "not_found"}
+
+
+# --- Planning ---
+
+def _char_spans(text: str, lines: List[str], spans: List[Tuple[int, int, int, List[str]]]) -> List[Tuple[int, int, str]]:
+    """Line spans -> (char start, char end, replacement) spans. New lines end in '\n'; an unterminated last line stays unterminated."""
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+    open_end = bool(text) and not text.endswith("\n")
+    out: List[Tuple[int, int, str]] = []
+    for start, end, _, replacement in sorted(spans, key=lambda span: (span[0], span[1])):
+        chunk = "".join(line if line.endswith("\n") else line + "\n" for line in replacement)
+        char_start, char_end = offsets[start], offsets[end]
+        if open_end and end == len(lines):
+            if start == end:
+                chunk = "\n" + chunk[:-1]          # lines added after the unterminated last line
+            elif chunk:
+                chunk = chunk[:-1]
+            elif out and out[-1][1] == char_start and out[-1][2].endswith("\n"):
+                out[-1] = (out[-1][0], out[-1][1], out[-1][2][:-1])
+            elif char_start > 0:
+                char_start -= 1                     # last lines deleted: so is the newline before them
+        out.append((char_start, char_end, chunk))
+    return out
+
+
+def locate_patch(text: str, patch: str) -> Tuple[List[Tuple[int, int, str]], List[Dict[str, Any]]]:
+    """
+    Locates every hunk of `patch` against the original text. Context lines are
+    kept as they are in the file (abbreviated or normalized context never
+    rewrites it). Returns ((char start, char end, replacement) spans, sorted;
+    per-hunk outcomes in patch order). The spans are empty unless every hunk
+    fits without overlapping another.
+    Outcome: {"index", "status": "applied" | "not_found" | "ambiguous" | "conflict"
+    | "out_of_range", "match", "line", "offset", "fuzz", "conflicts_with", "count"}.
+    """
+    hunks = parse_patch(patch)
+    lines = text.splitlines(keepends=True)
+    keys = {"exact": [line.rstrip() for line in lines]}
+    outcomes: List[Dict[str, Any]] = []
+    spans: List[Tuple[int, int, int, List[str]]] = []     # (start, end, hunk index, replacement lines)
+    drift = 0
+    for hunk in hunks:
+        outcome: Dict[str, Any] = {"index": hunk["index"], "status": "applied"}
+        outcomes.append(outcome)
+        anchored = hunk["anchored"]
+        has_old = any(tag != "+" for tag, _ in hunk["lines"])
+
+        if anchored is not None and not has_old:
+            first, last = anchored
+            if last > len(lines):
+                outcome.update({"status": "out_of_range", "total_lines": len(lines)})
+                continue
+            start, end = first - 1, last
+            replacement = [text_ for _, text_ in hunk["lines"]]
+            outcome.update({"match": "anchored"})
+        elif not has_old:
+            # Pure insertion ('-40,0 +41,2'): placed by its line number alone
+            after = hunk["insert_after"]
+            if after is None and lines:
+                outcome.update({"status": "not_found", "reason": "insertion without context lines needs a line number"})
+                continue
+            after = min(len(lines), (after or 0) + drift)
+            start = end = after
+            replacement = [text_ for _, text_ in hunk["lines"]]
+            outcome.update({"match": "line_number"})
+        else:
+            found = _locate(hunk, lines, keys, drift)
+            if found["status"] != "applied":
+                outcome.update(found)
+                continue
+            start, end = found["start"], found["end"]
+            replacement, cursor = [], start
+            for tag, text_ in found["body"]:
+                if tag == " ":
+                    replacement.append(lines[cursor])
+                    cursor += 1
+                elif tag == "-":
+                    cursor += 1
+                else:
+                    replacement.append(text_)
+            outcome.update({"match": found["match"]})
+            if found["fuzz"]:
+                outcome["fuzz"] = found["fuzz"]
+
+        clash = next((other for s, e, other, _ in spans if start < e and s < end or start == end == s == e), None)
+        if clash is not None:
+            outcome.update({"status": "conflict", "conflicts_with": clash})
+            continue
+        outcome.update({"status": "applied", "line": start + 1})
+        if has_old and anchored is None and hunk["hint"] is not None:
+            # Where the hunk's first (possibly fuzzed-away) line landed, against its header
+            landed = start - found["lead"]
+            if landed != hunk["hint"]:
+                outcome["offset"] = landed - hunk["hint"]
+            drift = landed - hunk["hint"]
+        spans.append((start, end, hunk["index"], replacement))
+
+    if any(outcome["status"] != "applied" for outcome in outcomes):
+        return [], outcomes
+    return _char_spans(text, lines, spans), outcomes
+
+
+def plan_patch(text: str, patch: str) -> Tuple[str, List[Dict[str, Any]]]:
+    """locate_patch() plus the patched text (unchanged if any hunk failed)."""
+    spans, outcomes = locate_patch(text, patch)
+    return apply_spans(text, spans), outcomes
@@ -0,0 +1,206 @@
+import bisect
+from typing import List, Optional, Tuple
+
+# --- Configuration ---
+MAX_PIECES = 2048       # Past this many pieces the table is compacted into one buffer
+
+# (buffer, start, length): a run of text taken from an immutable buffer
+Piece = Tuple[str, int, int]
+
+
+class PieceTable:
+    """
+    The Loom.
+    Editable text that never copies the whole document on an edit. The text is
+    a list of pieces, each a slice of an immutable buffer: the original text or
+    a chunk of the append-only add buffer (every inserted string). An edit
+    splits at most two pieces and swaps the ones in between; the prefix sums of
+    piece lengths give O(log n) offset lookups. Prefix sums past an edit are
+    recomputed lazily, up to the next offset asked for, so a batch applied back
+    to front never rescans the tail of the piece list.
+
+    Buffers are never mutated, so snapshot() only copies the piece list: cheap
+    undo points, and changed_span() compares two versions piece by piece
+    instead of char by char. text() joins the pieces once per version.
+    """
+
+    def __init__(self, text: str = ""):
+        self._original = text
+        self._added: List[str] = []                 # the add buffer, one chunk per insertion
+        self._pieces: List[Piece] = [(text, 0, len(text))] if text else []
+        self._starts: List[int] = [0] if text else []
+        self._valid = len(self._starts)             # leading entries of _starts that are up to date
+        self._length = len(text)
+        self._text: Optional[str] = text
+        self.version = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def piece_count(self) -> int:
+        return len(self._pieces)
+
+    # --- Reads ---
+
+    def text(self) -> str:
+        """The whole text (joined once per version)."""
+        if self._text is None:
+            self._text = "".join(buffer[start:start + length] for buffer, start, length in self._pieces)
+        return self._text
+
+    def slice(self, start: int, end: Optional[int] = None) -> str:
+        """text()[start:end] without materializing the whole text."""
+        start, end, _ = slice(start, end).indices(self._length)
+        if end <= start:
+            return ""
+        if self._text is not None:
+            return self._text[start:end]
+        self._ensure(end - 1)
+        index = bisect.bisect_right(self._starts, start, 0, self._valid) - 1
+        out = []
+        while index < self._valid and self._starts[index] < end:
+            buffer, piece_start, length = self._pieces[index]
+            lo = max(start - self._starts[index], 0)
+            hi = min(end - self._starts[index], length)
+            out.append(buffer[piece_start + lo:piece_start + hi])
+            index += 1
+        return "".join(out)
+
+    # --- Edits ---
+
+    def _ensure(self, offset: int) -> None:
+        """Brings the prefix sums up to date through the piece containing `offset`."""
+        pieces, starts = self._pieces, self._starts
+        valid = self._valid
+        while valid < len(pieces):
+            if valid:
+                end = starts[valid - 1] + pieces[valid - 1][2]
+                if end > offset:
+                    break
+            else:
+                end = 0
+            starts[valid] = end
+            valid += 1
+        self._valid = valid
+
+    def _split(self, offset: int) -> int:
+        """Index of the piece starting at `offset`, splitting the piece that contains it if needed."""
+        if offset >= self._length:
+            return len(self._pieces)
+        self._ensure(offset)
+        index = bisect.bisect_right(self._starts, offset, 0, self._valid) - 1
+        inside = offset - self._starts[index]
+        if inside == 0:
+            return index
+        buffer, start, length = self._pieces[index]
+        self._pieces[index:index + 1] = [(buffer, start, inside), (buffer, start + inside, length - inside)]
+        self._starts.insert(index + 1, offset)
+        self._valid += 1
+        return index + 1
+
+    def replace(self, start: int, end: int, text: str) -> None:
+        """Replaces [start, end) with `text` (insert: start == end; delete: text == '')."""
+        start = min(max(0, start), self._length)
+        end = min(max(start, end), self._length)
+        if start == end and not text:
+            return
+        first = self._split(start)
+        last = self._split(end)
+        new: List[Piece] = []
+        if text:
+            self._added.append(text)
+            new.append((text, 0, len(text)))
+        self._pieces[first:last] = new
+        self._starts[first:last] = [start] * len(new)
+        self._valid = min(self._valid, first + len(new))     # later prefix sums are now stale
+        self._length += len(text) - (end - start)
+        self._text = None
+        self.version += 1
+        if len(self._pieces) > MAX_PIECES:
+            self.compact()
+
+    def insert(self, offset: int, text: str) -> None:
+        self.replace(offset, offset, text)
+
+    def delete(self, start: int, end: int) -> None:
+        self.replace(start, end, "")
+
+    def append(self, text: str) -> None:
+        self.replace(self._length, self._length, text)
+
+    def compact(self) -> None:
+        """Folds every piece into one new original buffer (drops the add buffer)."""
+        text = self.text()
+        self._original = text
+        self._added = []
+        self._pieces = [(text, 0, len(text))] if text else []
+        self._starts = [0] if text else []
+        self._valid = len(self._starts)
+
+    # --- Versions ---
+
+    def snapshot(self) -> "PieceTable":
+        """A frozen copy sharing every buffer: O(pieces), no text is copied."""
+        copy = PieceTable.__new__(PieceTable)
+        copy._original = self._original
+        copy._added = list(self._added)
+        copy._pieces = list(self._pieces)
+        copy._starts = list(self._starts)
+        copy._valid = self._valid
+        copy._length = self._length
+        copy._text = self._text
+        copy.version = self.version
+        return copy
+
+    def restore(self, snapshot: "PieceTable") -> None:
+        """Returns to a snapshot's text (the snapshot stays usable)."""
+        self._original = snapshot._original
+        self._added = list(snapshot._added)
+        self._pieces = list(snapshot._pieces)
+        self._starts = list(snapshot._starts)
+        self._valid = snapshot._valid
+        self._length = snapshot._length
+        self._text = snapshot._text
+        self.version += 1
+
+    def changed_span(self, other: "PieceTable") -> Optional[Tuple[int, int, int]]:
+        """
+        Where this text differs from `other` (usually an older snapshot), found by
+        walking both piece lists from each end while they share buffer runs:
+        (start, end in other, end in self), or None if they are the same.
+        Text re-inserted from a new buffer counts as changed.
+        """
+        prefix = _common_run(self._pieces, other._pieces, min(self._length, other._length))
+        if prefix == self._length == other._length:
+            return None
+        limit = min(self._length, other._length) - prefix
+        suffix = _common_run(self._pieces, other._pieces, limit, reverse=True)
+        return prefix, other._length - suffix, self._length - suffix
+
+
+def _common_run(a: List[Piece], b: List[Piece], limit: int, reverse: bool = False) -> int:
+    """Chars shared by two piece lists from the start (or the end): same buffer, same buffer position."""
+    if reverse:
+        a, b = a[::-1], b[::-1]
+    i = j = 0
+    used_a = used_b = 0         # chars consumed from a[i] / b[j]
+    shared = 0
+    while shared < limit and i < len(a) and j < len(b):
+        buffer_a, start_a, length_a = a[i]
+        buffer_b, start_b, length_b = b[j]
+        if reverse:
+            position_a, position_b = start_a + length_a - used_a, start_b + length_b - used_b
+        else:
+            position_a, position_b = start_a + used_a, start_b + used_b
+        if buffer_a is not buffer_b or position_a != position_b:
+            break
+        run = min(length_a - used_a, length_b - used_b, limit - shared)
+        shared += run
+        used_a += run
+        used_b += run
+        if used_a == length_a:
+            i, used_a = i + 1, 0
+        if used_b == length_b:
+            j, used_b = j + 1, 0
+    return shared
@@ -0,0 +1,45 @@
+import re
+from typing import Dict, Any, List, Tuple
+
+# {{name}} placeholders, as written in personas.json
+SLOT_PATTERN = re.compile(r"\{\{([A-Za-z_][A-Za-z0-9_]*)\}\}")
+
+
+class PromptTemplate:
+    """
+    The Stencil.
+    A persona system prompt parsed once into literal text and {{slot}}
+    segments, rendered with a single join instead of one str.replace pass over
+    the whole prompt per placeholder. Slots without a value are left as
+    written. Values are inserted verbatim: a value containing '{{x}}' is not
+    expanded again.
+    """
+
+    def __init__(self, source: str):
+        self.source = source or ""
+        self._parts: List[str] = []                 # literal, slot, literal, slot, ..., literal
+        self._slots: List[Tuple[int, str]] = []     # (index in _parts, slot name)
+        position = 0
+        for match in SLOT_PATTERN.finditer(self.source):
+            self._parts.append(self.source[position:match.start()])
+            self._slots.append((len(self._parts), match.group(1)))
+            self._parts.append(match.group(0))
+            position = match.end()
+        self._parts.append(self.source[position:])
+        self.slots = frozenset(name for _, name in self._slots)
+
+    def render(self, values: Dict[str, Any]) -> str:
+        parts = list(self._parts)
+        for index, name in self._slots:
+            if name in values:
+                value = values[name]
+                parts[index] = value if isinstance(value, str) else str(value)
+        return "".join(parts)
+
+
+def persona_template(bible, persona: str) -> PromptTemplate:
+    """The compiled system_prompt of one persona, recompiled only when personas.json changes."""
+    def build(personas: Any) -> PromptTemplate:
+        config = personas.get(persona) if isinstance(personas, dict) else None
+        return PromptTemplate((config or {}).get("system_prompt", "") or "")
+    return bible.memo("personas", ("template", persona), build)
@@ -0,0 +1,120 @@
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Hashable, Optional
+
+from core.file_lock import FileLock
+
+
+class LRUCache:
+    """
+    A small thread-safe LRU map with hit/miss counters.
+    Used by MemoryStore for query embeddings and retrieval results.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = max(0, int(maxsize))
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize == 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+class GenerationStore:
+    """
+    File-backed per-collection generation counters.
+    Every ingest bumps its collection's counter; result caches key on it, so a
+    cached answer can never outlive the data it was computed from. Stored on disk
+    so separate MemoryStore instances (and processes) see each other's bumps; a
+    bump holds a file lock over its read-modify-write, so concurrent ones never
+    overwrite each other.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(self.path.with_name(self.path.name + ".lock"))
+        self._stamp = None
+        self._counters: Dict[str, int] = {}
+
+    def _file_stamp(self):
+        try:
+            stat = self.path.stat()
+            return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        except FileNotFoundError:
+            return None
+
+    def _load(self) -> None:
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return
+        counters: Dict[str, int] = {}
+        if stamp is not None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    counters = {k: int(v) for k, v in json.load(f).items()}
+            except Exception:
+                counters = dict(self._counters)
+        self._counters = counters
+        self._stamp = stamp
+
+    def get(self, name: str) -> int:
+        with self._lock:
+            self._load()
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            self._load()
+            return dict(self._counters)
+
+    def bump(self, *names: str) -> None:
+        with self._lock, self._file_lock:
+            self._load()
+            for name in names:
+                self._counters[name] = self._counters.get(name, 0) + 1
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._counters, f)
+            tmp.replace(self.path)
+            self._stamp = self._file_stamp()
@@ -4,10 +4,11 @@ import logging
 import re
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 
 # --- Internal Imports ---
 from core.memory_store import MemoryStore
+from core.buffer_cache import manuscript_cache
 
 logger = logging.getLogger(__name__)
 
@@ -18,15 +19,15 @@ class ProjectScanner:
     Also handles RAG ingestion for modified files.
     """
 
-    def __init__(self, project_root: Path):
+    def __init__(self, project_root: Path, memory_store: Optional[MemoryStore] = None):
         self.project_root = project_root
         self.data_dir = project_root / "data"
         self.root = self.data_dir / "manuscripts"
         self.matrix_path = self.data_dir / "matrix.json"
         self.conf_path = self.data_dir / "story_bible" / "project_conf.json"
         
-        # Initialize Memory Store for RAG ingestion
-        self.memory = MemoryStore(project_root)
+        # Memory Store for RAG ingestion: shared with the Orchestrator (core/services.py) when given
+        self.memory = memory_store if memory_store is not None else MemoryStore(project_root)
         
         self._ensure_directories()
 
@@ -96,7 +97,32 @@ class ProjectScanner:
 
         return "DRAFTING"
 
-    def scan(self) -> Dict[str, Any]:
+    def scan(self, ingest: bool = True) -> Dict[str, Any]:
+        """
+        Rescans the manuscripts and saves the Matrix. With ingest, modified files
+        are ingested for RAG inline (blocking); async callers use ascan() instead.
+        """
+        matrix, pending = self._scan()
+        if ingest:
+            for file_path, content in pending:
+                try:
+                    self.memory.ingest_manuscript(file_path, content)
+                except Exception as e:
+                    logger.warning(f"RAG ingest failed for {file_path}: {e}")
+        return matrix
+
+    async def ascan(self) -> Dict[str, Any]:
+        """scan() for the event loop: RAG ingestion is awaited (embedding over aiohttp, index work on the MemoryStore thread)."""
+        matrix, pending = self._scan()
+        for file_path, content in pending:
+            try:
+                await self.memory.aingest(file_path, content)
+            except Exception as e:
+                logger.warning(f"RAG ingest failed for {file_path}: {e}")
+        return matrix
+
+    def _scan(self) -> Tuple[Dict[str, Any], List[Tuple[Path, str]]]:
+        """Updates and saves the Matrix; returns it with the files due for RAG ingestion."""
         matrix = self._load_json(
             self.matrix_path,
             default={
@@ -124,6 +150,9 @@ class ProjectScanner:
 
         found_ids = set()
         total_word_count = 0
+        pending: List[Tuple[Path, str]] = []
+        # Files the ingest ledger holds (it forgets files whose chunks went stale)
+        ingested = self.memory.ingested_sources()
 
         for file_path in sorted(self.root.rglob("*.md")):
             try:
@@ -134,8 +163,8 @@ class ProjectScanner:
                 rel_path = file_path.relative_to(self.project_root).as_posix()
                 last_modified = datetime.fromtimestamp(file_path.stat().st_mtime).isoformat()
 
-                with open(file_path, "r", encoding="utf-8") as f:
-                    content = f.read()
+                # Shared with the file tools: unchanged chapters are not re-read from disk
+                content = manuscript_cache.read(file_path)
 
                 word_count = self._count_words(content)
                 found_ids.add(file_id)
@@ -143,6 +172,7 @@ class ProjectScanner:
                 existing = content_map.get(file_id, {})
                 if not isinstance(existing, dict):
                     existing = {}
+                prev_last_modified = existing.get("last_modified")
 
                 current_status = existing.get("status", "DRAFTING")
                 status = self._determine_status(current_status, content, word_count, target_count)
@@ -152,7 +182,6 @@ class ProjectScanner:
                 if not isinstance(editor_notes, list):
                     editor_notes = []
 
-                prev_last_modified = existing.get("last_modified")
                 content_map[file_id] = {
                     "title": title,
                     "path": rel_path,
@@ -163,11 +192,9 @@ class ProjectScanner:
                     "editor_notes": editor_notes
                 }
 
-                if prev_last_modified != last_modified:
-                    try:
-                        self.memory.ingest_manuscript(file_path, content)
-                    except Exception:
-                        pass
+                # RAG ingestion for modified files, and for files the ledger no longer holds
+                if self.memory.use_rag and (prev_last_modified != last_modified or file_path.stem not in ingested):
+                    pending.append((file_path, content))
 
                 total_word_count += word_count
 
@@ -201,4 +228,4 @@ class ProjectScanner:
                 matrix["meta"]["project_status"] = "ACTIVE"
 
         self._save_matrix(matrix)
-        return matrix
\ No newline at end of file
+        return matrix, pending
\ No newline at end of file
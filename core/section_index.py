@@ -0,0 +1,123 @@
+import re
+import bisect
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+# --- Configuration ---
+INDEX_CACHE_ENTRIES = 64
+PREAMBLE_TITLE = "(preamble)"
+
+_HEADING_LINE_RE = re.compile(r"^\s{0,3}(#{1,6})\s+(.*?)\s*#*\s*$")
+
+
+class SectionIndex:
+    """
+    The Table of Contents.
+    Line and heading map of one manuscript version: the char offset and the
+    UTF-8 byte offset of every line start, and the markdown sections (a heading
+    up to the next heading of the same or a higher level). Lets read tools
+    address a file by lines or by section without re-scanning it.
+    """
+
+    def __init__(self, text: str):
+        self.length = len(text)
+        self.line_starts: List[int] = []     # char offset of every line start
+        self.line_bytes: List[int] = []      # byte offset of every line start
+        self.sections: List[Dict[str, Any]] = []
+
+        position = byte_position = 0
+        headings: List[Tuple[int, int, str]] = []        # (line index, level, title)
+        for line in text.splitlines(keepends=True):
+            match = _HEADING_LINE_RE.match(line)
+            if match:
+                headings.append((len(self.line_starts), len(match.group(1)), match.group(2)))
+            self.line_starts.append(position)
+            self.line_bytes.append(byte_position)
+            position += len(line)
+            byte_position += len(line.encode("utf-8"))
+        self.total_bytes = byte_position
+        self.total_lines = len(self.line_starts)
+
+        if headings and headings[0][0] > 0 and text[:self.line_starts[headings[0][0]]].strip():
+            self.sections.append(self._section(PREAMBLE_TITLE, 0, 0, headings[0][0]))
+        for i, (line, level, title) in enumerate(headings):
+            end_line = next((other for other, other_level, _ in headings[i + 1:] if other_level <= level), None)
+            self.sections.append(self._section(title, level, line, end_line))
+
+    def _line_offset(self, line: Optional[int]) -> int:
+        if line is None or line >= len(self.line_starts):
+            return self.length
+        return self.line_starts[line]
+
+    def _section(self, title: str, level: int, start_line: int, end_line: Optional[int]) -> Dict[str, Any]:
+        start, end = self._line_offset(start_line), self._line_offset(end_line)
+        return {
+            "title": title,
+            "level": level,
+            "start": start,
+            "end": end,
+            "line_start": start_line + 1,
+            "line_end": self.line_of(max(start, end - 1)),
+        }
+
+    # --- Lookups ---
+
+    def line_of(self, offset: int) -> int:
+        """1-based line number containing char `offset`."""
+        return max(1, bisect.bisect_right(self.line_starts, max(0, offset)))
+
+    def byte_offset(self, offset: int, text: str) -> int:
+        """UTF-8 byte offset of char `offset` (line table + the partial line)."""
+        if not self.line_starts:
+            return 0
+        line = self.line_of(offset) - 1
+        return self.line_bytes[line] + len(text[self.line_starts[line]:offset].encode("utf-8"))
+
+    def lines(self, first: int, last: Optional[int] = None) -> Tuple[int, int]:
+        """Char span of 1-based inclusive lines first..last (last=None: to the end)."""
+        first = max(1, first)
+        start = self._line_offset(first - 1)
+        end = self._line_offset(last) if last is not None else self.length
+        return start, max(start, end)
+
+    def find_section(self, name: str) -> Optional[Dict[str, Any]]:
+        """Section by heading: exact title (case-insensitive, '#' marks ignored), else the first title containing it."""
+        wanted = name.strip().lstrip("#").strip().lower()
+        if not wanted:
+            return None
+        for section in self.sections:
+            if section["title"].lower() == wanted:
+                return section
+        for section in self.sections:
+            if wanted in section["title"].lower():
+                return section
+        return None
+
+    def outline(self) -> List[Dict[str, Any]]:
+        return [{"title": s["title"], "level": s["level"], "line_start": s["line_start"], "line_end": s["line_end"]}
+                for s in self.sections]
+
+
+# --- Cache ---
+
+_indexes: "OrderedDict[str, Tuple[Any, SectionIndex]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def section_index(path: Path, text: str, stamp: Any) -> SectionIndex:
+    """The SectionIndex of `text` (the content of `path` at `stamp`), rebuilt only when the stamp changes."""
+    key = str(path)
+    with _lock:
+        cached = _indexes.get(key)
+        if cached is not None and cached[0] == stamp and stamp is not None:
+            _indexes.move_to_end(key)
+            return cached[1]
+    index = SectionIndex(text)
+    with _lock:
+        _indexes[key] = (stamp, index)
+        _indexes.move_to_end(key)
+        while len(_indexes) > INDEX_CACHE_ENTRIES:
+            _indexes.popitem(last=False)
+    return index
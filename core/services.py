@@ -0,0 +1,175 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+import aiohttp
+
+from core.story_bible import StoryBible
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))                  # Open connections shared by LLM and embedding calls
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "10"))
+
+
+def rss_mb() -> float:
+    """Current resident set size in MB (Linux /proc, falling back to peak RSS)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except Exception:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+# --- Shared HTTP Pool ---
+
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def http_session() -> aiohttp.ClientSession:
+    """
+    The process-wide aiohttp session (keep-alive connection pool) for the running
+    event loop. Created on first use; a new loop (tests, asyncio.run per command)
+    gets a fresh one. Callers must not close it: close_http_session() does.
+    """
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        connector = aiohttp.TCPConnector(limit=HTTP_POOL_SIZE, limit_per_host=HTTP_POOL_PER_HOST)
+        _session = aiohttp.ClientSession(connector=connector)
+        _session_loop = loop
+    return _session
+
+
+async def close_http_session() -> None:
+    global _session, _session_loop
+    if _session is not None and not _session.closed and _session_loop is asyncio.get_running_loop():
+        await _session.close()
+    _session = None
+    _session_loop = None
+
+
+# --- Service Container ---
+
+class ProjectServices:
+    """
+    The Switchboard.
+    One container per project holding the heavyweight, shareable resources: the
+    MemoryStore (vector DB client, embedder, caches, worker thread), the scanner
+    built on top of it, the StoryBible and the shared HTTP pool. Each is
+    created on first use and lives until close()/aclose(), so the Orchestrator,
+    the scanner and the agent services all talk to the same instances.
+
+    startup_report() gives the time each service took to create and the process
+    RSS before and after.
+    """
+
+    def __init__(self, project_root: Path):
+        self.project_root = Path(project_root)
+        self._lock = threading.RLock()
+        self._memory = None
+        self._scanner = None
+        self._bible: Optional[StoryBible] = None
+        self._timings: Dict[str, float] = {}
+        self._rss_start = rss_mb()
+        self.closed = False
+
+    def _timed(self, name: str, factory):
+        started = time.perf_counter()
+        instance = factory()
+        self._timings[name] = round(time.perf_counter() - started, 4)
+        logger.debug(f"Service '{name}' ready in {self._timings[name]}s")
+        return instance
+
+    @property
+    def memory(self):
+        """The project's MemoryStore."""
+        with self._lock:
+            if self._memory is None:
+                from core.memory_store import MemoryStore
+                self._memory = self._timed("memory", lambda: MemoryStore(self.project_root, http_session=http_session))
+            return self._memory
+
+    @property
+    def scanner(self):
+        """The ProjectScanner, ingesting through the shared MemoryStore."""
+        with self._lock:
+            if self._scanner is None:
+                from core.scanner import ProjectScanner
+                memory = self.memory
+                self._scanner = self._timed("scanner", lambda: ProjectScanner(self.project_root, memory_store=memory))
+            return self._scanner
+
+    @property
+    def bible(self) -> StoryBible:
+        """The project's StoryBible, shared by every agent."""
+        with self._lock:
+            if self._bible is None:
+                self._bible = self._timed("bible", lambda: StoryBible(self.project_root / "data" / "story_bible"))
+            return self._bible
+
+    @property
+    def http(self) -> aiohttp.ClientSession:
+        """The shared HTTP pool (needs a running event loop)."""
+        return http_session()
+
+    def startup_report(self) -> Dict[str, Any]:
+        return {
+            "services": dict(self._timings),
+            "startup_seconds": round(sum(self._timings.values()), 4),
+            "rss_start_mb": round(self._rss_start, 1),
+            "rss_mb": round(rss_mb(), 1),
+        }
+
+    def close(self) -> None:
+        """Releases the project's resources (the HTTP pool is process-wide: see aclose())."""
+        with self._lock:
+            if self._memory is not None:
+                self._memory.close()
+            self._memory = None
+            self._scanner = None
+            self._bible = None
+            self.closed = True
+
+    async def aclose(self) -> None:
+        from core import agent_tools
+        await agent_tools.flush()
+        self.close()
+        await close_http_session()
+
+
+# --- Registry ---
+
+_registry: Dict[Path, ProjectServices] = {}
+_registry_lock = threading.Lock()
+
+
+def get_services(project_root: Path) -> ProjectServices:
+    """The ProjectServices for a project, created on first request."""
+    key = Path(project_root).resolve()
+    with _registry_lock:
+        services = _registry.get(key)
+        if services is None or services.closed:
+            services = ProjectServices(project_root)
+            _registry[key] = services
+        return services
+
+
+def close_services(project_root: Optional[Path] = None) -> None:
+    """Closes one project's services, or every registered project's."""
+    with _registry_lock:
+        keys = [Path(project_root).resolve()] if project_root is not None else list(_registry)
+        for key in keys:
+            services = _registry.pop(key, None)
+            if services is not None:
+                services.close()
@@ -0,0 +1,138 @@
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+BIBLE_FILES = ("personas", "project_conf", "story_brief", "characters", "locations", "timeline")
+# Files that are legitimately absent early in a project (no warning)
+OPTIONAL_FILES = {"story_brief", "characters", "locations", "timeline"}
+
+_MISSING = object()
+
+
+class StoryBible:
+    """
+    The Library.
+    The project's story bible (data/story_bible/*.json) as the agents read it.
+    Each file is parsed once and re-read only when its (mtime_ns, size) changes;
+    the prompt fragments built from it (the `indent=2` JSON of the style guide,
+    the brief, one character sheet...) are serialized once per file version.
+    Missing or broken files read as {}. Returned data is shared: treat it as
+    read-only.
+    """
+
+    def __init__(self, bible_dir: Path):
+        self.bible_dir = Path(bible_dir)
+        self._lock = threading.RLock()
+        self._entries: Dict[str, Tuple[Any, Any, Dict[Any, Any]]] = {}     # name -> (stamp, data, memo)
+        self.loads = 0
+
+    @staticmethod
+    def _name(name: str) -> str:
+        return name[:-5] if name.endswith(".json") else name
+
+    def _stamp(self, name: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = (self.bible_dir / f"{name}.json").stat()
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _entry(self, name: str) -> Tuple[Any, Any, Dict[Any, Any]]:
+        name = self._name(name)
+        stamp = self._stamp(name)
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry[0] == stamp:
+                return entry
+            data: Any = {}
+            if stamp is None:
+                if name not in OPTIONAL_FILES:
+                    logger.warning(f"Config file missing: {self.bible_dir / f'{name}.json'}")
+            else:
+                try:
+                    with open(self.bible_dir / f"{name}.json", "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                    self.loads += 1
+                except Exception as e:
+                    logger.error(f"Failed to load config {self.bible_dir / f'{name}.json'}: {e}")
+                    data = {}
+            entry = (stamp, data, {})
+            self._entries[name] = entry
+            return entry
+
+    # --- Data ---
+
+    def load(self, name: str) -> Any:
+        """Parsed content of one bible file ('characters' or 'characters.json')."""
+        return self._entry(name)[1]
+
+    def get(self, name: str, *keys: str, default: Any = None) -> Any:
+        """A value inside a bible file: get('project_conf', 'style', 'genre')."""
+        value = self.load(name)
+        for key in keys:
+            value = value.get(key, _MISSING) if isinstance(value, dict) else _MISSING
+            if value is _MISSING:
+                return default
+        return value
+
+    @property
+    def personas(self) -> Dict[str, Any]:
+        return self.load("personas")
+
+    @property
+    def project_conf(self) -> Dict[str, Any]:
+        return self.load("project_conf")
+
+    @property
+    def story_brief(self) -> Dict[str, Any]:
+        return self.load("story_brief")
+
+    @property
+    def characters(self) -> Dict[str, Any]:
+        return self.load("characters")
+
+    @property
+    def locations(self) -> Dict[str, Any]:
+        return self.load("locations")
+
+    @property
+    def timeline(self) -> Any:
+        return self.load("timeline")
+
+    # --- Fragments ---
+
+    def memo(self, name: str, key: Any, build: Callable[[Any], Any]) -> Any:
+        """build(data of `name`), computed once per version of that file."""
+        _, data, memo = self._entry(name)
+        with self._lock:
+            if key not in memo:
+                memo[key] = build(data)
+            return memo[key]
+
+    def fragment(self, name: str, *keys: str, default: Any = None) -> str:
+        """json.dumps(indent=2) of a bible file, or of a value inside it, serialized once per file version."""
+        def build(data: Any) -> str:
+            value = data
+            for key in keys:
+                value = value.get(key, _MISSING) if isinstance(value, dict) else _MISSING
+                if value is _MISSING:
+                    value = default
+                    break
+            return json.dumps(value if value is not None else {}, indent=2)
+        return self.memo(name, ("json", keys, json.dumps(default)), build)
+
+    def version(self, *names: str) -> Tuple[Any, ...]:
+        """The stamps of the given files (all bible files by default): changes whenever one of them does."""
+        return tuple(self._entry(name)[0] for name in (names or BIBLE_FILES))
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self._name(name), None)
@@ -0,0 +1,269 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable, Awaitable
+
+from core.chunker import Chunker, chapter_number, count_tokens
+from core.lexical_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+TREE_FILENAME = "summary_tree.json"
+ACT_SIZE = int(os.getenv("SUMMARY_ACT_SIZE", "8"))                    # Chapters per act
+STORY_SO_FAR_TOKENS = int(os.getenv("SUMMARY_CONTEXT_TOKENS", "800"))  # Default story_so_far() budget
+SCENE_WORDS = 60
+CHAPTER_WORDS = 150
+ACT_WORDS = 220
+
+_SENTENCE_RE = re.compile(r"[^.!?…]+[.!?…]+[\"'”’)\]]*|[^.!?…]+$", re.UNICODE)
+
+# async (text, level, max_words) -> summary; level is "scene", "chapter" or "act"
+Summarizer = Callable[[str, str, int], Awaitable[str]]
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def extractive_summary(text: str, max_words: int) -> str:
+    """
+    Offline fallback summarizer: keeps the sentences whose words are most frequent
+    across the passage (a cheap centrality score), in reading order, within max_words.
+    The first sentence gets a small bonus since it usually anchors the scene.
+    """
+    # Markdown headings ("# Chapter 3") are labels, not events
+    body = "\n".join(line for line in (text or "").splitlines() if not line.lstrip().startswith("#"))
+    sentences = [s.strip() for s in _SENTENCE_RE.findall(" ".join(body.split())) if s.strip()]
+    if not sentences:
+        return ""
+    if sum(len(s.split()) for s in sentences) <= max_words:
+        return " ".join(sentences)
+
+    frequencies = Counter(tokenize(text))
+    scored = []
+    for position, sentence in enumerate(sentences):
+        terms = tokenize(sentence)
+        score = sum(frequencies[t] for t in set(terms)) / (len(terms) ** 0.5) if terms else 0.0
+        if position == 0:
+            score *= 1.5
+        scored.append((score, position))
+
+    chosen, words = [], 0
+    for score, position in sorted(scored, reverse=True):
+        length = len(sentences[position].split())
+        if words + length > max_words:
+            continue
+        chosen.append(position)
+        words += length
+    if not chosen:
+        return " ".join(sentences[0].split()[:max_words])
+    return " ".join(sentences[p] for p in sorted(chosen))
+
+
+class SummaryTree:
+    """
+    The Chronicle.
+    A three-level summary hierarchy per project: scenes -> chapters -> acts
+    (ACT_SIZE consecutive chapters). Updated incrementally when a chapter is
+    LOCKED: only scenes whose text changed are re-summarized, and only the act
+    containing that chapter is rebuilt. story_so_far() then returns a bounded
+    "previously on" digest regardless of book length.
+
+    Stored in data/summary_tree.json.
+    """
+
+    def __init__(self, project_root: Path, act_size: int = ACT_SIZE):
+        self.path = Path(project_root) / "data" / TREE_FILENAME
+        self.act_size = max(1, int(act_size))
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._tree: Dict[str, Any] = {"version": 1, "chapters": {}, "acts": {}}
+        self._chunker = Chunker()
+
+    # --- Persistence ---
+
+    def _file_stamp(self):
+        try:
+            stat = self.path.stat()
+            return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        except FileNotFoundError:
+            return None
+
+    def _load(self) -> Dict[str, Any]:
+        with self._lock:
+            stamp = self._file_stamp()
+            if stamp != self._stamp:
+                tree = {"version": 1, "chapters": {}, "acts": {}}
+                if stamp is not None:
+                    try:
+                        with open(self.path, "r", encoding="utf-8") as f:
+                            tree.update(json.load(f))
+                    except Exception as e:
+                        logger.error(f"Failed to load summary tree {self.path}: {e}")
+                self._tree = tree
+                self._stamp = stamp
+            return self._tree
+
+    def _save(self, tree: Dict[str, Any]) -> None:
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(tree, f, indent=2, ensure_ascii=False)
+            tmp.replace(self.path)
+            self._tree = tree
+            self._stamp = self._file_stamp()
+
+    # --- Construction ---
+
+    def _act_of(self, chapter: int) -> int:
+        return (chapter - 1) // self.act_size + 1
+
+    @staticmethod
+    async def _summarize(text: str, level: str, max_words: int, summarizer: Optional[Summarizer]) -> str:
+        if summarizer is not None:
+            try:
+                summary = (await summarizer(text, level, max_words) or "").strip()
+                if summary:
+                    return summary
+            except Exception as e:
+                logger.warning(f"{level.capitalize()} summarizer failed, using extractive fallback: {e}")
+        return extractive_summary(text, max_words)
+
+    async def update_chapter(self, file_id: str, content: str, summarizer: Optional[Summarizer] = None) -> bool:
+        """
+        (Re)summarizes one chapter and its act. Returns False if the chapter was
+        unchanged or carries no chapter number.
+        """
+        chapter = chapter_number(file_id)
+        if chapter is None:
+            logger.info(f"Summary tree: skipping {file_id} (no chapter number)")
+            return False
+
+        tree = json.loads(json.dumps(self._load()))
+        content_hash = _digest(content)
+        entry = tree["chapters"].get(file_id)
+        if entry and entry.get("content_hash") == content_hash:
+            return False
+
+        # 1. Scenes: reuse summaries of scenes whose text did not change
+        previous = {scene["text_hash"]: scene["summary"] for scene in (entry or {}).get("scenes", [])}
+        scenes = []
+        for scene in self._chunker.scenes(content):
+            text_hash = _digest(scene["text"])
+            summary = previous.get(text_hash)
+            if summary is None:
+                summary = await self._summarize(scene["text"], "scene", SCENE_WORDS, summarizer)
+            scenes.append({
+                "scene_index": scene["scene_index"],
+                "char_start": scene["char_start"],
+                "char_end": scene["char_end"],
+                "text_hash": text_hash,
+                "summary": summary,
+            })
+
+        # 2. Chapter: from its scene summaries
+        scene_digest = "\n".join(s["summary"] for s in scenes)
+        chapter_summary = await self._summarize(scene_digest, "chapter", CHAPTER_WORDS, summarizer) if scenes else ""
+
+        # Another writer may have updated the tree while we awaited the summarizer
+        tree = json.loads(json.dumps(self._load()))
+        # Renamed chapter files ("ch03_Old" -> "ch03_New") replace their predecessor
+        for other_id, other in list(tree["chapters"].items()):
+            if other_id != file_id and other.get("chapter") == chapter:
+                del tree["chapters"][other_id]
+        tree["chapters"][file_id] = {
+            "chapter": chapter,
+            "content_hash": content_hash,
+            "scenes": scenes,
+            "summary": chapter_summary,
+            "updated_at": time.time(),
+        }
+
+        # 3. Act: rebuilt from the chapter summaries it contains
+        act = self._act_of(chapter)
+        members = sorted(
+            (c for c in tree["chapters"].items() if self._act_of(c[1]["chapter"]) == act),
+            key=lambda item: item[1]["chapter"],
+        )
+        act_source = "\n".join(f"Chapter {c['chapter']}: {c['summary']}" for _, c in members)
+        act_hash = _digest(act_source)
+        current_act = tree["acts"].get(str(act), {})
+        if current_act.get("source_hash") != act_hash:
+            tree["acts"][str(act)] = {
+                "chapters": [file_id for file_id, _ in members],
+                "first_chapter": members[0][1]["chapter"],
+                "last_chapter": members[-1][1]["chapter"],
+                "source_hash": act_hash,
+                "summary": await self._summarize(act_source, "act", ACT_WORDS, summarizer),
+            }
+
+        self._save(tree)
+        logger.info(f"Summary tree updated for {file_id}: {len(scenes)} scenes, act {act}.")
+        return True
+
+    # --- Retrieval ---
+
+    def chapter_summary(self, file_id: str) -> Optional[Dict[str, Any]]:
+        return self._load()["chapters"].get(file_id)
+
+    def story_so_far(self, max_chapter: Optional[int] = None, budget_tokens: int = STORY_SO_FAR_TOKENS) -> str:
+        """
+        Compact digest of chapters 1..`max_chapter` (None = whole book),
+        within `budget_tokens`. Earlier acts appear as act summaries; the current
+        act as chapter summaries. When over budget the oldest lines go first:
+        the most recent events matter most for continuity.
+        """
+        tree = self._load()
+        chapters = sorted(
+            (c for c in tree["chapters"].values() if max_chapter is None or c["chapter"] <= max_chapter),
+            key=lambda c: c["chapter"],
+        )
+        if not chapters:
+            return ""
+
+        current_act = self._act_of(chapters[-1]["chapter"])
+        # (sort key, text) in reading order: earlier acts, then the current act chapter by chapter
+        acts = [
+            ((int(key), 0), f"Act {key} (chapters {act['first_chapter']}-{act['last_chapter']}): {act['summary']}")
+            for key, act in tree["acts"].items()
+            if int(key) < current_act and act.get("summary")
+        ]
+        recent = [
+            ((current_act, c["chapter"]), f"Chapter {c['chapter']}: {c['summary']}")
+            for c in chapters
+            if self._act_of(c["chapter"]) == current_act and c.get("summary")
+        ]
+        acts.sort()
+        if not recent and not acts:
+            return ""
+
+        # Priority: the latest chapter, the previous act, the rest of the current act
+        # (newest first), then older acts (newest first). Whatever does not fit is skipped.
+        priority = recent[-1:] + acts[-1:] + recent[-2::-1] + acts[-2::-1]
+        marker = "(Earlier events omitted.)"
+        if count_tokens(priority[0][1]) > budget_tokens:
+            # Even the most recent summary alone is over budget: trim it
+            words = priority[0][1].split()
+            keep = max(1, int(len(words) * budget_tokens / max(1, count_tokens(priority[0][1]))) - 1)
+            return " ".join(words[:keep]) + " ..."
+
+        chosen = []
+        used = 0
+        for item in priority:
+            cost = count_tokens(item[1]) + 1
+            if used + cost <= budget_tokens:
+                chosen.append(item)
+                used += cost
+
+        lines = [text for _, text in sorted(chosen)]
+        if len(chosen) < len(priority) and used + count_tokens(marker) + 1 <= budget_tokens:
+            lines.insert(0, marker)
+        return "\n".join(lines)
@@ -0,0 +1,147 @@
+import re
+import json
+from typing import List, Optional
+
+# Where a run of plain string characters ends
+_STRING_STOP = re.compile(r'["\\]')
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class ArgumentStream:
+    """
+    The Tap.
+    Pulls one top-level string field (by default "content") out of a tool
+    call's JSON arguments while they are still streaming in, fragment by
+    fragment. feed() returns the newly decoded text of the field: escapes,
+    \\uXXXX and surrogate pairs are decoded even when split across fragments.
+    The field may come before or after the other keys; other values (nested
+    objects included) are skipped. Once the field's string closes, `done` is
+    set and later fragments are ignored. What was streamed should still be
+    checked against the parsed arguments once the call is complete.
+    """
+
+    def __init__(self, field: str = "content"):
+        self.field = field
+        self.started = False            # the field's string has opened
+        self.done = False               # ... and closed
+        self._pending = ""              # undecoded tail: an escape split across fragments
+        self._depth = 0
+        self._expect_key = False
+        self._key: Optional[str] = None  # last top-level key read
+        self._in_string = False
+        self._string_kind = ""          # "key", "field" or "skip"
+        self._key_raw: List[str] = []
+        self._high: Optional[int] = None  # high surrogate waiting for its pair
+
+    def feed(self, fragment: str) -> str:
+        if self.done or not fragment:
+            return ""
+        buf = self._pending + fragment
+        self._pending = ""
+        out: List[str] = []
+        i, n = 0, len(buf)
+        while i < n:
+            if not self._in_string:
+                char = buf[i]
+                i += 1
+                if char == '"':
+                    self._open_string()
+                elif char in "{[":
+                    self._depth += 1
+                    self._expect_key = self._depth == 1 and char == "{"
+                elif char in "}]":
+                    self._depth -= 1
+                elif self._depth == 1 and char == ":":
+                    self._expect_key = False
+                elif self._depth == 1 and char == ",":
+                    self._expect_key, self._key = True, None
+                continue
+
+            match = _STRING_STOP.search(buf, i)
+            stop = match.start() if match else n
+            if stop > i:
+                self._take(out, buf[i:stop])
+                i = stop
+            if i >= n:
+                break
+            if buf[i] == '"':
+                i += 1
+                self._close_string(out)
+                if self.done:
+                    break
+                continue
+            # Backslash escape: keep it for the next fragment if it is incomplete
+            if i + 1 >= n or (buf[i + 1] == "u" and i + 6 > n):
+                self._pending = buf[i:]
+                break
+            if buf[i + 1] == "u":
+                self._escape(out, buf[i:i + 6])
+                i += 6
+            else:
+                self._escape(out, buf[i:i + 2])
+                i += 2
+        return "".join(out)
+
+    # --- Strings ---
+
+    def _open_string(self) -> None:
+        self._in_string = True
+        if self._depth == 1 and self._expect_key:
+            self._string_kind = "key"
+            self._key_raw = []
+        elif self._depth == 1 and self._key == self.field and not self.started:
+            self._string_kind = "field"
+            self.started = True
+        else:
+            self._string_kind = "skip"
+
+    def _close_string(self, out: List[str]) -> None:
+        self._in_string = False
+        if self._string_kind == "key":
+            try:
+                self._key = json.loads('"' + "".join(self._key_raw) + '"')
+            except ValueError:
+                self._key = None
+        elif self._string_kind == "field":
+            self._lone_surrogate(out)
+            self.done = True
+
+    def _take(self, out: List[str], text: str) -> None:
+        if self._string_kind == "field":
+            self._lone_surrogate(out)
+            out.append(text)
+        elif self._string_kind == "key":
+            self._key_raw.append(text)
+
+    def _escape(self, out: List[str], escape: str) -> None:
+        if self._string_kind == "key":
+            self._key_raw.append(escape)
+            return
+        if self._string_kind != "field":
+            return
+        if escape[1] != "u":
+            self._lone_surrogate(out)
+            out.append(_ESCAPES.get(escape[1], escape[1]))
+            return
+        try:
+            code = int(escape[2:], 16)
+        except ValueError:
+            self._lone_surrogate(out)
+            out.append("\ufffd")
+            return
+        if 0xD800 <= code <= 0xDBFF:
+            self._lone_surrogate(out)
+            self._high = code
+        elif 0xDC00 <= code <= 0xDFFF and self._high is not None:
+            out.append(chr(0x10000 + ((self._high - 0xD800) << 10) + (code - 0xDC00)))
+            self._high = None
+        else:
+            self._lone_surrogate(out)
+            out.append(chr(code) if not 0xDC00 <= code <= 0xDFFF else "\ufffd")
+
+    def _lone_surrogate(self, out: List[str]) -> None:
+        """A high surrogate not followed by its low half: replaced, as it cannot be written as UTF-8."""
+        if self._high is not None:
+            out.append("\ufffd")
+            self._high = None
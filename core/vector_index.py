@@ -0,0 +1,923 @@
+import os
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Sequence
+
+from core.file_lock import FileLock
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+try:
+    import chromadb
+except Exception:
+    chromadb = None
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+COLLECTION_NAME = "narrative_memory"
+# Chroma rows carry their partition in this metadata field; the marker file records that old rows were tagged
+PARTITION_KEY = "partition"
+CHROMA_LAYOUT_FILENAME = "chroma_layout.json"
+NUMPY_INDEX_DIR = "numpy_index"
+INITIAL_CAPACITY = 1024
+# Compact once tombstones make up this share of the rows (and there are enough of them to matter)
+COMPACT_RATIO = float(os.getenv("RAG_NUMPY_COMPACT_RATIO", "0.3"))
+COMPACT_MIN_TOMBSTONES = 256
+# Compact search copy of the vectors: 'none' (float32), 'float16' or 'int8' (per-row scale)
+QUANTIZATION = os.getenv("RAG_NUMPY_QUANTIZATION", "none").lower()
+QUANTIZATION_MODES = ("none", "float16", "int8")
+# Search on the first N dimensions only (Matryoshka-style models such as text-embedding-3); 0 = all
+TRUNCATE_DIM = int(os.getenv("RAG_NUMPY_TRUNCATE_DIM", "0"))
+# Approximate search shortlists k * RERANK_FACTOR rows, then re-scores them exactly in float32
+RERANK_FACTOR = int(os.getenv("RAG_NUMPY_RERANK_FACTOR", "4"))
+# Rows upcast per block when scoring a compact matrix (bounds the float32 temporary)
+SCORE_BLOCK_ROWS = 1024
+
+
+class VectorIndexError(Exception):
+    """Raised when a vector index backend cannot be created or is corrupted."""
+    pass
+
+
+class VectorIndex:
+    """
+    Interface for the vector storage behind MemoryStore.
+
+    Hits are returned as dicts: {"id", "document", "metadata", "score"} where
+    score is the cosine similarity (higher is better), sorted best first.
+    Metadata filters use the Chroma `where` grammar ($eq, $ne, $gt, $gte, $lt,
+    $lte, $in, $nin, $and, $or) so callers do not care which backend is active.
+
+    Rows live in named partitions (MemoryStore uses one per chapter file).
+    Dropping a partition costs only its own rows, and a query restricted to
+    `partitions` never touches the others.
+    """
+
+    name = "base"
+
+    def add(self, ids: Sequence[str], embeddings: Sequence[Sequence[float]], documents: Sequence[str], metadatas: Sequence[Dict[str, Any]],
+            partition: str = "") -> None:
+        raise NotImplementedError
+
+    def delete(self, where: Dict[str, Any]) -> int:
+        raise NotImplementedError
+
+    def delete_partition(self, partition: str) -> int:
+        raise NotImplementedError
+
+    def query(self, embedding: Sequence[float], n_results: int = 5, where: Optional[Dict[str, Any]] = None,
+              partitions: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """partitions=None searches everything; an empty list searches nothing."""
+        raise NotImplementedError
+
+    def partitions(self) -> List[str]:
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+# --- Chroma Backend ---
+
+def _as_list(vector: Sequence[float]) -> List[float]:
+    """Chroma rejects lists of NumPy scalars; hand it plain Python floats."""
+    return vector.tolist() if hasattr(vector, "tolist") else [float(x) for x in vector]
+
+
+class ChromaVectorIndex(VectorIndex):
+    """
+    Wraps a persistent ChromaDB collection (HNSW, cosine space).
+    Partitions are a `partition` metadata field on the rows of that one
+    collection: a restricted query is a single filtered search
+    (`{"partition": {"$in": [...]}}`) and dropping a partition deletes its rows.
+    Rows written before partitioning (no field) are tagged with their `source`
+    on open, once, as are the per-partition collections of earlier releases.
+    """
+
+    name = "chroma"
+
+    def __init__(self, db_path: Path, collection_name: str = COLLECTION_NAME):
+        if chromadb is None:
+            raise VectorIndexError("ChromaDB is not installed.")
+        self.collection_name = collection_name
+        self.client = chromadb.PersistentClient(path=str(db_path))
+        self.collection = self._open_collection()
+        self._migrate(Path(db_path) / CHROMA_LAYOUT_FILENAME)
+
+    def _open_collection(self):
+        return self.client.get_or_create_collection(
+            name=self.collection_name,
+            metadata={"hnsw:space": "cosine"}  # Cosine similarity for text search
+        )
+
+    def _migrate(self, marker: Path) -> None:
+        """Tags unpartitioned rows with their source and folds per-partition collections into this one."""
+        if marker.exists():
+            return
+        tagged = 0
+        stored = self.collection.get(include=["metadatas"])
+        untagged = [(chunk_id, meta or {}) for chunk_id, meta in zip(stored["ids"], stored["metadatas"])
+                    if PARTITION_KEY not in (meta or {})]
+        for start in range(0, len(untagged), 500):
+            batch = untagged[start:start + 500]
+            self.collection.update(
+                ids=[chunk_id for chunk_id, _ in batch],
+                metadatas=[dict(meta, **{PARTITION_KEY: meta.get("source", "")}) for _, meta in batch],
+            )
+            tagged += len(batch)
+
+        for item in self.client.list_collections():
+            # Chroma < 0.6 lists Collection objects, newer releases list names
+            name = item if isinstance(item, str) else item.name
+            if not name.startswith(f"{self.collection_name}__"):
+                continue
+            collection = self.client.get_collection(name=name)
+            partition = (collection.metadata or {}).get("partition", "")
+            rows = collection.get(include=["embeddings", "documents", "metadatas"])
+            if len(rows["ids"]):
+                self.add(rows["ids"], rows["embeddings"], rows["documents"], rows["metadatas"], partition=partition)
+                tagged += len(rows["ids"])
+            self.client.delete_collection(name)
+
+        if tagged:
+            logger.info(f"Chroma: tagged {tagged} rows with their partition")
+        marker.parent.mkdir(parents=True, exist_ok=True)
+        with open(marker, "w", encoding="utf-8") as f:
+            json.dump({"partition_key": PARTITION_KEY}, f)
+
+    @staticmethod
+    def _partition_filter(partitions: Optional[Sequence[str]], where: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if partitions is None:
+            return where or None
+        restrict = {PARTITION_KEY: {"$in": list(partitions)}}
+        return {"$and": [restrict, where]} if where else restrict
+
+    def add(self, ids, embeddings, documents, metadatas, partition: str = "") -> None:
+        if not ids:
+            return
+        self.collection.upsert(
+            ids=list(ids),
+            documents=list(documents),
+            embeddings=[_as_list(e) for e in embeddings],
+            metadatas=[dict(meta or {}, **{PARTITION_KEY: partition}) for meta in metadatas]
+        )
+
+    def delete(self, where: Dict[str, Any]) -> int:
+        before = self.collection.count()
+        self.collection.delete(where=where)
+        return before - self.collection.count()
+
+    def delete_partition(self, partition: str) -> int:
+        ids = self.collection.get(where={PARTITION_KEY: partition}, include=[])["ids"]
+        if ids:
+            self.collection.delete(ids=list(ids))
+        return len(ids)
+
+    def query(self, embedding, n_results: int = 5, where: Optional[Dict[str, Any]] = None,
+              partitions: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        if n_results <= 0 or (partitions is not None and not partitions):
+            return []
+        total = self.collection.count()
+        if total == 0:
+            return []
+
+        kwargs: Dict[str, Any] = {"query_embeddings": [_as_list(embedding)], "n_results": min(n_results, total)}
+        combined = self._partition_filter(partitions, where)
+        if combined:
+            kwargs["where"] = combined
+        results = self.collection.query(**kwargs)
+
+        # Chroma returns lists of lists (batch format)
+        hits = []
+        for chunk_id, doc, meta, dist in zip(results["ids"][0], results["documents"][0], results["metadatas"][0], results["distances"][0]):
+            meta = {key: value for key, value in (meta or {}).items() if key != PARTITION_KEY}
+            hits.append({"id": chunk_id, "document": doc, "metadata": meta, "score": 1.0 - float(dist)})
+        return hits
+
+    def partitions(self) -> List[str]:
+        stored = self.collection.get(include=["metadatas"])
+        return sorted({(meta or {}).get(PARTITION_KEY, "") for meta in stored["metadatas"]})
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def clear(self) -> None:
+        self.client.delete_collection(self.collection_name)
+        self.collection = self._open_collection()
+
+
+# --- NumPy Backend ---
+
+class NumpyVectorIndex(VectorIndex):
+    """
+    The Pocket Index.
+    A Chroma-free exact-search backend: one contiguous float32 matrix of
+    L2-normalized rows in a memory-mapped .npy file, so cosine similarity is a
+    single matmul and top-k is an argpartition.
+
+    On-disk layout (inside `<db_path>/numpy_index/`):
+    - MANIFEST.json          -> names the live vectors/records files (atomically replaced)
+    - vectors-<epoch>-<cap>.npy  -> (capacity, dim) float32 rows
+    - search-<epoch>-<cap>-<mode>-<dim>.npy (+ scales-...) -> optional compact copy
+    - records-<epoch>.jsonl  -> append-only log of row adds and tombstones
+
+    With quantization ('float16', 'int8' + per-row scale) and/or dimension
+    truncation, queries scan the compact copy and re-rank a shortlist exactly
+    from the float32 file, which otherwise stays on disk (only the shortlisted
+    rows are paged in).
+
+    Deletes are tombstones; the index is rewritten (new epoch) once tombstones
+    pass COMPACT_RATIO. Each partition keeps its row list, so dropping a chapter
+    or searching a few chapters never scans the whole matrix. Other instances
+    (scanner vs. orchestrator, other processes) notice manifest/log changes on
+    their next call and catch up. Writes (add, delete, compaction) hold an
+    exclusive lock on WRITE.lock, so concurrent writers never claim the same
+    rows or swap manifests under each other.
+    """
+
+    name = "numpy"
+
+    def __init__(self, db_path: Path, quantization: Optional[str] = None, truncate_dim: Optional[int] = None,
+                 rerank_factor: Optional[int] = None):
+        if np is None:
+            raise VectorIndexError("NumPy is not installed.")
+        self.quantization = (quantization or QUANTIZATION).lower()
+        if self.quantization not in QUANTIZATION_MODES:
+            raise VectorIndexError(f"Unknown quantization mode: {self.quantization}")
+        self.truncate_dim = int(truncate_dim if truncate_dim is not None else TRUNCATE_DIM)
+        self.rerank_factor = max(1, int(rerank_factor if rerank_factor is not None else RERANK_FACTOR))
+        self.root = Path(db_path) / NUMPY_INDEX_DIR
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.root / "MANIFEST.json"
+        self._lock = threading.RLock()
+        # Writers (any thread or process) take this around every change to the files
+        self._write_lock = FileLock(self.root / "WRITE.lock")
+
+        self._manifest_stamp = None
+        self._manifest: Dict[str, Any] = {}
+        self._vectors = None
+        self._search = None
+        self._scales = None
+        self._vectors_file = None
+        self._log_offset = 0
+        self._reset_state()
+
+        with self._lock, self._write_lock:
+            if not self.manifest_path.exists():
+                self._write_manifest({"epoch": 0, "dim": 0, "vectors": None, "records": "records-0.jsonl"})
+                (self.root / "records-0.jsonl").touch()
+            self._refresh()
+            self._sync_search()
+
+    # --- State ---
+
+    def _reset_state(self) -> None:
+        self._rows = 0
+        self._dim = 0
+        self._ids: List[Optional[str]] = []
+        self._documents: List[Optional[str]] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._id_to_row: Dict[str, int] = {}
+        self._partition_rows: Dict[str, List[int]] = {}
+        self._row_partition: List[str] = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._tombstones = 0
+        self._columns: Dict[str, Any] = {}
+        self._log_offset = 0
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        tmp = self.manifest_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        tmp.replace(self.manifest_path)
+        self._manifest = manifest
+        stat = self.manifest_path.stat()
+        self._manifest_stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _records_path(self) -> Path:
+        return self.root / self._manifest["records"]
+
+    def _open_vectors(self) -> None:
+        name = self._manifest.get("vectors")
+        self._vectors = None
+        self._search = None
+        self._scales = None
+        if self._vectors_file is not None:
+            self._vectors_file.close()
+            self._vectors_file = None
+        if name:
+            self._vectors = np.load(self.root / name, mmap_mode="r+")
+            self._dim = int(self._vectors.shape[1])
+        else:
+            self._dim = int(self._manifest.get("dim") or 0)
+        if self._manifest.get("search"):
+            self._search = np.load(self.root / self._manifest["search"], mmap_mode="r+")
+            if self._vectors is not None and hasattr(os, "pread"):
+                # Re-ranking reads a few rows with pread: page faults on the mapping would pull
+                # whole neighbourhoods of the float32 file into this process's RSS.
+                self._vectors_file = open(self.root / name, "rb", buffering=0)
+        if self._manifest.get("scales"):
+            self._scales = np.load(self.root / self._manifest["scales"], mmap_mode="r+")
+
+    def _refresh(self) -> None:
+        """Catches up with changes made by other instances (manifest swap or log growth)."""
+        try:
+            stat = self.manifest_path.stat()
+        except FileNotFoundError:
+            raise VectorIndexError(f"Vector index manifest missing at {self.manifest_path}")
+
+        stamp = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if stamp != self._manifest_stamp:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            previous = self._manifest
+            self._manifest = manifest
+            self._manifest_stamp = stamp
+            records_changed = manifest.get("records") != previous.get("records")
+            if records_changed:
+                self._reset_state()
+            files_changed = any(manifest.get(key) != previous.get(key) for key in ("vectors", "search", "scales"))
+            if records_changed or files_changed or self._vectors is None:
+                self._open_vectors()
+
+        records_path = self._records_path()
+        try:
+            size = records_path.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        if size > self._log_offset:
+            self._replay(records_path)
+
+    def _replay(self, records_path: Path) -> None:
+        with open(records_path, "rb") as f:
+            f.seek(self._log_offset)
+            data = f.read()
+
+        # Only consume complete lines; a concurrent writer may be mid-append.
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry.get("op") == "add":
+                self._apply_add(entry["row"], entry["id"], entry.get("document"), entry.get("metadata") or {}, entry.get("partition", ""))
+            elif entry.get("op") == "del":
+                self._apply_delete(entry.get("rows", []))
+        self._log_offset += end
+
+    def _ensure_alive_capacity(self, rows: int) -> None:
+        if rows > len(self._alive):
+            grown = np.zeros(max(rows, len(self._alive) * 2, INITIAL_CAPACITY), dtype=bool)
+            grown[:len(self._alive)] = self._alive
+            self._alive = grown
+
+    def _apply_add(self, row: int, chunk_id: str, document: Optional[str], metadata: Dict[str, Any], partition: str = "") -> None:
+        while len(self._ids) <= row:
+            self._ids.append(None)
+            self._documents.append(None)
+            self._metadatas.append({})
+            self._row_partition.append("")
+        self._ensure_alive_capacity(row + 1)
+
+        previous = self._id_to_row.get(chunk_id)
+        if previous is not None and previous != row and self._alive[previous]:
+            # Upsert: the older row for this id becomes a tombstone
+            self._alive[previous] = False
+            self._tombstones += 1
+
+        self._ids[row] = chunk_id
+        self._documents[row] = document
+        self._metadatas[row] = metadata
+        self._row_partition[row] = partition
+        self._partition_rows.setdefault(partition, []).append(row)
+        self._id_to_row[chunk_id] = row
+        self._alive[row] = True
+        self._rows = max(self._rows, row + 1)
+        self._columns = {}
+
+    def _apply_delete(self, rows: Sequence[int]) -> None:
+        for row in rows:
+            if row < self._rows and self._alive[row]:
+                self._alive[row] = False
+                self._tombstones += 1
+                chunk_id = self._ids[row]
+                if chunk_id is not None and self._id_to_row.get(chunk_id) == row:
+                    del self._id_to_row[chunk_id]
+
+    # --- Storage ---
+
+    def _vectors_name(self, epoch: int, capacity: int) -> str:
+        return f"vectors-{epoch}-{capacity}.npy"
+
+    def _ensure_capacity(self, needed_rows: int, dim: int) -> None:
+        """Grows the memory-mapped matrix by doubling (copy into a new file, then swap the manifest)."""
+        if self._vectors is not None and self._vectors.shape[0] >= needed_rows:
+            return
+
+        capacity = INITIAL_CAPACITY
+        if self._vectors is not None:
+            capacity = self._vectors.shape[0]
+        while capacity < needed_rows:
+            capacity *= 2
+
+        epoch = int(self._manifest.get("epoch", 0))
+        name = self._vectors_name(epoch, capacity)
+        grown = np.lib.format.open_memmap(self.root / name, mode="w+", dtype=np.float32, shape=(capacity, dim))
+        if self._vectors is not None and self._rows:
+            grown[:self._rows] = self._vectors[:self._rows]
+        grown.flush()
+        search = self._create_search(epoch, grown, self._rows)
+        del grown
+
+        old = dict(self._manifest)
+        self._write_manifest(dict(old, vectors=name, dim=dim, **search))
+        self._open_vectors()
+        for key in ("vectors", "search", "scales"):
+            if old.get(key) != self._manifest.get(key):
+                self._remove_file(old.get(key))
+
+    # --- Compact Search Copy ---
+
+    def _search_layout(self, dim: int):
+        """(mode, search_dim) this instance wants for `dim`-wide vectors, or None to search the float32 rows."""
+        search_dim = self.truncate_dim if 0 < self.truncate_dim < dim else dim
+        if self.quantization == "none" and search_dim == dim:
+            return None
+        return self.quantization, search_dim
+
+    def _encode(self, matrix, mode: str, search_dim: int):
+        """Unit rows -> (codes, per-row scales or None) for the compact copy."""
+        part = np.asarray(matrix[:, :search_dim], dtype=np.float32)
+        if search_dim < matrix.shape[1]:
+            # A prefix of a unit vector is not a unit vector; renormalize so scores stay cosines
+            part = self._normalize(part)
+        if mode == "int8":
+            scales = np.abs(part).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            codes = np.rint(part / scales[:, None]).astype(np.int8)
+            return codes, scales.astype(np.float32)
+        return part.astype(np.float16 if mode == "float16" else np.float32), None
+
+    def _create_search(self, epoch: int, vectors, rows: int) -> Dict[str, Any]:
+        """
+        Writes a compact copy of vectors[:rows] sized like `vectors` and returns
+        its manifest fields (all None when this instance searches float32 directly).
+        """
+        fields = {"search": None, "scales": None, "quantization": None, "search_dim": None}
+        capacity, dim = vectors.shape
+        layout = self._search_layout(dim)
+        if layout is None:
+            return fields
+        mode, search_dim = layout
+
+        search_name = f"search-{epoch}-{capacity}-{mode}-{search_dim}.npy"
+        dtype = {"float16": np.float16, "int8": np.int8}.get(mode, np.float32)
+        search = np.lib.format.open_memmap(self.root / search_name, mode="w+", dtype=dtype, shape=(capacity, search_dim))
+        scales = None
+        scales_name = None
+        if mode == "int8":
+            scales_name = f"scales-{epoch}-{capacity}-{search_dim}.npy"
+            scales = np.lib.format.open_memmap(self.root / scales_name, mode="w+", dtype=np.float32, shape=(capacity,))
+        for start in range(0, rows, SCORE_BLOCK_ROWS):
+            end = min(rows, start + SCORE_BLOCK_ROWS)
+            codes, row_scales = self._encode(vectors[start:end], mode, search_dim)
+            search[start:end] = codes
+            if scales is not None:
+                scales[start:end] = row_scales
+        search.flush()
+        if scales is not None:
+            scales.flush()
+        fields.update(search=search_name, scales=scales_name, quantization=mode, search_dim=search_dim)
+        return fields
+
+    def _sync_search(self) -> None:
+        """Rebuilds the compact copy when the configured quantization/truncation changed."""
+        if self._vectors is None:
+            return
+        current = None
+        if self._manifest.get("search"):
+            current = (self._manifest.get("quantization"), self._manifest.get("search_dim"))
+        layout = self._search_layout(self._dim)
+        if current == layout:
+            return
+
+        old = dict(self._manifest)
+        search = self._create_search(int(old.get("epoch", 0)), self._vectors, self._rows)
+        self._write_manifest(dict(old, **search))
+        self._open_vectors()
+        self._remove_file(old.get("search"))
+        self._remove_file(old.get("scales"))
+        logger.info(f"Vector index search copy rebuilt as {layout or 'float32'} for {self._rows} rows.")
+
+    def _write_search_rows(self, start: int, matrix) -> None:
+        if self._search is None:
+            return
+        codes, scales = self._encode(matrix, self._manifest["quantization"], int(self._manifest["search_dim"]))
+        self._search[start:start + len(matrix)] = codes
+        self._search.flush()
+        if self._scales is not None:
+            self._scales[start:start + len(matrix)] = scales
+            self._scales.flush()
+
+    def _remove_file(self, name: Optional[str]) -> None:
+        if not name:
+            return
+        try:
+            (self.root / name).unlink()
+        except OSError:
+            # Windows refuses to delete files still mapped by another instance; compaction sweeps them later.
+            pass
+
+    def _append_log(self, entries: List[Dict[str, Any]]) -> None:
+        payload = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries).encode("utf-8")
+        with open(self._records_path(), "ab") as f:
+            f.write(payload)
+        self._log_offset += len(payload)
+
+    @staticmethod
+    def _normalize(matrix):
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    # --- Public API ---
+
+    def add(self, ids, embeddings, documents, metadatas, partition: str = "") -> None:
+        if not ids:
+            return
+
+        with self._lock, self._write_lock:
+            self._refresh()
+            matrix = self._normalize(np.asarray(embeddings, dtype=np.float32))
+            dim = int(matrix.shape[1])
+            if self._dim and dim != self._dim:
+                raise VectorIndexError(f"Embedding dimension {dim} does not match index dimension {self._dim}. Clear the memory and re-ingest.")
+
+            start = self._rows
+            self._ensure_capacity(start + len(ids), dim)
+            self._sync_search()
+            self._vectors[start:start + len(ids)] = matrix
+            self._vectors.flush()
+            self._write_search_rows(start, matrix)
+
+            # The vectors (and their compact copy) are durable before the log references them.
+            entries = []
+            for offset, (chunk_id, doc, meta) in enumerate(zip(ids, documents, metadatas)):
+                row = start + offset
+                entries.append({"op": "add", "row": row, "id": chunk_id, "document": doc, "metadata": meta or {}, "partition": partition})
+            self._append_log(entries)
+            for entry in entries:
+                self._apply_add(entry["row"], entry["id"], entry["document"], entry["metadata"], partition)
+
+    def delete(self, where: Dict[str, Any]) -> int:
+        with self._lock, self._write_lock:
+            self._refresh()
+            if not self._rows:
+                return 0
+            mask = self._alive[:self._rows] & self._where_mask(where)
+            rows = np.flatnonzero(mask).tolist()
+            if not rows:
+                return 0
+            self._append_log([{"op": "del", "rows": rows}])
+            self._apply_delete(rows)
+            self._maybe_compact()
+            return len(rows)
+
+    def _live_partition_rows(self, partition: str):
+        rows = self._partition_rows.get(partition)
+        if not rows:
+            return np.zeros(0, dtype=np.int64)
+        rows = np.asarray(rows, dtype=np.int64)
+        return rows[self._alive[rows]]
+
+    def delete_partition(self, partition: str) -> int:
+        with self._lock, self._write_lock:
+            self._refresh()
+            rows = self._live_partition_rows(partition).tolist()
+            self._partition_rows.pop(partition, None)
+            if not rows:
+                return 0
+            self._append_log([{"op": "del", "rows": rows}])
+            self._apply_delete(rows)
+            self._maybe_compact()
+            return len(rows)
+
+    def partitions(self) -> List[str]:
+        with self._lock:
+            self._refresh()
+            return sorted(p for p in self._partition_rows if len(self._live_partition_rows(p)))
+
+    def query(self, embedding, n_results: int = 5, where: Optional[Dict[str, Any]] = None,
+              partitions: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            if not self._rows or self._vectors is None or n_results <= 0:
+                return []
+
+            q = np.asarray(embedding, dtype=np.float32)
+            norm = np.linalg.norm(q)
+            if norm == 0 or q.shape[0] != self._dim:
+                return []
+            q = q / norm
+
+            if partitions is not None:
+                # Partition pruning: cost follows the selected chapters, not the book
+                parts = [self._live_partition_rows(p) for p in dict.fromkeys(partitions)]
+                rows = np.sort(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+                if where and len(rows):
+                    rows = rows[self._where_mask(where, rows)]
+                if not len(rows):
+                    return []
+                return self._top_k(q, rows, None, min(n_results, len(rows)))
+
+            mask = self._alive[:self._rows]
+            if where:
+                mask = mask & self._where_mask(where)
+            candidates = int(mask.sum())
+            if candidates == 0:
+                return []
+
+            if candidates < self._rows // 2:
+                return self._top_k(q, np.flatnonzero(mask), None, min(n_results, candidates))
+            return self._top_k(q, None, mask, min(n_results, candidates))
+
+    @staticmethod
+    def _best(scores, k: int):
+        """Indices of the k highest scores, best first."""
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        return top[np.argsort(-scores[top], kind="stable")][:k]
+
+    def _approximate_scores(self, q, rows, mask):
+        """Scores against the compact copy, upcasting SCORE_BLOCK_ROWS rows at a time."""
+        search_dim = int(self._manifest["search_dim"])
+        qs = q[:search_dim]
+        if search_dim < len(q):
+            qs = qs / (np.linalg.norm(qs) or 1.0)
+
+        if rows is not None:
+            scores = self._search[rows].astype(np.float32) @ qs
+            if self._scales is not None:
+                scores *= self._scales[rows]
+            return scores
+
+        scores = np.empty(self._rows, dtype=np.float32)
+        for start in range(0, self._rows, SCORE_BLOCK_ROWS):
+            end = min(self._rows, start + SCORE_BLOCK_ROWS)
+            scores[start:end] = self._search[start:end].astype(np.float32) @ qs
+        if self._scales is not None:
+            scores *= self._scales[:self._rows]
+        return np.where(mask, scores, -np.inf)
+
+    def _read_rows(self, rows):
+        """Full-precision rows by position (sorted), straight from the file when possible."""
+        if self._vectors_file is None:
+            return self._vectors[rows]
+        width = self._dim * 4
+        fd = self._vectors_file.fileno()
+        out = np.empty((len(rows), self._dim), dtype=np.float32)
+        for i, row in enumerate(rows.tolist()):
+            out[i] = np.frombuffer(os.pread(fd, width, self._vectors.offset + row * width), dtype=np.float32)
+        return out
+
+    def _top_k(self, q, rows, mask, k: int) -> List[Dict[str, Any]]:
+        """Scores either the listed rows or every row under mask, then returns the k best as hits."""
+        if self._search is None:
+            if rows is not None:
+                # Selective filter / partition subset: only score the surviving rows.
+                scores = self._vectors[rows] @ q
+            else:
+                scores = np.where(mask, self._vectors[:self._rows] @ q, -np.inf)
+            top = self._best(scores, k)
+            positions = rows[top] if rows is not None else top
+            scores = scores[top]
+        else:
+            # Shortlist on the compact copy, then re-rank exactly from the float32 rows
+            approximate = self._approximate_scores(q, rows, mask)
+            shortlist = self._best(approximate, k * self.rerank_factor)
+            shortlist = shortlist[np.isfinite(approximate[shortlist])]
+            candidates = np.sort(rows[shortlist] if rows is not None else shortlist)
+            exact = self._read_rows(candidates) @ q
+            top = self._best(exact, k)
+            positions = candidates[top]
+            scores = exact[top]
+
+        return [
+            {
+                "id": self._ids[row],
+                "document": self._documents[row],
+                "metadata": self._metadatas[row],
+                "score": float(score),
+            }
+            for score, row in zip(scores.tolist(), positions.tolist())
+        ]
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return int(self._alive[:self._rows].sum())
+
+    def clear(self) -> None:
+        with self._lock, self._write_lock:
+            self._refresh()
+            old = dict(self._manifest)
+            epoch = int(old.get("epoch", 0)) + 1
+            records = f"records-{epoch}.jsonl"
+            (self.root / records).touch()
+            self._write_manifest({"epoch": epoch, "dim": 0, "vectors": None, "records": records})
+            self._reset_state()
+            self._open_vectors()
+            for key in ("vectors", "search", "scales", "records"):
+                self._remove_file(old.get(key))
+
+    # --- Compaction ---
+
+    def _maybe_compact(self) -> None:
+        if self._tombstones >= COMPACT_MIN_TOMBSTONES and self._tombstones >= COMPACT_RATIO * self._rows:
+            self.compact()
+
+    def compact(self) -> None:
+        """Rewrites the live rows into a fresh epoch, dropping tombstones."""
+        with self._lock, self._write_lock:
+            self._refresh()
+            keep = np.flatnonzero(self._alive[:self._rows])
+            old = dict(self._manifest)
+            epoch = int(old.get("epoch", 0)) + 1
+
+            capacity = INITIAL_CAPACITY
+            while capacity < len(keep):
+                capacity *= 2
+
+            vectors_name = None
+            search = {}
+            if self._vectors is not None and len(keep):
+                vectors_name = self._vectors_name(epoch, capacity)
+                fresh = np.lib.format.open_memmap(self.root / vectors_name, mode="w+", dtype=np.float32, shape=(capacity, self._dim))
+                fresh[:len(keep)] = self._vectors[keep]
+                fresh.flush()
+                search = self._create_search(epoch, fresh, len(keep))
+                del fresh
+
+            records_name = f"records-{epoch}.jsonl"
+            with open(self.root / records_name, "w", encoding="utf-8") as f:
+                for new_row, old_row in enumerate(keep.tolist()):
+                    f.write(json.dumps({
+                        "op": "add",
+                        "row": new_row,
+                        "id": self._ids[old_row],
+                        "document": self._documents[old_row],
+                        "metadata": self._metadatas[old_row],
+                        "partition": self._row_partition[old_row],
+                    }, ensure_ascii=False) + "\n")
+
+            dropped = self._tombstones
+            self._write_manifest({"epoch": epoch, "dim": self._dim, "vectors": vectors_name, "records": records_name, **search})
+            self._reset_state()
+            self._open_vectors()
+            self._replay(self._records_path())
+
+            live = {self._manifest.get(key) for key in ("vectors", "search", "scales", "records")}
+            live.add(self.manifest_path.name)
+            for item in self.root.iterdir():
+                if item.name not in live and (item.suffix in {".npy", ".jsonl"}):
+                    self._remove_file(item.name)
+            logger.info(f"Vector index compacted: dropped {dropped} tombstones, {len(keep)} rows live.")
+
+    # --- Metadata Filters (side arrays) ---
+
+    def _column(self, key: str):
+        """Per-key side array over all rows: float64 (NaN = missing) for numeric keys, object otherwise."""
+        column = self._columns.get(key)
+        if column is not None and len(column) == self._rows:
+            return column
+
+        values = [meta.get(key) for meta in self._metadatas[:self._rows]]
+        numeric = all(v is None or (isinstance(v, (int, float)) and not isinstance(v, bool)) for v in values)
+        if numeric:
+            column = np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+        else:
+            column = np.empty(len(values), dtype=object)
+            column[:] = values
+        self._columns[key] = column
+        return column
+
+    def _where_mask(self, where: Dict[str, Any], rows=None):
+        """Boolean mask over all rows, or over just `rows` (aligned with it) when given."""
+        n = self._rows if rows is None else len(rows)
+        mask = np.ones(n, dtype=bool)
+        for key, condition in (where or {}).items():
+            if key == "$and":
+                for sub in condition:
+                    mask &= self._where_mask(sub, rows)
+                continue
+            if key == "$or":
+                any_mask = np.zeros(n, dtype=bool)
+                for sub in condition:
+                    any_mask |= self._where_mask(sub, rows)
+                mask &= any_mask
+                continue
+
+            column = self._column(key)
+            if rows is not None:
+                column = column[rows]
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for op, value in condition.items():
+                mask &= self._compare(column, op, value)
+        return mask
+
+    @staticmethod
+    def _compare(column, op: str, value: Any):
+        numeric = column.dtype != object
+        if op == "$in":
+            return np.isin(column, list(value))
+        if op == "$nin":
+            return ~np.isin(column, list(value))
+        if op == "$eq":
+            return column == value
+        if op == "$ne":
+            return column != value
+
+        comparators = {
+            "$gt": lambda a, b: a > b,
+            "$gte": lambda a, b: a >= b,
+            "$lt": lambda a, b: a < b,
+            "$lte": lambda a, b: a <= b,
+        }
+        if op not in comparators:
+            raise VectorIndexError(f"Unsupported filter operator: {op}")
+        if numeric:
+            with np.errstate(invalid="ignore"):
+                return comparators[op](column, value)
+        return np.array([v is not None and comparators[op](v, value) for v in column], dtype=bool)
+
+
+# --- Scalar Filters ---
+
+def match_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluates a Chroma-style `where` filter against one metadata dict (used by non-vector indexes)."""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(match_where(metadata, sub) for sub in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(match_where(metadata, sub) for sub in condition):
+                return False
+            continue
+
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, expected in condition.items():
+            if op == "$eq":
+                ok = value == expected
+            elif op == "$ne":
+                ok = value != expected
+            elif op == "$in":
+                ok = value in expected
+            elif op == "$nin":
+                ok = value not in expected
+            elif op in {"$gt", "$gte", "$lt", "$lte"}:
+                if value is None:
+                    return False
+                ok = {
+                    "$gt": lambda: value > expected,
+                    "$gte": lambda: value >= expected,
+                    "$lt": lambda: value < expected,
+                    "$lte": lambda: value <= expected,
+                }[op]()
+            else:
+                raise VectorIndexError(f"Unsupported filter operator: {op}")
+            if not ok:
+                return False
+    return True
+
+
+# --- Factory ---
+
+def create_vector_index(db_path: Path, backend: str = "auto", **options) -> VectorIndex:
+    """
+    Builds the configured backend ('chroma', 'numpy' or 'auto').
+    'auto' prefers Chroma when installed and falls back to the built-in NumPy index.
+    `options` (quantization, truncate_dim, rerank_factor) only apply to the NumPy index.
+    """
+    backend = (backend or "auto").strip().lower()
+    if backend == "chroma" or (backend == "auto" and chromadb is not None):
+        return ChromaVectorIndex(db_path)
+    if backend in {"numpy", "auto"}:
+        return NumpyVectorIndex(db_path, **options)
+    raise VectorIndexError(f"Unknown vector backend: {backend}")
@@ -14,6 +14,9 @@ from textual.binding import Binding
 from ui.screens import DirectorScreen, SettingsModal
 from ui.widgets import CastList, ToolCard, MatrixTable, ProseStream
 from core.project_manager import ProjectManager
+from core.entity_matcher import cast_matcher
+from core.services import get_services
+from core.agent_tools import stream_path
 
 # Ensure logging doesn't interfere with TUI
 logging.getLogger("textual").setLevel(logging.WARNING)
@@ -156,6 +159,7 @@ class TextCraftApp(App):
     async def watch_stream_loop(self) -> None:
         """Polls the active manuscript file to stream text to the prose window."""
         current_target = None
+        current_source = None
         file_cursor = 0
         
         while True:
@@ -187,8 +191,21 @@ class TextCraftApp(App):
                                 current_target = target_id
                                 file_cursor = 0 # Reset cursor for new file
                             
+                            # A live rewrite builds up in a side file until it replaces the chapter
+                            live_path = stream_path(full_path)
+                            if live_path.exists():
+                                full_path = live_path
+                            if full_path != current_source:
+                                # A new rewrite starts from its first byte; once renamed over the chapter it has the same bytes
+                                if full_path == live_path:
+                                    file_cursor = 0
+                                current_source = full_path
+
                             # Read Incremental Content
                             if full_path.exists():
+                                if full_path.stat().st_size < file_cursor:
+                                    # Rewritten or rolled back (e.g. an interrupted live draft): start over
+                                    file_cursor = 0
                                 async with aiofiles.open(full_path, "r", encoding="utf-8") as f:
                                     # Move to last known position
                                     await f.seek(file_cursor)
@@ -235,12 +252,11 @@ class TextCraftApp(App):
         cast_list = task.get("active_characters", [])
         
         if not cast_list:
-            # Heuristic Fallback
+            # Heuristic Fallback: whole-word names, aliases and first names from the story bible
             notes = str(task.get("action", "")) + " " + str(task.get("target", ""))
-            # You can improve this regex/matching logic
-            if "Kael" in notes: cast_list.append("Kael Voss")
-            if "Mara" in notes: cast_list.append("Mara Syn")
-            if "Doc" in notes: cast_list.append("Doc Riley")
+            bible = get_services(self.project_root).bible
+            characters = bible.characters
+            cast_list = [characters[char_id].get("name", char_id) for char_id in cast_matcher(bible).find(notes)]
 
         self.query_one("#cast-list", CastList).update_cast(cast_list)
 
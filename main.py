@@ -7,6 +7,7 @@ import argparse
 import json
 import re
 from datetime import datetime
+from typing import Optional
 from dotenv import load_dotenv
 from rich.console import Console
 from rich.logging import RichHandler
@@ -452,6 +453,59 @@ async def _inject_interview_data(json_path: Path, project_root: Path) -> dict:
         "open_questions": seed.get("open_questions") or [],
     }
 
+async def _run_backfill(memory_store, project_root: Path, concurrency: Optional[int] = None) -> dict:
+    """Ingests every pending manuscript into memory with a progress bar, then prints the throughput report."""
+    from rich.progress import Progress, BarColumn, MofNCompleteColumn, TextColumn, TimeElapsedColumn
+    from core.backfill import Backfill, BACKFILL_CONCURRENCY
+
+    backfill = Backfill(memory_store, project_root, concurrency=concurrency or BACKFILL_CONCURRENCY)
+    pending = backfill.pending()
+    with Progress(
+        TextColumn("[bold green]Memory backfill[/bold green]"),
+        BarColumn(),
+        MofNCompleteColumn(),
+        TextColumn("{task.fields[current]}"),
+        TimeElapsedColumn(),
+        console=console,
+    ) as progress:
+        task = progress.add_task("backfill", total=len(pending), current="")
+
+        def _on_file(event: dict) -> None:
+            mark = "[red]failed[/red]" if event["status"] == "failed" else f"{event['chunks']} chunks"
+            progress.update(task, completed=event["done"], current=f"{event['file']} ({mark})")
+
+        report = await backfill.run(progress=_on_file)
+
+    console.print(
+        f"Backfill: {report['files_ingested']} ingested, {report['files_skipped']} already up to date, "
+        f"{len(report['files_failed'])} failed."
+    )
+    if report["files_ingested"]:
+        console.print(
+            f"Throughput: {report['chunks']} chunks / {report['tokens']} tokens in {report['seconds']}s "
+            f"= {report['chunks_per_sec']} chunks/sec, {report['tokens_per_sec']} tokens/sec"
+        )
+    for name in report["files_failed"]:
+        console.print(f"[red]- {name}[/red]")
+    return report
+
+async def _ensure_memory_complete(memory_store, project_root: Path) -> bool:
+    """Live generation needs the whole manuscript in memory: backfill anything missing first."""
+    from core.backfill import Backfill
+
+    if not memory_store.use_rag:
+        return True
+    pending = Backfill(memory_store, project_root).pending()
+    if not pending:
+        return True
+
+    console.print(f"[bold yellow]Memory is incomplete:[/bold yellow] {len(pending)} manuscript(s) not ingested yet. Backfilling before engine start...")
+    report = await _run_backfill(memory_store, project_root)
+    if not report["complete"]:
+        console.print("[bold red]Engine not started:[/bold red] memory backfill incomplete. Fix the errors above and run `python main.py --backfill` to resume.")
+        return False
+    return True
+
 async def main():
     """The Main Application Loop."""
     parser = argparse.ArgumentParser(add_help=True)
@@ -465,6 +519,8 @@ async def main():
     parser.add_argument("--project", default=None, help="Project ID under ./projects to interview into (defaults to last active)")
     parser.add_argument("--no-project-prompt", action="store_true", help="Skip interactive project/seed chooser when starting the engine")
     parser.add_argument("--no-director-console", action="store_true", help="Disable the interactive Director Console in engine mode")
+    parser.add_argument("--backfill", action="store_true", help="Ingest every manuscript of the project (--project or last active) into RAG memory and exit. Resumes after interruption.")
+    parser.add_argument("--backfill-concurrency", type=int, default=None, metavar="N", help="Manuscripts ingested concurrently during --backfill (default: RAG_BACKFILL_CONCURRENCY)")
     args, _ = parser.parse_known_args()
 
     setup_logging()
@@ -477,6 +533,30 @@ async def main():
         ok = run_setup_wizard(env_path)
         raise SystemExit(0 if ok else 1)
 
+    if args.backfill:
+        # No API key check: the local hashing embedder backfills offline
+        load_dotenv()
+        from core.project_manager import ProjectManager
+        from core.services import get_services
+
+        pm = ProjectManager()
+        project_id = args.project or pm.get_last_active_project()
+        project_root = pm.get_project_path(project_id) if project_id else None
+        if not project_root:
+            console.print(f"[bold red]CRITICAL ERROR:[/bold red] Could not resolve project path for '{project_id}'.")
+            raise SystemExit(1)
+
+        services = get_services(project_root)
+        memory_store = services.memory
+        if not memory_store.use_rag:
+            console.print("RAG memory is disabled (USE_RAG=false); nothing to backfill.")
+            raise SystemExit(0)
+        try:
+            report = await _run_backfill(memory_store, project_root, args.backfill_concurrency)
+        finally:
+            await services.aclose()
+        raise SystemExit(0 if report["complete"] else 1)
+
     check_environment()
 
     # Handle --inject-interview
@@ -614,6 +694,7 @@ async def main():
     # Print Welcome Banner
     console.print(Panel(Text(BANNER, justify="center", style="bold cyan"), border_style="cyan"))
 
+    orchestrator = None
     try:
         # Step 1: Initialize the Librarian (Project Manager)
         console.print("[bold green]System:[/bold green] Initializing Project Manager...")
@@ -624,6 +705,16 @@ async def main():
         # and initialize the Scanner and MemoryStore for that specific context.
         console.print("[bold green]System:[/bold green] Awakening The Orchestrator...")
         orchestrator = Orchestrator(pm)
+        startup = orchestrator.services.startup_report()
+        console.print(
+            f"[dim]Services ready in {startup['startup_seconds']}s "
+            f"({', '.join(f'{k} {v}s' for k, v in startup['services'].items())}); "
+            f"RSS {startup['rss_start_mb']} -> {startup['rss_mb']} MB[/dim]"
+        )
+
+        # Step 2b: Memory must cover the whole manuscript before live generation
+        if not await _ensure_memory_complete(orchestrator.memory_store, orchestrator.project_root):
+            raise SystemExit(1)
 
         director_task = None
         if sys.stdin.isatty() and not args.no_director_console:
@@ -649,6 +740,8 @@ async def main():
         console.print_exception()
         sys.exit(1)
     finally:
+        if orchestrator is not None:
+            await orchestrator.services.aclose()
         console.print("[dim]TextCraft Session Ended.[/dim]")
 
 if __name__ == "__main__":